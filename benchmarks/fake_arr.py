@@ -0,0 +1,278 @@
+"""
+Local stand-in for the Sonarr/Radarr v3 API endpoints unmonitarr uses.
+
+Serves a synthetic, deterministic library of configurable size with optional
+per-request latency, applies writes so consecutive sweeps see their effect,
+and counts requests per endpoint. Used by run_benchmark.py and the tests; can
+also be run on its own to point a local unmonitarr at:
+
+    python benchmarks/fake_arr.py --series 2000 --episodes 40 --movies 10000 --port 8989
+
+Extra endpoints: GET /__stats (request counters), POST /__reset (clear them).
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+API_KEY = "fake"
+AIR_FMT = "%Y-%m-%dT%H:%M:%SZ"
+EPISODE_ID_STRIDE = 1000  # episode id = series id * stride + index, so writes map back to their series
+
+TAGS = [
+    {"id": 1, "label": "auto-unmonitored"},
+    {"id": 2, "label": "ignore"},
+    {"id": 3, "label": "season-pack"},
+    {"id": 4, "label": "delayby_60"},
+]
+
+# Fields the decisions never read, so responses are about the size of a real library's
+_OVERVIEW = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 4
+_IMAGES = [{"coverType": t, "url": f"/MediaCover/{t}.jpg", "remoteUrl": f"https://image.example/{t}.jpg"}
+           for t in ("poster", "fanart", "banner")]
+_RATINGS = {"votes": 1234, "value": 7.9}
+
+def _tags(rng):
+    tags = []
+    for tag_id, p in ((1, 0.3), (2, 0.02), (3, 0.05), (4, 0.05)):
+        if rng.random() < p:
+            tags.append(tag_id)
+    return tags
+
+def _date(now, rng, lo_days, hi_days):
+    return (now + timedelta(minutes=rng.randint(lo_days * 1440, hi_days * 1440))).strftime(AIR_FMT)
+
+
+class FakeLibrary:
+    """Synthetic Sonarr + Radarr library. Episodes are regenerated per request from
+    a per-series seed; only monitored-state overrides are kept in memory."""
+
+    def __init__(self, series=100, episodes=20, movies=500, seed=1, now=None):
+        if episodes >= EPISODE_ID_STRIDE:
+            raise ValueError(f"episodes per series must be below {EPISODE_ID_STRIDE}")
+        self.seed = seed
+        self.episodes_per_series = episodes
+        self.now = now or datetime.now(timezone.utc)
+        self.lock = threading.Lock()
+        self.tags = [dict(t) for t in TAGS]
+        self.episode_monitored = {}  # episode id -> monitored, for episodes changed through the API
+        self.series = {}
+        for sid in range(1, series + 1):
+            rng = random.Random(seed * 7919 + sid)
+            season_count = 1 + sid % 3
+            self.series[sid] = {
+                "id": sid, "title": f"Series {sid}", "monitored": rng.random() < 0.9, "tags": _tags(rng),
+                "seasons": [{"seasonNumber": n, "monitored": n == season_count or rng.random() < 0.5,
+                             "statistics": {}} for n in range(1, season_count + 1)],
+                "overview": _OVERVIEW, "images": _IMAGES, "ratings": _RATINGS, "year": 2000 + sid % 25,
+            }
+            self._refresh_statistics(sid)
+        self.movies = {}
+        for mid in range(1, movies + 1):
+            rng = random.Random(seed * 104729 + mid)
+            released = rng.random() < 0.85
+            self.movies[mid] = {
+                "id": mid, "title": f"Movie {mid}", "monitored": rng.random() < 0.6, "tags": _tags(rng),
+                "hasFile": released and rng.random() < 0.5,
+                "digitalRelease": _date(self.now, rng, -900, 90) if released else None,
+                "physicalRelease": _date(self.now, rng, -900, 120) if rng.random() < 0.5 else None,
+                "inCinemas": _date(self.now, rng, -1000, 30) if rng.random() < 0.7 else None,
+                "overview": _OVERVIEW, "images": _IMAGES, "ratings": {"tmdb": _RATINGS, "imdb": _RATINGS},
+                "alternateTitles": [{"title": f"Movie {mid} ({lang})", "sourceType": "tmdb"} for lang in ("de", "fr", "es")],
+            }
+
+    def episodes(self, sid):
+        """Episodes of a series, as returned by GET /api/v3/episode?seriesId=."""
+        series = self.series[sid]
+        rng = random.Random(self.seed * 15485863 + sid)
+        seasons = len(series["seasons"])
+        eps = []
+        for i in range(self.episodes_per_series):
+            eid = sid * EPISODE_ID_STRIDE + i
+            season = 1 + i * seasons // self.episodes_per_series
+            air = _date(self.now, rng, -720, 60) if rng.random() < 0.95 else None
+            aired = air is not None and air < self.now.strftime(AIR_FMT)
+            monitored = rng.random() < (0.5 if aired else 0.7)
+            eps.append({
+                "id": eid, "seriesId": sid, "seasonNumber": season, "episodeNumber": i + 1,
+                "title": f"Episode {i + 1}", "airDateUtc": air,
+                "monitored": self.episode_monitored.get(eid, monitored),
+                "hasFile": aired and rng.random() < 0.6, "overview": _OVERVIEW[:120],
+            })
+        return eps
+
+    def _refresh_statistics(self, sid):
+        stats = {}
+        for e in self.episodes(sid):
+            s = stats.setdefault(e["seasonNumber"], {"episodeCount": 0, "episodeFileCount": 0, "totalEpisodeCount": 0})
+            s["totalEpisodeCount"] += 1
+            s["episodeCount"] += e["monitored"]
+            s["episodeFileCount"] += e["hasFile"]
+        for season in self.series[sid]["seasons"]:
+            season["statistics"] = stats.get(season["seasonNumber"], {})
+
+    def set_episodes_monitored(self, episode_ids, monitored):
+        with self.lock:
+            for eid in episode_ids:
+                self.episode_monitored[eid] = monitored
+            for sid in {eid // EPISODE_ID_STRIDE for eid in episode_ids}:
+                if sid in self.series:
+                    self._refresh_statistics(sid)
+
+    def edit(self, items, ids, payload):
+        """Apply a series/movie editor request."""
+        with self.lock:
+            for item_id in ids:
+                item = items.get(item_id)
+                if item is None:
+                    continue
+                if "monitored" in payload:
+                    item["monitored"] = bool(payload["monitored"])
+                if "tags" in payload:
+                    tags = set(item["tags"])
+                    if payload.get("applyTags") == "remove":
+                        tags -= set(payload["tags"])
+                    elif payload.get("applyTags") == "replace":
+                        tags = set(payload["tags"])
+                    else:
+                        tags |= set(payload["tags"])
+                    item["tags"] = sorted(tags)
+
+    def add_tag(self, label):
+        with self.lock:
+            for t in self.tags:
+                if t["label"].lower() == label.lower():
+                    return t
+            tag = {"id": max(t["id"] for t in self.tags) + 1, "label": label}
+            self.tags.append(tag)
+            return tag
+
+
+_ITEM_RE = re.compile(r"^/api/v3/(series|movie)/(\d+)$")
+
+class FakeArrHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real servers
+    disable_nagle_algorithm = True   # headers and body go out in separate writes
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status, body=None):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def _handle(self, method):
+        server = self.server
+        url = urlsplit(self.path)
+        path = url.path
+        body = self._body() if method in ("POST", "PUT") else None
+        if path == "/__stats":
+            with server.stats_lock:
+                return self._send(200, {"requests": sum(server.stats.values()), "by_endpoint": dict(server.stats)})
+        if path == "/__reset":
+            with server.stats_lock:
+                server.stats.clear()
+            return self._send(200, {})
+        if self.headers.get("X-Api-Key") != server.api_key:
+            return self._send(401, {"message": "Unauthorized"})
+
+        endpoint = _ITEM_RE.sub(r"/api/v3/\1/{id}", path)
+        with server.stats_lock:
+            server.stats[f"{method} {endpoint}"] += 1
+        if server.latency:
+            time.sleep(server.latency)
+
+        lib = server.library
+        m = _ITEM_RE.match(path)
+        if method == "GET" and m:
+            items = lib.series if m.group(1) == "series" else lib.movies
+            item = items.get(int(m.group(2)))
+            return self._send(200, item) if item else self._send(404, {"message": "NotFound"})
+        route = (method, path)
+        if route == ("GET", "/api/v3/tag"):
+            return self._send(200, lib.tags)
+        if route == ("POST", "/api/v3/tag"):
+            return self._send(201, lib.add_tag(body["label"]))
+        if route == ("GET", "/api/v3/series"):
+            return self._send(200, list(lib.series.values()))
+        if route == ("GET", "/api/v3/episode"):
+            sid = int(parse_qs(url.query).get("seriesId", ["0"])[0])
+            return self._send(200, lib.episodes(sid) if sid in lib.series else [])
+        if route == ("PUT", "/api/v3/episode/monitor"):
+            lib.set_episodes_monitored(body.get("episodeIds", []), bool(body.get("monitored")))
+            return self._send(202, {})
+        if route == ("PUT", "/api/v3/series/editor"):
+            lib.edit(lib.series, body.get("seriesIds", []), body)
+            return self._send(202, {})
+        if route == ("GET", "/api/v3/movie"):
+            return self._send(200, list(lib.movies.values()))
+        if route == ("PUT", "/api/v3/movie/editor"):
+            lib.edit(lib.movies, body.get("movieIds", []), body)
+            return self._send(202, {})
+        return self._send(404, {"message": "NotFound"})
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+
+class FakeArrServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, library, port=0, latency_ms=0, api_key=API_KEY):
+        super().__init__(("127.0.0.1", port), FakeArrHandler)
+        self.library = library
+        self.latency = latency_ms / 1000
+        self.api_key = api_key
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        """Serve in a daemon thread and return self."""
+        threading.Thread(target=self.serve_forever, daemon=True, name="fake-arr").start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Sonarr/Radarr v3 API with a synthetic library")
+    parser.add_argument("--series", type=int, default=1000)
+    parser.add_argument("--episodes", type=int, default=50, help="episodes per series")
+    parser.add_argument("--movies", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=0)
+    args = parser.parse_args()
+
+    library = FakeLibrary(args.series, args.episodes, args.movies, args.seed)
+    server = FakeArrServer(library, args.port, args.latency_ms)
+    print(f"listening on {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
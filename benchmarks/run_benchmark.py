@@ -0,0 +1,107 @@
+"""
+End-to-end sweep benchmark against the fake Sonarr/Radarr server.
+
+Starts fake_arr.py with a synthetic library, then runs a full Sonarr sweep
+(sonarr_app.run_job) and a full Radarr sweep (radarr_app.run_radarr), each in a
+fresh process, and reports wall time, upstream request count and peak RSS:
+
+    python benchmarks/run_benchmark.py --series 10000 --episodes 50 --movies 50000 --latency-ms 2
+
+Writes are applied to the fake library (DRY_RUN=0) unless --dry-run is given.
+Any other unmonitarr setting can be passed through the environment.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "src")
+sys.path.insert(0, HERE)
+
+from fake_arr import API_KEY  # noqa: E402
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB on Linux
+
+def run_child(app):
+    """Run one sweep in this process and print its timings as JSON."""
+    import logging
+    sys.path.insert(0, SRC)
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"), stream=open(os.devnull, "w"))
+    if app == "sonarr":
+        from sonarr.sonarr_app import run_job as job
+    else:
+        from radarr.radarr_app import run_radarr as job
+    rss_before = _peak_rss_mb()
+    start = time.perf_counter()
+    job()
+    print(json.dumps({"wall_seconds": time.perf_counter() - start,
+                      "peak_rss_mb": _peak_rss_mb(), "baseline_rss_mb": rss_before}))
+
+def _get(url):
+    with urllib.request.urlopen(url) as r:
+        return json.load(r)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full unmonitarr sweeps against a fake Sonarr/Radarr")
+    parser.add_argument("--series", type=int, default=1000)
+    parser.add_argument("--episodes", type=int, default=50, help="episodes per series")
+    parser.add_argument("--movies", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=0, help="latency injected into every request")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--apps", nargs="+", choices=("sonarr", "radarr"), default=["sonarr", "radarr"])
+    parser.add_argument("--repeat", type=int, default=1, help="sweeps per app (later ones see earlier writes)")
+    parser.add_argument("--dry-run", action="store_true", help="run with DRY_RUN=1 (no writes sent)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--child", choices=("sonarr", "radarr"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args.child)
+
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "fake_arr.py"), "--series", str(args.series), "--episodes", str(args.episodes),
+         "--movies", str(args.movies), "--latency-ms", str(args.latency_ms), "--seed", str(args.seed)],
+        stdout=subprocess.PIPE, text=True)
+    try:
+        url = server.stdout.readline().strip().rsplit(" ", 1)[-1]
+        if not url.startswith("http"):
+            sys.exit("fake server failed to start")
+        results = []
+        with tempfile.TemporaryDirectory() as data_dir:
+            env = dict(os.environ, PYTHONPATH=SRC, SONARR_URL=url, SONARR_API_KEY=API_KEY, RADARR_URL=url,
+                       RADARR_API_KEY=API_KEY, ENABLE_SONARR="1", ENABLE_RADARR="1", DATA_DIR=data_dir,
+                       DRY_RUN="1" if args.dry_run else "0")
+            for app in args.apps:
+                for run in range(1, args.repeat + 1):
+                    urllib.request.urlopen(urllib.request.Request(f"{url}/__reset", method="POST")).close()
+                    out = subprocess.run([sys.executable, __file__, "--child", app], env=env,
+                                         check=True, capture_output=True, text=True).stdout
+                    result = json.loads(out.strip().splitlines()[-1])
+                    stats = _get(f"{url}/__stats")
+                    result.update(app=app, run=run, requests=stats["requests"], by_endpoint=stats["by_endpoint"])
+                    results.append(result)
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"library: {args.series} series x {args.episodes} episodes, {args.movies} movies, "
+          f"latency {args.latency_ms} ms, {'dry run' if args.dry_run else 'live'}")
+    print(f"{'app':<8}{'run':>4}{'wall (s)':>11}{'requests':>10}{'peak RSS (MB)':>15}")
+    for r in results:
+        print(f"{r['app']:<8}{r['run']:>4}{r['wall_seconds']:>11.2f}{r['requests']:>10}{r['peak_rss_mb']:>15.1f}")
+        for endpoint, count in sorted(r["by_endpoint"].items()):
+            print(f"{'':<12}{endpoint:<40}{count:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+import codecs
+import json
+import logging
+import re
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from common.rate_limit import AdaptiveLimiter
+from common.retry import CircuitBreaker, CircuitOpenError, RetryPolicy, retry_call
+from core import metrics
+from core.config import Config
+
+log = logging.getLogger("arr_client")
+
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")  # safe to retry
+
+class DryRunResponse:
+    """Stand-in response returned for write requests while DRY_RUN is enabled."""
+    ok = True
+    status_code = 200
+    text = ""
+
+    def json(self):
+        return {}
+
+class ArrClient:
+    """
+    Long-lived HTTP client for one Sonarr/Radarr instance.
+
+    Holds a single requests.Session with a sized keep-alive connection pool, so
+    repeated calls during a sweep reuse TCP/TLS connections instead of opening
+    a new one per request. It also owns the API-key header, the request timeout
+    and the DRY_RUN short-circuit for write requests. Requests are counted and
+    timed per endpoint and status in the upstream metrics, labelled with `name`
+    (the logger's name, e.g. sonarr, by default). With a `limiter`
+    (AdaptiveLimiter), every request sent waits for its rate and concurrency
+    limits and reports back its latency and outcome. With a `retry` policy,
+    idempotent requests failing with a connection error, timeout, 5xx or 429
+    are retried with backoff; a `breaker` (CircuitBreaker) fails requests fast
+    with CircuitOpenError while the instance is down.
+    """
+    def __init__(self, base_url, api_key, logger=None, timeout=None, pool_size=None, name=None, limiter=None,
+                 retry=None, breaker=None):
+        self.base_url = base_url.rstrip("/")
+        self.logger = logger or log
+        self.name = name or self.logger.name
+        self.limiter = limiter
+        self.retry = retry
+        self.breaker = breaker
+        self.timeout = timeout if timeout is not None else Config.HTTP_TIMEOUT_SECONDS
+        # Enough keep-alive connections for the concurrent episode fetches of a sweep
+        pool_size = pool_size or max(Config.HTTP_POOL_SIZE, Config.EPISODE_FETCH_CONCURRENCY)
+
+        self.session = requests.Session()
+        self.session.headers.update({"X-Api-Key": api_key, "Connection": "keep-alive"})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    def request(self, method, path, **kw):
+        method = method.upper()
+        if method in WRITE_METHODS and Config.DRY_RUN:
+            payload = kw.get("json") or kw.get("data")
+            self.logger.info("[DRY] %s %s -> %s", method, path, json.dumps(payload) if payload else "(no body)")
+            return DryRunResponse()
+        kw.setdefault("timeout", self.timeout)
+        retries = self.retry.retries if self.retry and method in IDEMPOTENT_METHODS else 0
+        attempt = 0
+        while True:
+            if self.breaker:
+                self.breaker.before_request()
+            try:
+                r = self._send(method, path, **kw)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self._record(False)
+                if attempt >= retries:
+                    raise
+                failure = type(e).__name__
+            except Exception:
+                # Not retried, but still the outcome of a (possibly half-open trial) request
+                self._record(False)
+                raise
+            else:
+                if not (retries or self.breaker):
+                    return r
+                self._record(r.status_code < 500)
+                if attempt >= retries or not (r.status_code >= 500 or r.status_code == 429):
+                    return r
+                failure = f"HTTP {r.status_code}"
+                r.close()
+            attempt += 1
+            delay = self.retry.delay(attempt)
+            self.logger.warning("%s %s failed (%s), retry %d/%d in %.1fs", method, path, failure, attempt, retries, delay)
+            time.sleep(delay)
+
+    def _send(self, method, path, **kw):
+        """Send one attempt of a request, within the limiter's limits."""
+        ticket = self.limiter.acquire() if self.limiter else None
+        start = time.perf_counter()
+        try:
+            r = self.session.request(method, self.url(path), **kw)
+        except Exception:
+            elapsed = time.perf_counter() - start
+            metrics.observe_upstream(self.name, method, path, "error", elapsed)
+            self._release(ticket, elapsed, None)
+            raise
+        elapsed = time.perf_counter() - start
+        metrics.observe_upstream(self.name, method, path, r.status_code, elapsed)
+        self._release(ticket, elapsed, r.status_code)
+        return r
+
+    def _record(self, ok):
+        if self.breaker and self.breaker.record(ok):
+            self.logger.warning("%s failed %d times in a row, pausing requests for %ds",
+                                self.name, self.breaker.threshold, self.breaker.cooldown)
+
+    def _release(self, ticket, elapsed, status):
+        """Report a request's latency and outcome (status None: no response) to the limiter."""
+        if not self.limiter:
+            return
+        failed = status is None or status >= 500 or status == 429
+        if self.limiter.release(ticket, elapsed, failed):
+            self.logger.info("%s is slow or failing, limiting to %d concurrent request(s)",
+                             self.name, int(self.limiter.limit))
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(base_url, api_key, logger=None, name=None, limits=None):
+    """
+    Return the shared ArrClient for an instance, creating it on first use.
+    `limits` is the (rate, burst, max_concurrency) of its AdaptiveLimiter; None for no limiter.
+    """
+    key = (base_url.rstrip("/"), api_key)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            limiter = AdaptiveLimiter(*limits) if limits else None
+            retry = RetryPolicy(Config.HTTP_RETRIES, Config.HTTP_RETRY_BACKOFF_SECONDS)
+            client = ArrClient(base_url, api_key, logger, name=name, limiter=limiter, retry=retry)
+            if Config.CIRCUIT_BREAKER_FAILURES > 0:
+                client.breaker = CircuitBreaker(Config.CIRCUIT_BREAKER_FAILURES, Config.CIRCUIT_BREAKER_SECONDS, client.name)
+            _clients[key] = client
+        return client
+
+def limiter_stats():
+    """Current limits and effective request rate of each instance's client, by client name."""
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {c.name: c.limiter.stats() for c in clients if c.limiter}
+
+def update_limiter_metrics():
+    for name, stats in limiter_stats().items():
+        metrics.UPSTREAM_RATE_LIMIT.set(stats["rate_limit"] or 0, app=name)
+        metrics.UPSTREAM_EFFECTIVE_RATE.set(stats["effective_rate"], app=name)
+        metrics.UPSTREAM_CONCURRENCY_LIMIT.set(stats["concurrency_limit"] or 0, app=name)
+
+def chunked(ids, size):
+    """Split `ids` into lists of at most `size` items (all of them at once if size <= 0)."""
+    ids = list(ids)
+    if size <= 0:
+        return [ids] if ids else []
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+STREAM_CHUNK_SIZE = 64 * 1024
+_WHITESPACE = " \t\n\r"
+_decoder = json.JSONDecoder()
+
+def iter_json_array(chunks):
+    """Yield the elements of a top-level JSON array read incrementally from `chunks` (bytes),
+    so the whole document is never held in memory at once."""
+    text = codecs.getincrementaldecoder("utf-8")()
+    buf, pos, state = "", 0, "start"  # start -> first -> (item -> sep)* -> done
+    chunks = iter(chunks)
+    eof = False
+    while state != "done":
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+        buf = buf[pos:] + text.decode(chunk or b"", final=eof)
+        pos = 0
+        while state != "done":
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buf):
+                break
+            if state == "start":
+                if buf[pos] != "[":
+                    raise ValueError(f"Expected a JSON array, got {buf[pos:pos + 20]!r}")
+                pos, state = pos + 1, "first"
+            elif state in ("first", "sep") and buf[pos] == "]":
+                pos, state = pos + 1, "done"
+            elif state == "sep":
+                if buf[pos] != ",":
+                    raise ValueError(f"Expected ',' or ']' at {buf[pos:pos + 20]!r}")
+                pos, state = pos + 1, "item"
+            else:
+                try:
+                    item, end = _decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    break  # element continues in the next chunk
+                if end == len(buf) and not eof:
+                    break  # a trailing number may continue in the next chunk
+                yield item
+                pos, state = end, "sep"
+        if eof and state != "done":
+            raise ValueError("Truncated JSON array")
+
+def _iter_body(r):
+    try:
+        yield from r.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+    except requests.exceptions.ConnectionError as e:
+        # iter_content reports a read timeout mid-body as a ConnectionError
+        if e.args and isinstance(e.args[0], ReadTimeoutError):
+            raise requests.exceptions.ReadTimeout(e) from e
+        raise
+
+def stream_items(r, project=None):
+    """Yield the objects of a JSON array response (requested with stream=True) one at a time,
+    passed through `project` so only the fields the caller needs are kept."""
+    try:
+        r.raise_for_status()
+        for item in iter_json_array(_iter_body(r)):
+            yield project(item) if project else item
+    finally:
+        r.close()
+
+class StreamInterrupted(requests.exceptions.ConnectionError):
+    """The connection failed while a streamed response body was being read."""
+
+def fetch_listing(req, path, project, policy, logger, what):
+    """
+    GET the JSON array at `path` through `req` as a stream and return its items passed
+    through `project`. The request itself is retried by the client; only a failure while
+    reading the body re-sends it here (with `policy` backoff), so retries don't compound.
+    """
+    def attempt():
+        r = req("GET", path, stream=True)
+        try:
+            return list(stream_items(r, project))
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            raise StreamInterrupted(f"{what} interrupted: {e}") from e
+    return retry_call(attempt, policy, logger, what, retry_on=StreamInterrupted)
+
+def tags_map(req):
+    """Fetch /api/v3/tag through `req` and return (id -> label, lowercase label -> id) maps."""
+    r = req("GET","/api/v3/tag")
+    items = r.json() if hasattr(r,"json") else []
+    return { int(t["id"]): t["label"] for t in items }, { t["label"].lower(): int(t["id"]) for t in items }
+
+def ensure_tag(req, label, label_to_id, logger=None, cache_key=None):
+    """Return the id of tag `label`, creating it through `req` if it does not exist yet.
+    Creating it invalidates the cached TagIndex of `cache_key`."""
+    logger = logger or log
+    if label.lower() in label_to_id:
+        return label_to_id[label.lower()]
+    if Config.DRY_RUN:
+        logger.info("[DRY] POST /api/v3/tag -> {\"label\": \"%s\"}", label)
+        return 999999
+    r = req("POST","/api/v3/tag", json={"label": label})
+    if r.ok:
+        if cache_key is not None:
+            invalidate_tag_index(cache_key)
+        created = r.json()
+        if isinstance(created, dict) and "id" in created:
+            return int(created["id"])
+        # refresh
+        _, rev = tags_map(req)
+        return rev.get(label.lower())
+    raise RuntimeError("Failed to ensure tag")
+
+def send_writes(req, writes, logger, dry_run, checkpoint=None):
+    """Send (method, path, payload) writes through `req`; with `dry_run` they are only logged.
+    Each write is counted as sent in the `checkpoint`'s pending batch. Returns the payloads of
+    the writes that failed (an open circuit breaker still ends the run)."""
+    failed = []
+    for method, path, payload in writes:
+        if dry_run:
+            logger.info("[DRY] %s %s -> %s", method, path, payload)
+        else:
+            try:
+                req(method, path, json=payload).raise_for_status()
+            except CircuitOpenError:
+                raise
+            except requests.exceptions.RequestException as e:
+                logger.warning("%s %s failed: %s", method, path, e)
+                failed.append(payload)
+        if checkpoint is not None:
+            checkpoint.mark_sent()
+    return failed
+
+DELAY_TAG_RE = re.compile(r"^delayby_(-?\d+)$", re.IGNORECASE)
+
+class TagIndex:
+    """
+    Lookups precomputed from one fetch of an instance's tag list, so per-item tag
+    checks are set and dict lookups: ids by (case-insensitive) label and the delay
+    override in minutes of every delayby_<N> tag.
+    """
+    def __init__(self, id_to_label, fetched_at=None):
+        self.id_to_label = id_to_label
+        self.label_to_id = {label.lower(): tid for tid, label in id_to_label.items()}
+        self.fetched_at = time.monotonic() if fetched_at is None else fetched_at
+        self._ids = {}
+        for tid, label in id_to_label.items():
+            self._ids.setdefault(label.lower(), set()).add(tid)
+        self.delays = {}  # tag id -> delay override in minutes
+        for tid, label in id_to_label.items():
+            m = DELAY_TAG_RE.match(label)
+            if m:
+                self.delays[tid] = int(m.group(1))
+
+    def ids(self, label):
+        """Ids of the tags labelled `label`, case-insensitively (empty for an empty label)."""
+        return frozenset(self._ids.get(label.lower(), ())) if label else frozenset()
+
+    def labels(self, tag_ids):
+        """Sorted labels of `tag_ids` ('' for unknown ids)."""
+        return sorted(self.id_to_label.get(tid, "") for tid in tag_ids)
+
+    def covers(self, tag_ids):
+        """True if every id in `tag_ids` is a known tag."""
+        return all(tid in self.id_to_label for tid in tag_ids)
+
+_tag_indexes = {}
+_tag_indexes_lock = threading.Lock()
+
+def get_tag_index(req, key, ttl, refresh=False):
+    """
+    Return the TagIndex of instance `key`, fetching /api/v3/tag through `req` only when
+    there is none yet, it is older than `ttl` seconds (0 = always refetch) or `refresh` is set.
+    """
+    with _tag_indexes_lock:
+        index = _tag_indexes.get(key)
+    if index is None or refresh or ttl <= 0 or time.monotonic() - index.fetched_at >= ttl:
+        id_to_label, _ = tags_map(req)
+        index = TagIndex(id_to_label)
+        with _tag_indexes_lock:
+            _tag_indexes[key] = index
+    return index
+
+def invalidate_tag_index(key):
+    """Drop the cached TagIndex of `key`, e.g. after creating a tag."""
+    with _tag_indexes_lock:
+        _tag_indexes.pop(key, None)
@@ -0,0 +1,108 @@
+"""
+Client-side limits on the requests sent to one Sonarr/Radarr instance.
+
+A token bucket caps the request rate (`rate` requests/s, in bursts of up to
+`burst`), and an AIMD window caps the requests in flight: it grows by about
+one per round of healthy responses, up to `max_concurrency`, and halves (at
+most once per round) when a request fails with a 5xx/429, times out, or is
+much slower than the recent baseline. A busy instance, e.g. Sonarr on a small
+NAS in the middle of its RSS sync, gets breathing room, and sweeps speed back
+up once it recovers.
+"""
+import threading
+import time
+from collections import deque
+
+class AdaptiveLimiter:
+    SLOW_FACTOR = 3.0     # a response this many times slower than the baseline signals congestion...
+    SLOW_FLOOR = 0.25     # ...if it also took at least this many seconds
+    BASELINE_ALPHA = 0.1  # weight of each healthy response in the latency baseline (EWMA)
+    RATE_WINDOW = 10.0    # seconds over which the effective request rate is measured
+
+    def __init__(self, rate=0.0, burst=1, max_concurrency=0, min_concurrency=1):
+        """`rate` <= 0 disables the token bucket, `max_concurrency` <= 0 the concurrency window."""
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.max_concurrency = int(max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency or min_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.baseline = None  # EWMA latency of healthy responses, seconds
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._bucket_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._sent = 0
+        self._backoff_at = 0  # requests sent before the last backoff don't trigger another one
+        self._completed = deque()
+
+    def _take_token(self):
+        """Reserve a token, sleeping until it is due if the bucket is empty."""
+        if self.rate <= 0:
+            return
+        with self._bucket_lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+            self._refilled = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+    def acquire(self):
+        """Block until a request may be sent. Returns a ticket to pass to release()."""
+        self._take_token()
+        with self._cond:
+            while self.max_concurrency > 0 and self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            self._sent += 1
+            return self._sent
+
+    def release(self, ticket, latency, failed=False):
+        """
+        Record the outcome of the request `ticket` (`failed`: 5xx, 429, timeout or connection
+        error) and adjust the concurrency window. Returns True if the window was reduced.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            self._completed.append(time.monotonic())
+            self._prune_completed()
+            slow = self.baseline is not None and latency > max(self.baseline * self.SLOW_FACTOR, self.SLOW_FLOOR)
+            backed_off = False
+            if failed or slow:
+                if self.max_concurrency > 0 and ticket > self._backoff_at:
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+                    self._backoff_at = self._sent
+                    backed_off = True
+            else:
+                self.baseline = latency if self.baseline is None else \
+                    self.baseline + self.BASELINE_ALPHA * (latency - self.baseline)
+                if self.max_concurrency > 0:
+                    self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+            return backed_off
+
+    def _prune_completed(self):
+        """Drop completions older than RATE_WINDOW (call with the lock held)."""
+        cutoff = time.monotonic() - self.RATE_WINDOW
+        while self._completed and self._completed[0] < cutoff:
+            self._completed.popleft()
+
+    def effective_rate(self):
+        """Requests completed per second over the last RATE_WINDOW seconds."""
+        with self._cond:
+            self._prune_completed()
+            return len(self._completed) / self.RATE_WINDOW
+
+    def stats(self):
+        with self._cond:
+            limit, in_flight, baseline = self.limit, self.in_flight, self.baseline
+        return {
+            "rate_limit": self.rate or None,
+            "effective_rate": round(self.effective_rate(), 2),
+            "concurrency_limit": int(limit) or None,
+            "max_concurrency": self.max_concurrency or None,
+            "in_flight": in_flight,
+            "baseline_latency_ms": round(baseline * 1000, 1) if baseline is not None else None,
+        }
@@ -0,0 +1,112 @@
+"""
+Retries and circuit breaking for requests to Sonarr/Radarr.
+
+RetryPolicy spaces retries with exponential backoff and full jitter, so clients
+that failed together don't retry in lockstep. CircuitBreaker (one per
+instance) stops sending requests after a run of consecutive failures: while it
+is open, requests fail at once with CircuitOpenError, which ends the sweep
+instead of grinding through every remaining item against a server that is
+down. After the cooldown a single trial request decides whether it closes.
+
+run_with_item_retries re-runs a scoped job for just the series/movies that
+failed in a run, rather than repeating the whole run; retry_call retries work
+the client can't retry by itself, such as reading a streamed listing.
+"""
+import logging
+import random
+import threading
+import time
+import requests
+
+log = logging.getLogger("arr_client")
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of sending a request while the instance's circuit breaker is open."""
+
+class RetryPolicy:
+    def __init__(self, retries=3, backoff=1.0, max_backoff=30.0):
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def delay(self, attempt):
+        """Seconds to wait before retry number `attempt` (from 1): uniform over [0, backoff * 2^(attempt-1)], capped."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failed requests and rejects requests for
+    `cooldown` seconds. Then one trial request is let through (half-open): a
+    success closes the breaker, a failure opens it for another cooldown.
+    """
+    def __init__(self, threshold=5, cooldown=60.0, name=""):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.name = name
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self._opened_at >= self.cooldown else "open"
+
+    def before_request(self):
+        """Raise CircuitOpenError unless a request may be sent now."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.cooldown - (time.monotonic() - self._opened_at)
+            if remaining > 0 or self._trial:
+                raise CircuitOpenError(f"{self.name} is unavailable (circuit breaker open, retry in {max(remaining, 0):.0f}s)")
+            self._trial = True
+
+    def record(self, ok):
+        """Record a request's outcome. Returns True if this failure opened the breaker."""
+        with self._lock:
+            self._trial = False
+            if ok:
+                self._failures = 0
+                self._opened_at = None
+                return False
+            self._failures += 1
+            was_open = self._opened_at is not None
+            if was_open or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            return not was_open and self._opened_at is not None
+
+def run_with_item_retries(run, item_ids, policy, retries, logger, noun):
+    """
+    Call `run(item_ids)`, which returns the IDs of the items that failed, then re-run it
+    scoped to those, up to `retries` times with `policy` backoff. Returns the IDs still failing.
+    """
+    failed = run(item_ids)
+    for attempt in range(1, retries + 1):
+        if not failed:
+            return failed
+        delay = policy.delay(attempt)
+        logger.warning("%d %s failed, retrying them in %.1fs (retry %d/%d)", len(failed), noun, delay, attempt, retries)
+        time.sleep(delay)
+        failed = run(sorted(failed))
+    if failed:
+        logger.error("Giving up on %d %s until the next run: %s", len(failed), noun, sorted(failed))
+    return failed
+
+def retry_call(func, policy, logger, what, retry_on=requests.exceptions.RequestException):
+    """Call `func()`, retrying it with `policy` backoff while it raises `retry_on` (CircuitOpenError
+    excepted). For calls the client can't retry by itself, e.g. reading a streamed body."""
+    for attempt in range(1, policy.retries + 2):
+        try:
+            return func()
+        except CircuitOpenError:
+            raise
+        except retry_on as e:
+            if attempt > policy.retries:
+                raise
+            delay = policy.delay(attempt)
+            logger.warning("%s failed (%s), retry %d/%d in %.1fs", what, e, attempt, policy.retries, delay)
+            time.sleep(delay)
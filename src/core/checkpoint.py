@@ -0,0 +1,88 @@
+"""
+Checkpoints of full sweeps, so a sweep interrupted by a crash or restart resumes where it stopped.
+
+A checkpointed sweep works through its items in batches. A batch's writes are
+saved as the pending batch before they are sent, and the number of them sent
+is saved after each one; when the batch is done its items are recorded as processed, with
+their next transition instant. The next full sweep of the same job (with the
+same settings, within CHECKPOINT_MAX_AGE_HOURS) first sends the writes still
+pending, then skips the processed items, so applied writes are not replayed.
+The checkpoint is removed once the sweep completes.
+
+Checkpoints are kept in the state store database under DATA_DIR
+(CHECKPOINT_SWEEPS=1). Scoped runs are not checkpointed.
+"""
+import json
+import logging
+from core.config import Config
+from core.state_store import get_checkpoint_store
+
+log = logging.getLogger("checkpoint")
+
+class SweepCheckpoint:
+    def __init__(self, store, job, settings, now_ts):
+        """Resume the checkpoint of `job` if it was started with the same `settings` fingerprint
+        and is recent enough, else start a new one."""
+        self.store = store
+        self.job = job
+        self.pending = None   # {"items": [...], "writes": [[method, path, payload], ...], "due": {id: ts}}
+        self.sent = 0         # writes of the pending batch already sent
+        self.processed = {}   # item id -> next transition (epoch seconds) or None
+        saved = store.load_checkpoint(job)
+        self.resumed = (saved is not None and saved[0] == settings
+                        and now_ts - saved[1] < Config.CHECKPOINT_MAX_AGE_HOURS * 3600)
+        if self.resumed:
+            _, _, pending, self.sent, self.processed = saved
+            self.pending = json.loads(pending) if pending else None
+        else:
+            store.start_checkpoint(job, settings, now_ts)
+
+    def begin(self, items, writes, due):
+        """Save a batch's writes as pending before they are sent. `due` maps item ids to their next transition."""
+        items = list(items)
+        self.pending = {"items": items, "writes": [list(w) for w in writes],
+                        "due": {str(i): due[i] for i in items if i in due}}
+        self.sent = 0
+        self.store.save_pending(self.job, json.dumps(self.pending))
+
+    def mark_sent(self):
+        """Count the next pending write as sent. Only the count is saved, not the batch."""
+        if self.pending and self.sent < len(self.pending["writes"]):
+            self.sent += 1
+            self.store.save_sent(self.job, self.sent)
+
+    def done(self, items, due, failed=()):
+        """Record a batch's items as processed (except `failed` ones) and clear the pending batch."""
+        rows = [(i, due.get(i)) for i in items if i not in failed]
+        self.store.save_progress(self.job, rows)
+        self.processed.update(rows)
+        self.pending = None
+        self.sent = 0
+
+    def send_pending(self, send):
+        """Send the writes left pending by the interrupted sweep with `send(writes)`, which returns
+        the failed ones, and record their batch as processed. If a write failed, it can't be told
+        which items it covered: the whole batch is left to be evaluated again."""
+        if not self.pending:
+            return
+        items = self.pending["items"]
+        due = {int(i): ts for i, ts in self.pending["due"].items()}
+        writes = self.pending["writes"][self.sent:]
+        log.info("%s: sending %d write(s) left pending by the interrupted sweep", self.job, len(writes))
+        failed = send(writes)
+        self.done(items, due, items if failed else ())
+
+    def finish(self):
+        """Remove the checkpoint of the completed sweep."""
+        self.store.clear_checkpoint(self.job)
+
+def start(job, settings, now_ts):
+    """Checkpoint of a full sweep of `job` (resuming the interrupted one, if any),
+    or None when CHECKPOINT_SWEEPS is disabled."""
+    store = get_checkpoint_store()
+    if store is None:
+        return None
+    checkpoint = SweepCheckpoint(store, job, settings, now_ts)
+    if checkpoint.resumed:
+        log.info("%s: resuming interrupted sweep, %d item(s) already processed", job, len(checkpoint.processed))
+    return checkpoint
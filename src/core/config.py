@@ -10,10 +10,55 @@ def env_int(name: str, default: str="0") -> int:
     except Exception:
         return int(default)
 
+def env_float(name: str, default: str="0") -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except Exception:
+        return float(default)
+
+# Settings that can be set per instance: <APP>_<SETTING> for the default instance,
+# <APP>_<NAME>_<SETTING> for a named one; unset ones fall back to UPSTREAM_<SETTING>
+INSTANCE_SETTINGS = ("RATE_LIMIT", "BURST", "MAX_CONCURRENCY")
+
+def env_instance_settings(app: str) -> dict:
+    """Per-instance settings of the default instance of `app`, {SETTING: value} for those set."""
+    return {s: os.environ[f"{app}_{s}"] for s in INSTANCE_SETTINGS if f"{app}_{s}" in os.environ}
+
+def env_instances(app: str) -> dict:
+    """
+    Named extra instances of `app` ('SONARR'/'RADARR'): <APP>_INSTANCES lists the names
+    (e.g. "4k,anime"), each configured by <APP>_<NAME>_URL, <APP>_<NAME>_API_KEY and any
+    other <APP>_<NAME>_<SETTING> variable. Returns {name: {SETTING: value}}.
+    """
+    instances = {}
+    for name in os.environ.get(f"{app}_INSTANCES", "").split(","):
+        name = name.strip().lower()
+        if not name or name in instances:
+            continue
+        prefix = f"{app}_{name.upper().replace('-', '_')}_"
+        settings = {k[len(prefix):]: v for k, v in os.environ.items() if k.startswith(prefix)}
+        settings["URL"] = settings.get("URL", "").rstrip("/")
+        settings.setdefault("API_KEY", "")
+        instances[name] = settings
+    return instances
+
 class Config:
     # General
     TZ                 = os.environ.get("TZ", "UTC")
     SLEEP_MINUTES      = env_int("SLEEP_MINUTES", "30")  # loop interval
+    SCHEDULER_MODE     = os.environ.get("SCHEDULER_MODE", "interval").lower()  # interval|event
+    FULL_SWEEP_MINUTES = env_int("FULL_SWEEP_MINUTES", "360")  # safety-net sweep interval in event mode
+
+    # Job queue: coalesced jobs wait this long after the last trigger (capped) before running
+    JOB_DEBOUNCE_SECONDS     = env_int("JOB_DEBOUNCE_SECONDS", "0")
+    JOB_DEBOUNCE_MAX_SECONDS = env_int("JOB_DEBOUNCE_MAX_SECONDS", "300")
+    JOB_QUEUE_MAX_SIZE       = env_int("JOB_QUEUE_MAX_SIZE", "10000")  # queued jobs + scoped item IDs; 0 = unbounded
+    JOB_HISTORY_SIZE         = env_int("JOB_HISTORY_SIZE", "200")  # recent jobs kept for GET /jobs
+
+    # Webhook server
+    WEBHOOK_THREADS             = env_int("WEBHOOK_THREADS", "8")
+    WEBHOOK_RETRY_AFTER_SECONDS = env_int("WEBHOOK_RETRY_AFTER_SECONDS", "30")  # sent with 429 when the queue is full
+
     AUTO_TAG_NAME      = os.environ.get("AUTO_TAG_NAME", "auto-unmonitored")
     IGNORE_TAG_NAME    = os.environ.get("IGNORE_TAG_NAME", "ignore")
     DELAY_MINUTES      = env_int("DELAY_MINUTES", "120")
@@ -25,18 +70,58 @@ class Config:
     RADARR_API_KEY     = os.environ.get("RADARR_API_KEY", "")
     PREFERRED_RELEASE  = os.environ.get("PREFERRED_RELEASE", "either").lower()  # digital|physical|either
     IGNORE_INCINEMAS   = env_bool("IGNORE_INCINEMAS", "0")
+    RADARR_INSTANCES   = env_instances("RADARR")  # extra named instances, e.g. a 4K Radarr
+    RADARR_SETTINGS    = env_instance_settings("RADARR")
 
     # Sonarr
     ENABLE_SONARR         = env_bool("ENABLE_SONARR", "1")
     SONARR_URL            = os.environ.get("SONARR_URL", "").rstrip("/")
     SONARR_API_KEY        = os.environ.get("SONARR_API_KEY", "")
+    SONARR_INSTANCES      = env_instances("SONARR")  # extra named instances, e.g. a 4K Sonarr
+    SONARR_SETTINGS       = env_instance_settings("SONARR")
     SEASON_PACK_MODE      = env_bool("SEASON_PACK_MODE", "0")
     SEASON_PACK_MODE_TAG  = os.environ.get("SEASON_PACK_MODE_TAG", "season-pack")
+    EPISODE_FETCH_CONCURRENCY = env_int("EPISODE_FETCH_CONCURRENCY", "8")  # series whose episodes are fetched at once
 
     # Re-monitoring windows (0 = disabled/unlimited)
     RADARR_REMONITOR_WINDOW_DAYS = env_int("RADARR_REMONITOR_WINDOW_DAYS", "30")
     SONARR_REMONITOR_WINDOW_DAYS = env_int("SONARR_REMONITOR_WINDOW_DAYS", "14")
 
+    # HTTP client (shared per-instance session towards Sonarr/Radarr)
+    HTTP_TIMEOUT_SECONDS = env_int("HTTP_TIMEOUT_SECONDS", "30")
+    HTTP_POOL_SIZE       = env_int("HTTP_POOL_SIZE", "10")
+    EDITOR_BATCH_SIZE    = env_int("EDITOR_BATCH_SIZE", "500")  # max ids per bulk editor/monitor request
+    TAG_CACHE_SECONDS    = env_int("TAG_CACHE_SECONDS", "300")  # reuse the fetched tag list this long (0 = every run)
+
+    # Retries: idempotent requests are retried on connection errors, timeouts, 5xx and 429 with
+    # exponential backoff and jitter; series/movies that still fail are retried in scoped re-runs
+    HTTP_RETRIES               = env_int("HTTP_RETRIES", "3")
+    HTTP_RETRY_BACKOFF_SECONDS = env_float("HTTP_RETRY_BACKOFF_SECONDS", "1")  # doubles per retry, max 30s
+    ITEM_RETRIES               = env_int("ITEM_RETRIES", "2")
+    CIRCUIT_BREAKER_FAILURES   = env_int("CIRCUIT_BREAKER_FAILURES", "5")  # failures in a row that stop requests, 0 = off
+    CIRCUIT_BREAKER_SECONDS    = env_int("CIRCUIT_BREAKER_SECONDS", "60")
+
+    # Client-side limits per instance (overridable per instance, see INSTANCE_SETTINGS)
+    UPSTREAM_RATE_LIMIT      = env_float("UPSTREAM_RATE_LIMIT", "0")  # requests/s, 0 = unlimited
+    UPSTREAM_BURST           = env_int("UPSTREAM_BURST", "10")
+    UPSTREAM_MAX_CONCURRENCY = env_int("UPSTREAM_MAX_CONCURRENCY", "8")  # adaptive (AIMD) ceiling, 0 = unlimited
+
+    # Incremental sync (state store under DATA_DIR)
+    DATA_DIR                        = os.environ.get("DATA_DIR", "data")
+    INCREMENTAL_SYNC                = env_bool("INCREMENTAL_SYNC", "0")
+    INCREMENTAL_FULL_REFRESH_HOURS  = env_int("INCREMENTAL_FULL_REFRESH_HOURS", "24")
+
+    # Checkpointed sweeps (state store under DATA_DIR): a full sweep interrupted by a restart resumes
+    CHECKPOINT_SWEEPS         = env_bool("CHECKPOINT_SWEEPS", "0")
+    CHECKPOINT_BATCH_SIZE     = env_int("CHECKPOINT_BATCH_SIZE", "200")  # Sonarr series per checkpointed batch
+    CHECKPOINT_MAX_AGE_HOURS  = env_int("CHECKPOINT_MAX_AGE_HOURS", "24")  # older checkpoints start over
+
+    # Decision engine: python (default) or numpy (optional dependency, batch evaluation for large libraries)
+    DECISION_ENGINE = os.environ.get("DECISION_ENGINE", "python").lower()
+
+    # Profiling: wrap the next N jobs after startup with cProfile/tracemalloc (reports in DATA_DIR/profiles)
+    PROFILE_JOBS = env_int("PROFILE_JOBS", "0")
+
     # Dry run
     DRY_RUN            = env_bool("DRY_RUN", "1")
 
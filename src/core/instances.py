@@ -0,0 +1,103 @@
+"""
+Sonarr/Radarr instances.
+
+Each app has a default instance (SONARR_URL / RADARR_URL) plus any named ones
+listed in SONARR_INSTANCES / RADARR_INSTANCES (see env_instances in config).
+An instance's key ('sonarr' for the default, 'sonarr-4k' for one named 4k) is
+its job type: it gets its own job lock, worker thread, webhook route, metrics
+label, transition schedule and state store rows, so instances are swept
+concurrently and independently in one process.
+
+A job for a named instance runs inside `running(instance)`; the app code it
+calls reads the instance back with `current(app)`.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from typing import NamedTuple
+from core.config import Config
+
+APPS = ("radarr", "sonarr")
+
+_local = threading.local()
+
+class Instance(NamedTuple):
+    app: str           # 'sonarr' or 'radarr'
+    name: str          # "" for the default instance
+    url: str
+    api_key: str
+    settings: dict = None  # per-instance settings, see INSTANCE_SETTINGS in config
+
+    @property
+    def key(self):
+        """Job type / label of the instance, e.g. 'sonarr' or 'sonarr-4k'."""
+        return f"{self.app}-{self.name}" if self.name else self.app
+
+    def state_kind(self, kind):
+        """State store kind of this instance's rows; the default instance keeps the plain kind."""
+        return f"{self.key}:{kind}" if self.name else kind
+
+    def setting(self, name, default=None):
+        return (self.settings or {}).get(name, default)
+
+    def limits(self):
+        """(rate, burst, max_concurrency) of the requests sent to this instance: its own
+        settings where set, else UPSTREAM_RATE_LIMIT / UPSTREAM_BURST / UPSTREAM_MAX_CONCURRENCY."""
+        return (_number(self.setting("RATE_LIMIT"), float, Config.UPSTREAM_RATE_LIMIT),
+                _number(self.setting("BURST"), int, Config.UPSTREAM_BURST),
+                _number(self.setting("MAX_CONCURRENCY"), int, Config.UPSTREAM_MAX_CONCURRENCY))
+
+def _number(value, kind, default):
+    try:
+        return kind(value) if value not in (None, "") else default
+    except ValueError:
+        return default
+
+def default(app, config=Config):
+    """The default (unnamed) instance of `app`."""
+    prefix = app.upper()
+    return Instance(app, "", getattr(config, f"{prefix}_URL"), getattr(config, f"{prefix}_API_KEY"),
+                    getattr(config, f"{prefix}_SETTINGS"))
+
+def named(app, config=Config):
+    """The named instances of `app`, in configuration order."""
+    return [Instance(app, name, s["URL"], s["API_KEY"], s)
+            for name, s in getattr(config, f"{app.upper()}_INSTANCES").items()]
+
+def configured(config=Config):
+    """Every instance: per app, the default one followed by the named ones."""
+    return [inst for app in APPS for inst in [default(app, config), *named(app, config)]]
+
+def enabled(config=Config):
+    """Instances of the apps enabled with ENABLE_RADARR / ENABLE_SONARR."""
+    return [inst for inst in configured(config) if getattr(config, f"ENABLE_{inst.app.upper()}")]
+
+def find(key):
+    """The configured instance with job type `key`, or None."""
+    return next((inst for inst in configured() if inst.key == key), None)
+
+@contextmanager
+def running(instance):
+    """Make `instance` the current instance of this thread (None = the app's default)."""
+    previous = getattr(_local, "instance", None)
+    _local.instance = instance
+    try:
+        yield
+    finally:
+        _local.instance = previous
+
+def current(app):
+    """The named instance of `app` this thread runs a job for, or None for the default instance."""
+    instance = getattr(_local, "instance", None)
+    return instance if instance is not None and instance.app == app else None
+
+class InstanceLogger(logging.LoggerAdapter):
+    """Logger adapter that prefixes messages with the instance name while a named instance's job runs."""
+    def __init__(self, logger):
+        super().__init__(logger, {})
+
+    def process(self, msg, kwargs):
+        instance = getattr(_local, "instance", None)
+        if instance is not None and instance.name:
+            msg = f"[{instance.name}] {msg}"
+        return msg, kwargs
@@ -1,15 +1,12 @@
 import logging
+from core import instances, vectorized
 from core.config import Config
 
 log = logging.getLogger("runner")
 
 def get_enabled_apps():
-    """Reads config and returns a list of enabled apps"""
-    enabled_apps = []
-    if Config.ENABLE_RADARR:
-        enabled_apps.append("radarr")
-    if Config.ENABLE_SONARR:
-        enabled_apps.append("sonarr")
+    """Reads config and returns the job types of the enabled app instances ('radarr', 'sonarr-4k', ...)"""
+    enabled_apps = [inst.key for inst in instances.enabled()]
     log.debug(f"Enabled apps: {enabled_apps}")
     return enabled_apps
 
@@ -19,4 +16,10 @@ def initialise_environment():
     enabled_apps = get_enabled_apps()
     if not enabled_apps:
         log.warning("No apps enabled! Check ENABLE_RADARR and ENABLE_SONARR settings.")
+    for inst in instances.enabled():
+        if inst.name and not (inst.url and inst.api_key):
+            prefix = f"{inst.app}_{inst.name}".upper().replace("-", "_")
+            log.warning(f"Instance {inst.key} has no URL or API key, set {prefix}_URL and {prefix}_API_KEY.")
+    if Config.DECISION_ENGINE == "numpy" and not vectorized.available():
+        log.warning("DECISION_ENGINE=numpy but NumPy is not installed, using the python engine.")
     return enabled_apps
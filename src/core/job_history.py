@@ -0,0 +1,61 @@
+"""
+Status of recent jobs, for the job status API (GET /jobs, GET /jobs/<id>).
+
+add_job registers each new job with its ID; the JobWorker records when it
+started and finished and its outcome. Callers can wait for a job to finish
+(long-polling) instead of sleeping for a fixed time. Only the last `size` jobs
+are kept.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+class JobHistory:
+    def __init__(self, size=200):
+        self.size = size
+        self._jobs = OrderedDict()  # job id -> Job, oldest first
+        self._cond = threading.Condition()
+
+    def add(self, job):
+        """Register a newly queued job."""
+        with self._cond:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.size:
+                self._jobs.popitem(last=False)
+
+    def started(self, job):
+        with self._cond:
+            job.started = time.time()
+
+    def finished(self, job, outcome, error=None):
+        """Record the job's outcome ('success' or 'error') and wake up the callers waiting for it."""
+        with self._cond:
+            job.finished = time.time()
+            job.outcome = outcome
+            job.error = error
+            self._cond.notify_all()
+
+    def get(self, job_id):
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def wait(self, job_id, timeout):
+        """Return the job once it has finished, or as it is after `timeout` seconds (None if unknown)."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                job = self._jobs.get(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job.finished is not None or remaining <= 0:
+                    return job
+                self._cond.wait(remaining)
+
+    def recent(self, job_type=None, limit=None):
+        """Jobs newest first, optionally only those of `job_type`."""
+        with self._cond:
+            jobs = [job for job in reversed(self._jobs.values()) if job_type is None or job.job_type == job_type]
+        return jobs[:limit] if limit else jobs
+
+    def clear(self):
+        with self._cond:
+            self._jobs.clear()
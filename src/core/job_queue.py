@@ -1,66 +1,266 @@
-__all__ = ["job_queue", "job_locks", "add_job", "worker_thread", "enqueue_job", "start_job_queue", "add_job_to_queue"]
+__all__ = ["Job", "job_queue", "job_history", "job_locks", "add_job", "worker_thread", "worker_threads", "enqueue_job", "start_job_queue", "add_job_to_queue"]
 from common.logger import get_logger
+import queue
 import threading
-from queue import Queue
+import itertools
+import time
+import uuid
+from collections import Counter, deque
+from core import instances, metrics
+from core.config import Config
+from core.job_history import JobHistory
 from core.job_worker import JobWorker  # Import the job processing class
 
 logger = get_logger(__name__)
 
+# Job IDs: a per-process prefix, so IDs from before a restart are not reused, and a counter
+_JOB_ID_PREFIX = uuid.uuid4().hex[:8]
+_job_ids = itertools.count(1)
+
+class Job:
+    """
+    A queued job. Unpacks like the legacy (job_type, triggered_by) tuple.
+    `item_ids` scopes the job to specific series/movie IDs; None means a full sweep.
+    `queued`, `started` and `finished` are epoch timestamps (the latter two None until
+    the worker gets there); `outcome` is 'success' or 'error' once finished.
+    """
+    __slots__ = ("id", "job_type", "triggered_by", "item_ids", "queued_at", "ready_at", "_seen",
+                 "queued", "started", "finished", "outcome", "error")
+
+    def __init__(self, job_type, triggered_by="scheduler", item_ids=None):
+        self.id = f"{_JOB_ID_PREFIX}-{next(_job_ids)}"
+        self.job_type = job_type
+        self.triggered_by = triggered_by
+        self.item_ids = item_ids
+        self.queued_at = self.ready_at = time.monotonic()
+        self._seen = None  # set of item_ids, built on the first merge
+        self.queued = time.time()
+        self.started = self.finished = self.outcome = self.error = None
+
+    @property
+    def status(self):
+        if self.finished is not None:
+            return self.outcome
+        return "running" if self.started is not None else "queued"
+
+    def to_dict(self, item_ids=False):
+        """Status of the job for the job status API; with `item_ids`, including the scoped IDs."""
+        def elapsed(start, end):
+            return round(end - start, 3) if start is not None and end is not None else None
+        data = {
+            "id": self.id, "job": self.job_type, "triggered_by": self.triggered_by, "status": self.status,
+            "items": len(self.item_ids) if self.item_ids is not None else None,
+            "queued": self.queued, "started": self.started, "finished": self.finished,
+            "wait_seconds": elapsed(self.queued, self.started), "run_seconds": elapsed(self.started, self.finished),
+        }
+        if self.error is not None:
+            data["error"] = self.error
+        if item_ids:
+            data["item_ids"] = self.item_ids
+        return data
+
+    @property
+    def key(self):
+        """Pending jobs with the same key are coalesced into one."""
+        return (self.job_type, self.triggered_by)
+
+    @property
+    def size(self):
+        """Queue capacity the job takes up: one per scoped item ID, one for a full sweep."""
+        return 1 if self.item_ids is None else max(1, len(self.item_ids))
+
+    def growth(self, other):
+        """How much merging `other` (same key) into this job would grow its size."""
+        if self.item_ids is None:
+            return 0
+        if other.item_ids is None:
+            return 1 - self.size
+        seen = self._seen if self._seen is not None else set(self.item_ids)
+        added = len(set(other.item_ids).difference(seen))
+        return max(1, len(self.item_ids) + added) - self.size
+
+    def merge(self, other):
+        """Absorb `other` (same key): a full sweep covers everything, scoped jobs union their IDs."""
+        if self.item_ids is None or other.item_ids is None:
+            self.item_ids = None
+            self._seen = None
+            return
+        if self._seen is None:
+            # Copied so the caller's list isn't extended; merging is then linear in the new IDs only
+            self.item_ids = list(self.item_ids)
+            self._seen = set(self.item_ids)
+        for i in other.item_ids:
+            if i not in self._seen:
+                self._seen.add(i)
+                self.item_ids.append(i)
+
+    def __iter__(self):
+        return iter((self.job_type, self.triggered_by))
+
+    def __repr__(self):
+        scope = f", item_ids={self.item_ids}" if self.item_ids is not None else ""
+        return f"Job({self.job_type!r}, triggered_by={self.triggered_by!r}{scope})"
+
 class JobQueueWrapper:
-    def __init__(self):
-        self._queue = Queue()
+    """
+    FIFO job queue that coalesces pending jobs with the same key and debounces them.
+
+    A Job put while another with the same (job_type, triggered_by) is still pending
+    is merged into it instead of being queued again. Each merge pushes the pending
+    job's ready time out by `debounce_seconds` (capped at `max_debounce_seconds`
+    after it was first queued), so a burst of triggers results in a single run.
+    Other items (legacy tuples) are queued as-is.
+
+    The queue holds at most `max_size` entries (0 = unbounded), counting each job's
+    size (one per scoped item ID, one for a full sweep) and one per other item. A
+    put that would grow it beyond that raises queue.Full; puts that don't grow it,
+    such as a full sweep absorbing pending scoped jobs, are always accepted.
+    """
+    def __init__(self, debounce_seconds=0, max_debounce_seconds=300, max_size=0):
+        self.debounce_seconds = debounce_seconds
+        self.max_debounce_seconds = max_debounce_seconds
+        self.max_size = max_size
+        self._items = deque()
+        self._pending = {}
+        self._size = 0
+        self._cond = threading.Condition()
+        self.coalesced = Counter()
+        self.rejected = Counter()
 
     def put(self, item):
-        self._queue.put(item)
+        """Queue `item` and return the job that will run it (an existing pending job if coalesced).
+        Raises queue.Full if the queue has no room for it."""
+        with self._cond:
+            if isinstance(item, Job):
+                now = time.monotonic()
+                existing = self._pending.get(item.key)
+                growth = existing.growth(item) if existing is not None else item.size
+                self._reserve(growth, item.job_type)
+                if existing is not None:
+                    existing.merge(item)
+                    existing.ready_at = min(now + self.debounce_seconds,
+                                            existing.queued_at + self.max_debounce_seconds)
+                    self.coalesced[item.job_type] += 1
+                    metrics.JOBS_COALESCED.inc(app=item.job_type)
+                    logger.debug(f"Coalesced {item!r} into pending {existing!r}")
+                    self._cond.notify_all()
+                    return existing
+                item.ready_at = now + self.debounce_seconds
+                self._pending[item.key] = item
+            else:
+                self._reserve(1, None)
+            self._items.append(item)
+            self._cond.notify_all()
+            return item
+
+    def _reserve(self, growth, job_type):
+        if growth > 0 and self.max_size > 0 and self._size + growth > self.max_size:
+            self.rejected[job_type] += 1
+            raise queue.Full(f"job queue is full ({self._size}/{self.max_size})")
+        self._size += growth
 
-    def get(self):
-        return self._queue.get()
+    def get(self, accept=None):
+        """
+        Block until a job is ready and return the oldest ready one.
+        With `accept`, only items for which accept(item) is true are considered,
+        so per-type workers never wait behind another app's jobs.
+        """
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                next_ready = None
+                for item in self._items:
+                    if accept is not None and not accept(item):
+                        continue
+                    ready_at = getattr(item, "ready_at", now)
+                    if ready_at <= now:
+                        self._items.remove(item)
+                        if isinstance(item, Job):
+                            self._size -= item.size
+                            if self._pending.get(item.key) is item:
+                                del self._pending[item.key]
+                        else:
+                            self._size -= 1
+                        return item
+                    if next_ready is None or ready_at < next_ready:
+                        next_ready = ready_at
+                self._cond.wait(None if next_ready is None else next_ready - now)
 
     def empty(self):
-        return self._queue.empty()
+        return len(self) == 0
 
     def enqueue(self, item):
-        self._queue.put(item)
+        self.put(item)
 
     def is_empty(self):
-        return self._queue.empty()
+        return self.empty()
 
     def __len__(self):
-        return self._queue.qsize()
+        with self._cond:
+            return len(self._items)
 
     def clear(self):
-        while not self._queue.empty():
-            self._queue.get()
+        with self._cond:
+            self._items.clear()
+            self._pending.clear()
+            self._size = 0
+
+    def stats(self):
+        """Pending job count, queued entries against the bound, and jobs coalesced and rejected per job type."""
+        with self._cond:
+            return {"pending": len(self._items), "size": self._size, "max_size": self.max_size,
+                    "coalesced": dict(self.coalesced),
+                    "rejected": {k: v for k, v in self.rejected.items() if k is not None}}
 
 # Global queue used to store incoming jobs for processing
-job_queue = JobQueueWrapper()
+job_queue = JobQueueWrapper(Config.JOB_DEBOUNCE_SECONDS, Config.JOB_DEBOUNCE_MAX_SECONDS, Config.JOB_QUEUE_MAX_SIZE)
 
-# Locks to ensure only one job of each type runs at a time
-job_locks = {
-    'sonarr': threading.Lock(),
-    'radarr': threading.Lock()
-}
+# Recent jobs by ID, for the job status API
+job_history = JobHistory(Config.JOB_HISTORY_SIZE)
 
-def add_job(job_type, triggered_by="scheduler"):
+# Locks to ensure only one job of each type (app instance) runs at a time
+job_locks = {inst.key: threading.Lock() for inst in instances.configured()}
+
+def add_job(job_type, triggered_by="scheduler", item_ids=None):
     """
     Add a job to the queue for processing.
 
     Args:
-        job_type (str): Type of the job ('sonarr' or 'radarr').
+        job_type (str): Type of the job ('sonarr', 'radarr' or a named instance such as 'sonarr-4k').
         triggered_by (str): Source of the trigger ('scheduler' or 'webhook').
+        item_ids (list): Series/movie IDs to process; None for a full sweep.
+
+    Returns:
+        Job: The queued job (or the pending job it was coalesced into), whose `id` can be
+        looked up in job_history; None if the job type is unknown or the queue is full.
     """
     if job_type not in job_locks:
         logger.warning(f"Unknown job type: {job_type}")
-        return
+        return None
 
-    logger.debug(f"Queuing job: {job_type} (triggered_by={triggered_by})")
-    job_queue.put((job_type, triggered_by))
+    logger.debug(f"Queuing job: {job_type} (triggered_by={triggered_by}, item_ids={item_ids})")
+    job = Job(job_type, triggered_by, item_ids)
+    try:
+        queued = job_queue.put(job)
+    except queue.Full as e:
+        # Counted rather than logged at warning level: a webhook storm would flood the log
+        logger.debug(f"Dropped {job_type} job (triggered_by={triggered_by}): {e}")
+        metrics.JOBS_REJECTED.inc(app=job_type)
+        return None
+    if queued is job:
+        job_history.add(job)
+    return queued
 
 
-# Start the job worker thread to process jobs from the queue
-worker = JobWorker(job_queue, job_locks, logger)
-worker_thread = threading.Thread(target=worker.run, daemon=True)
-worker_thread.start()
+# Start one worker thread per job type, so a long sweep of one app instance never
+# blocks the other instances' jobs; the per-type locks still serialise each instance
+workers = [JobWorker(job_queue, job_locks, logger, job_types=(job_type,), handle_unknown=(i == 0),
+                     history=job_history)
+           for i, job_type in enumerate(job_locks)]
+worker_threads = [threading.Thread(target=w.run, daemon=True, name=f"worker-{w.job_types[0]}") for w in workers]
+for t in worker_threads:
+    t.start()
+worker_thread = worker_threads[0]
 
 
 # Expose these for use in test files and other modules
@@ -70,7 +270,7 @@ def enqueue_job(job_type, payload=None):
 
 def start_job_queue():
     # Already started above during module import, but included here for consistency/testing
-    return worker_thread
+    return worker_threads
 
 # Alias for backward compatibility with older imports
 add_job_to_queue = enqueue_job
\ No newline at end of file
@@ -1,53 +1,104 @@
+import time
+from functools import partial
 from common.logger import get_logger
+from core import instances, metrics, profiling
 from radarr.radarr_app import run_radarr
 from sonarr.sonarr_app import run_job
 
 class JobWorker:
     """
     Continuously processes jobs from the queue.
-    Each job is a tuple: (job_type, triggered_by)
+    Each job unpacks to (job_type, triggered_by); jobs with `item_ids`
+    are scoped to those series/movies instead of a full sweep. Job types of
+    named instances ('sonarr-4k') run the app's job for that instance.
+    With `job_types`, the worker only takes jobs of those types from the queue
+    (plus jobs of unknown types if `handle_unknown`, so they are not left behind).
+    With `history` (a JobHistory), the start, end and outcome of each job with an
+    ID are recorded there.
     """
-    def __init__(self, job_queue, job_locks, logger):
+    def __init__(self, job_queue, job_locks, logger, job_types=None, handle_unknown=False, history=None):
         self.job_queue = job_queue
         self.job_locks = job_locks
         self.logger = logger
+        self.job_types = job_types
+        self.handle_unknown = handle_unknown
+        self.history = history
 
         # Map job types to their processing functions
         self.job_functions = {
             'radarr': run_radarr,
             'sonarr': run_job
         }
+        for app, func in (('radarr', run_radarr), ('sonarr', run_job)):
+            for inst in instances.named(app):
+                self.job_functions[inst.key] = partial(func, instance=inst)
+
+    def accepts(self, job):
+        """Whether this worker should take `job` from the queue."""
+        try:
+            job_type = tuple(job)[0]
+        except Exception:
+            job_type = None
+        if job_type in self.job_types:
+            return True
+        return self.handle_unknown and job_type not in self.job_functions
 
     def run(self):
         """
         Main processing loop - runs continuously until the program exits.
         Pulls jobs from the queue and processes them one at a time.
         """
-        self.logger.info("Job worker started and waiting for jobs...")
+        if self.job_types:
+            self.logger.info(f"Job worker for {', '.join(self.job_types)} started and waiting for jobs...")
+        else:
+            self.logger.info("Job worker started and waiting for jobs...")
 
         while True:
             try:
                 # Block until a job is available in the queue
-                job_type, triggered_by = self.job_queue.get()
+                job = self.job_queue.get(self.accepts) if self.job_types else self.job_queue.get()
+                job_type, triggered_by = job
+                item_ids = getattr(job, "item_ids", None)
+                tracked = self.history is not None and hasattr(job, "id")
 
                 if job_type not in self.job_functions:
                     self.logger.error(f"Unknown job type: {job_type}")
+                    if tracked:
+                        self.history.finished(job, "error", f"Unknown job type: {job_type}")
                     continue
 
                 # Acquire the lock for this job type to prevent concurrent execution
                 lock = self.job_locks.get(job_type)
                 if not lock:
                     self.logger.error(f"No lock found for job type: {job_type}")
+                    if tracked:
+                        self.history.finished(job, "error", f"No lock found for job type: {job_type}")
                     continue
 
+                scope = f" for {len(item_ids)} item(s)" if item_ids is not None else ""
                 with lock:
-                    self.logger.info(f"Starting {job_type} job (triggered_by={triggered_by})")
+                    self.logger.info(f"Starting {job_type} job{scope} (triggered_by={triggered_by})")
+                    if tracked:
+                        self.history.started(job)
+                    start = time.perf_counter()
+                    outcome = "success"
+                    error = None
                     try:
                         job_func = self.job_functions[job_type]
-                        job_func()
-                        self.logger.info(f"Completed {job_type} job (triggered_by={triggered_by})")
+                        with profiling.profile_job(job_type, f"{scope.strip()} (triggered_by={triggered_by})"):
+                            if item_ids is not None:
+                                job_func(item_ids=item_ids)
+                            else:
+                                job_func()
+                        self.logger.info(f"Completed {job_type} job{scope} (triggered_by={triggered_by})")
                     except Exception as e:
+                        outcome = "error"
+                        error = str(e) or type(e).__name__
                         self.logger.error(f"Error processing {job_type} job: {e}", exc_info=True)
+                    if tracked:
+                        self.history.finished(job, outcome, error)
+                    metrics.JOB_DURATION.observe(time.perf_counter() - start, app=job_type, trigger=triggered_by)
+                    metrics.JOBS.inc(app=job_type, trigger=triggered_by, outcome=outcome)
 
             except Exception as e:
                 self.logger.error(f"Unexpected error in job worker: {e}", exc_info=True)
\ No newline at end of file
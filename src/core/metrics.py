@@ -0,0 +1,151 @@
+"""
+Minimal Prometheus metrics, exposed as text on the webhook server's /metrics.
+
+Counters, gauges and histograms with labels, kept in process and rendered in
+the Prometheus text exposition format; no client library is required.
+"""
+import re
+import threading
+import time
+
+_registry = []
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels))
+
+    def _samples(self):
+        with self._lock:
+            return [(self.name, _labels(self.labelnames, key), value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name}{labels} {_number(value)}" for name, labels, value in self._samples()]
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=(0.1, 0.5, 1, 5, 10, 30, 60)):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * len(self.buckets), 0.0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    samples.append((f"{self.name}_bucket", _labels(self.labelnames, key, [("le", _number(bound))]), count))
+                samples.append((f"{self.name}_sum", _labels(self.labelnames, key), total))
+                samples.append((f"{self.name}_count", _labels(self.labelnames, key), counts[-1]))
+        return samples
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(m.render() for m in _registry) + "\n"
+
+
+JOB_DURATION = Histogram("unmonitarr_job_duration_seconds", "Duration of processed jobs.", ("app", "trigger"),
+                         buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600))
+JOBS = Counter("unmonitarr_jobs_total", "Processed jobs by outcome.", ("app", "trigger", "outcome"))
+QUEUE_DEPTH = Gauge("unmonitarr_queue_depth", "Jobs waiting in the queue.")
+JOBS_COALESCED = Counter("unmonitarr_jobs_coalesced_total", "Triggers merged into an already pending job.", ("app",))
+JOBS_REJECTED = Counter("unmonitarr_jobs_rejected_total", "Triggers rejected because the job queue was full.", ("app",))
+UPSTREAM_REQUESTS = Counter("unmonitarr_upstream_requests_total", "Requests sent to Sonarr/Radarr.",
+                            ("app", "method", "endpoint", "status"))
+UPSTREAM_LATENCY = Histogram("unmonitarr_upstream_request_duration_seconds", "Latency of requests to Sonarr/Radarr.",
+                             ("app", "method", "endpoint", "status"),
+                             buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+UPSTREAM_RATE_LIMIT = Gauge("unmonitarr_upstream_rate_limit", "Configured request rate limit (requests/s, 0 = none).",
+                            ("app",))
+UPSTREAM_EFFECTIVE_RATE = Gauge("unmonitarr_upstream_effective_rate",
+                                "Requests completed per second over the last 10 seconds.", ("app",))
+UPSTREAM_CONCURRENCY_LIMIT = Gauge("unmonitarr_upstream_concurrency_limit",
+                                   "Current adaptive limit on concurrent requests (0 = none).", ("app",))
+ITEMS = Counter("unmonitarr_items_total", "Items assessed, monitored and unmonitored.", ("app", "result"))
+LAST_RUN_ITEMS = Gauge("unmonitarr_last_run_items", "Items assessed, monitored and unmonitored by the last run.",
+                       ("app", "result"))
+LAST_SWEEP = Gauge("unmonitarr_last_successful_sweep_timestamp_seconds",
+                   "Unix time the last full sweep completed.", ("app",))
+LAST_SWEEP_DURATION = Gauge("unmonitarr_last_sweep_duration_seconds", "Duration of the last completed full sweep.",
+                            ("app",))
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+def endpoint(path):
+    """Path with numeric ids replaced, e.g. /api/v3/series/{id}, to keep label cardinality bounded."""
+    return _ID_SEGMENT.sub("/{id}", path)
+
+def observe_upstream(app, method, path, status, seconds):
+    labels = {"app": app, "method": method, "endpoint": endpoint(path), "status": status}
+    UPSTREAM_REQUESTS.inc(**labels)
+    UPSTREAM_LATENCY.observe(seconds, **labels)
+
+def record_run(app, assessed, monitored, unmonitored):
+    """Record the item counts of a completed Sonarr/Radarr run (or item retry)."""
+    for result, count in (("assessed", assessed), ("monitored", monitored), ("unmonitored", unmonitored)):
+        ITEMS.inc(count, app=app, result=result)
+        LAST_RUN_ITEMS.set(count, app=app, result=result)
+
+def record_sweep(app, started):
+    """Record a full sweep started at `started` (time.time()) that completed with no item still failing."""
+    now = time.time()
+    LAST_SWEEP.set(now, app=app)
+    LAST_SWEEP_DURATION.set(now - started, app=app)
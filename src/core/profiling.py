@@ -0,0 +1,134 @@
+"""
+On-demand profiling of live jobs.
+
+arm(n) (or PROFILE_JOBS=n at startup, or POST /admin/profile) wraps the next n
+jobs run by JobWorker with cProfile and tracemalloc. Each profiled job writes
+to DATA_DIR/profiles/:
+
+  <timestamp>-<app>.pstats   cProfile data (e.g. for snakeviz or pstats)
+  <timestamp>-<app>.txt      phase timings, top functions and top allocations
+
+Apps mark their phases (tag fetch, series fetch, episode fan-out, decision,
+writes) with `with phase("..."):`; outside a profiled job that is a no-op.
+The allocation report is taken at the end of the phase with the most memory
+in use, since most of a sweep's allocations are freed when it returns.
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from core.config import Config
+
+log = logging.getLogger("profiling")
+
+_lock = threading.Lock()
+_remaining = 0
+_active = threading.Lock()  # tracemalloc is process-wide: one profiled job at a time
+_local = threading.local()
+
+def arm(jobs):
+    """Profile the next `jobs` jobs (replaces any count still pending)."""
+    global _remaining
+    with _lock:
+        _remaining = max(0, int(jobs))
+    log.info("Profiling armed for the next %d job(s)", _remaining)
+
+def remaining():
+    with _lock:
+        return _remaining
+
+def _take():
+    global _remaining
+    with _lock:
+        if _remaining <= 0:
+            return False
+        _remaining -= 1
+        return True
+
+def profile_dir():
+    return os.path.join(Config.DATA_DIR, "profiles")
+
+def reports():
+    """Report files written so far, newest first."""
+    try:
+        return sorted((f for f in os.listdir(profile_dir()) if f.endswith(".txt")), reverse=True)
+    except FileNotFoundError:
+        return []
+
+@contextmanager
+def phase(name):
+    """Time a phase of the current job; recorded only while the job is being profiled."""
+    phases = getattr(_local, "phases", None)
+    if phases is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+        current, _ = tracemalloc.get_traced_memory()
+        if current > _local.snapshot_size:
+            _local.snapshot, _local.snapshot_size, _local.snapshot_phase = tracemalloc.take_snapshot(), current, name
+
+@contextmanager
+def profile_job(app, description=""):
+    """Profile the job run inside this block if profiling is armed, then write its reports."""
+    if not remaining() or not _active.acquire(blocking=False):
+        yield
+        return
+    try:
+        if not _take():
+            yield
+            return
+        profiler = cProfile.Profile()
+        _local.phases = {}
+        _local.snapshot, _local.snapshot_size, _local.snapshot_phase = None, -1, None
+        tracemalloc.start(10)
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - start
+            snapshot, at = _local.snapshot or tracemalloc.take_snapshot(), _local.snapshot_phase or "end of job"
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            phases, _local.phases, _local.snapshot = _local.phases, None, None
+            try:
+                path = _write_reports(app, description, profiler, snapshot, at, peak, duration, phases)
+                log.info("Profile of %s job written to %s", app, path)
+            except Exception as e:
+                log.error("Failed to write profile of %s job: %s", app, e)
+    finally:
+        _active.release()
+
+def _write_reports(app, description, profiler, snapshot, snapshot_at, peak, duration, phases):
+    os.makedirs(profile_dir(), exist_ok=True)
+    base = os.path.join(profile_dir(), f"{datetime.now():%Y%m%d-%H%M%S-%f}-{app}")
+    profiler.dump_stats(base + ".pstats")
+
+    out = io.StringIO()
+    out.write(f"Job: {app} {description}\nWall time: {duration:.3f}s\nPeak traced memory: {peak / 1024 / 1024:.1f} MiB\n\n")
+    out.write("Phases (wall clock):\n")
+    for name, seconds in phases.items():
+        out.write(f"  {name:<20}{seconds:>10.3f}s\n")
+    out.write(f"  {'other':<20}{duration - sum(phases.values()):>10.3f}s\n\n")
+    out.write("Top functions by cumulative time:\n")
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(30)
+    out.write(f"Top allocations (in use after {snapshot_at}):\n")
+    for stat in snapshot.statistics("lineno")[:20]:
+        out.write(f"  {stat}\n")
+    with open(base + ".txt", "w") as f:
+        f.write(out.getvalue())
+    return base + ".txt"
+
+if Config.PROFILE_JOBS:
+    arm(Config.PROFILE_JOBS)
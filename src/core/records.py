@@ -0,0 +1,151 @@
+"""
+Compact records of the library items a sweep decides on.
+
+The apps convert API payloads at ingest (from_api) into __slots__ records that
+keep only the decision fields, so the raw dicts are dropped as soon as they
+are read. Dates are pre-parsed into int microseconds since the epoch (None
+when absent or unparseable): the planners compare plain integers, which are
+exact and agree with datetime arithmetic.
+"""
+from datetime import datetime, timedelta, timezone
+
+AIR_FMT = "%Y-%m-%dT%H:%M:%SZ"
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def us(td):
+    """timedelta -> int microseconds."""
+    return (td.days * 86400 + td.seconds) * 1_000_000 + td.microseconds
+
+def epoch_us(dt):
+    """Aware datetime -> int microseconds since the epoch."""
+    return us(dt - EPOCH)
+
+def to_datetime(value):
+    """int microseconds since the epoch -> aware UTC datetime."""
+    return EPOCH + timedelta(microseconds=value)
+
+def seconds(value):
+    """int microseconds since the epoch (or None) -> epoch seconds as returned by datetime.timestamp()."""
+    return None if value is None else value / 1_000_000
+
+def format_air(value):
+    return to_datetime(value).strftime(AIR_FMT)
+
+def parse_air(value):
+    """Sonarr airDateUtc ('YYYY-MM-DDTHH:MM:SSZ') -> epoch microseconds, or None if it doesn't parse."""
+    if not value:
+        return None
+    try:
+        if (len(value) == 20 and value[:4].isdigit() and value[4] == value[7] == "-" and value[10] == "T"
+                and value[13] == value[16] == ":" and value[19] == "Z"):
+            # Much faster than strptime; falls back to it for anything fromisoformat rejects
+            try:
+                return epoch_us(datetime.fromisoformat(value[:19]).replace(tzinfo=timezone.utc))
+            except ValueError:
+                pass
+        return epoch_us(datetime.strptime(value, AIR_FMT).replace(tzinfo=timezone.utc))
+    except (TypeError, ValueError):
+        return None
+
+def parse_iso(value):
+    """Radarr release date (any ISO 8601 form, naive = UTC) -> epoch microseconds, or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    try:
+        dt = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return epoch_us(dt)
+
+
+class _Record:
+    __slots__ = ()
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def __eq__(self, other):
+        return type(other) is type(self) and all(getattr(self, n) == getattr(other, n) for n in self.__slots__)
+
+    __hash__ = None
+
+
+class Season(_Record):
+    __slots__ = ("number", "monitored", "statistics")
+
+    def __init__(self, number, monitored, statistics):
+        self.number = number
+        self.monitored = monitored
+        self.statistics = statistics  # sorted (key, value) pairs, only used to detect changes
+
+    @classmethod
+    def from_api(cls, s):
+        return cls(s.get("seasonNumber"), bool(s.get("monitored")), tuple(sorted((s.get("statistics") or {}).items())))
+
+
+class Series(_Record):
+    __slots__ = ("id", "title", "monitored", "tags", "seasons")
+
+    def __init__(self, id, title, monitored, tags, seasons):
+        self.id = id
+        self.title = title
+        self.monitored = monitored
+        self.tags = tags
+        self.seasons = seasons
+
+    @classmethod
+    def from_api(cls, s):
+        """Series from a /api/v3/series resource."""
+        return cls(s["id"], s.get("title", f"id:{s['id']}"), bool(s.get("monitored")), tuple(s.get("tags") or ()),
+                   tuple(Season.from_api(x) for x in s.get("seasons") or ()))
+
+
+class Episode(_Record):
+    __slots__ = ("id", "series_id", "season", "number", "title", "air", "has_air", "monitored", "has_file")
+
+    def __init__(self, id, series_id, season, number, title, air, has_air, monitored, has_file):
+        self.id = id
+        self.series_id = series_id
+        self.season = season
+        self.number = number
+        self.title = title
+        self.air = air            # epoch microseconds, None without a (parseable) air date
+        self.has_air = has_air    # an air date was given, even if it doesn't parse
+        self.monitored = monitored
+        self.has_file = has_file
+
+    @classmethod
+    def from_api(cls, e):
+        """Episode from a /api/v3/episode resource."""
+        air = e.get("airDateUtc")
+        return cls(e["id"], e.get("seriesId"), e.get("seasonNumber"), e.get("episodeNumber"),
+                   e.get("title", "Unknown Title"), parse_air(air), bool(air), bool(e.get("monitored", False)),
+                   bool(e.get("hasFile")))
+
+
+class Movie(_Record):
+    __slots__ = ("id", "title", "monitored", "tags", "has_file", "digital", "physical", "cinemas")
+
+    def __init__(self, id, title, monitored, tags, has_file, digital, physical, cinemas):
+        self.id = id
+        self.title = title
+        self.monitored = monitored
+        self.tags = tags
+        self.has_file = has_file
+        self.digital = digital    # release dates as epoch microseconds, None if absent or unparseable
+        self.physical = physical
+        self.cinemas = cinemas
+
+    @classmethod
+    def from_api(cls, m):
+        """Movie from a /api/v3/movie resource."""
+        has_file = bool(m["hasFile"]) if "hasFile" in m else bool(m.get("movieFile"))
+        return cls(m["id"], m.get("title", f"id:{m['id']}"), bool(m.get("monitored", False)), tuple(m.get("tags") or ()),
+                   has_file, parse_iso(m.get("digitalRelease")), parse_iso(m.get("physicalRelease")),
+                   parse_iso(m.get("inCinemas")))
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from core.config import Config
+
+log = logging.getLogger("state_store")
+
+# Decision recorded for items that needed no change on their last evaluation
+NOOP = "none"
+
+def fingerprint(*fields):
+    """Stable hash of the fields a monitor/unmonitor decision depends on."""
+    raw = json.dumps(fields, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+def next_boundary(now_ts, *instants):
+    """Return the earliest of `instants` (epoch seconds) still after `now_ts`, or None."""
+    future = [t for t in instants if t is not None and t > now_ts]
+    return min(future) if future else None
+
+class StateStore:
+    """
+    SQLite-backed record of each item's last-seen fingerprint and last decision.
+
+    Rows are keyed by (kind, item_id) where kind is 'series', 'episode' or
+    'movie'. `next_check` is the next release/threshold/window boundary after
+    the item was evaluated: until then an unchanged item will reach the same
+    decision. `due` is its next transition for the event scheduler, only set
+    for items unmonitarr manages.
+
+    The same database holds the checkpoints of full sweeps in progress (see
+    core.checkpoint): one sweep_checkpoint row per job with its pending write
+    batch and how many of its writes were sent, and the items it has processed
+    so far in sweep_progress.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS item_state ("
+                " kind TEXT NOT NULL,"
+                " item_id INTEGER NOT NULL,"
+                " fingerprint TEXT NOT NULL,"
+                " decision TEXT NOT NULL,"
+                " next_check REAL,"
+                " due REAL,"
+                " evaluated_at REAL NOT NULL,"
+                " PRIMARY KEY (kind, item_id))"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(item_state)")}
+            if "due" not in columns:
+                # Rows written before `due` was stored don't have it: drop them so every
+                # item is evaluated again once
+                self._conn.execute("DELETE FROM item_state")
+                self._conn.execute("ALTER TABLE item_state ADD COLUMN due REAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sweep_checkpoint ("
+                " job TEXT PRIMARY KEY,"
+                " settings TEXT NOT NULL,"
+                " started_at REAL NOT NULL,"
+                " pending TEXT,"
+                " sent INTEGER NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sweep_checkpoint)")}
+            if "sent" not in columns:
+                self._conn.execute("ALTER TABLE sweep_checkpoint ADD COLUMN sent INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sweep_progress ("
+                " job TEXT NOT NULL,"
+                " item_id INTEGER NOT NULL,"
+                " due REAL,"
+                " PRIMARY KEY (job, item_id))"
+            )
+
+    def load(self, kind):
+        """Return {item_id: (fingerprint, decision, next_check, due, evaluated_at)} for one kind."""
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT item_id, fingerprint, decision, next_check, due, evaluated_at FROM item_state WHERE kind = ?",
+                (kind,),
+            )
+            return {row[0]: row[1:] for row in cur}
+
+    def record(self, kind, rows, evaluated_at):
+        """Upsert (item_id, fingerprint, decision, next_check, due) rows for one kind."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO item_state (kind, item_id, fingerprint, decision, next_check, due, evaluated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(kind, item_id) DO UPDATE SET fingerprint = excluded.fingerprint,"
+                " decision = excluded.decision, next_check = excluded.next_check, due = excluded.due,"
+                " evaluated_at = excluded.evaluated_at",
+                [(kind, item_id, fp, decision, next_check, due, evaluated_at)
+                 for item_id, fp, decision, next_check, due in rows],
+            )
+
+    def load_checkpoint(self, job):
+        """Return (settings, started_at, pending, sent, {item_id: due}) of the job's sweep in progress, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT settings, started_at, pending, sent FROM sweep_checkpoint WHERE job = ?", (job,)).fetchone()
+            if row is None:
+                return None
+            cur = self._conn.execute("SELECT item_id, due FROM sweep_progress WHERE job = ?", (job,))
+            return row + ({item_id: due for item_id, due in cur},)
+
+    def start_checkpoint(self, job, settings, started_at):
+        """Start a new checkpoint for `job`, discarding any previous one."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sweep_progress WHERE job = ?", (job,))
+            self._conn.execute("INSERT OR REPLACE INTO sweep_checkpoint (job, settings, started_at, pending, sent)"
+                               " VALUES (?, ?, ?, NULL, 0)", (job, settings, started_at))
+
+    def save_pending(self, job, pending):
+        """Save the job's pending write batch (serialized; None when there is none), none of it sent yet."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE sweep_checkpoint SET pending = ?, sent = 0 WHERE job = ?", (pending, job))
+
+    def save_sent(self, job, sent):
+        """Save how many writes of the job's pending batch have been sent."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE sweep_checkpoint SET sent = ? WHERE job = ?", (sent, job))
+
+    def save_progress(self, job, rows):
+        """Add (item_id, due) rows to the items the job has processed and clear its pending batch."""
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO sweep_progress (job, item_id, due) VALUES (?, ?, ?)",
+                                   [(job, item_id, due) for item_id, due in rows])
+            self._conn.execute("UPDATE sweep_checkpoint SET pending = NULL, sent = 0 WHERE job = ?", (job,))
+
+    def clear_checkpoint(self, job):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sweep_progress WHERE job = ?", (job,))
+            self._conn.execute("DELETE FROM sweep_checkpoint WHERE job = ?", (job,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def is_settled(row, fp, now_ts):
+    """
+    True if an item can be skipped this sweep: its fingerprint is unchanged, its
+    last decision was a no-op, no boundary has been crossed since and it was
+    evaluated within INCREMENTAL_FULL_REFRESH_HOURS.
+    """
+    if row is None:
+        return False
+    stored_fp, decision, next_check, _, evaluated_at = row
+    if stored_fp != fp or decision != NOOP:
+        return False
+    if next_check is not None and now_ts >= next_check:
+        return False
+    return now_ts - evaluated_at < Config.INCREMENTAL_FULL_REFRESH_HOURS * 3600
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def _open_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            os.makedirs(Config.DATA_DIR, exist_ok=True)
+            path = os.path.join(Config.DATA_DIR, "state.db")
+            log.info("Using state store at %s", path)
+            _store = StateStore(path)
+        return _store
+
+def get_state_store():
+    """Return the shared StateStore, or None when INCREMENTAL_SYNC is disabled."""
+    if not Config.INCREMENTAL_SYNC:
+        return None
+    return _open_store()
+
+def get_checkpoint_store():
+    """Return the shared StateStore for sweep checkpoints, or None when CHECKPOINT_SWEEPS is disabled."""
+    if not Config.CHECKPOINT_SWEEPS:
+        return None
+    return _open_store()
@@ -0,0 +1,70 @@
+import heapq
+import threading
+
+class TransitionSchedule:
+    """
+    Min-heap of upcoming per-item transition times (threshold and re-monitor
+    window expiry), keyed by (app, item_id).
+
+    Apps publish the next transition of every item they evaluate; the event
+    scheduler sleeps until the earliest one and queues a job scoped to the items
+    that are due. Superseded heap entries are dropped lazily when popped.
+    """
+    def __init__(self):
+        self._heap = []
+        self._due = {}
+        self._cond = threading.Condition()
+
+    def update(self, app, due, evaluated_ids):
+        """Replace the pending transitions of `evaluated_ids` for `app` with `due` ({item_id: epoch})."""
+        with self._cond:
+            for item_id in evaluated_ids:
+                key = (app, item_id)
+                ts = due.get(item_id)
+                if ts is None:
+                    self._due.pop(key, None)
+                elif self._due.get(key) != ts:
+                    self._due[key] = ts
+                    heapq.heappush(self._heap, (ts, app, item_id))
+            if len(self._heap) > 2 * len(self._due) + 1024:
+                self._heap = [(ts, app, item_id) for (app, item_id), ts in self._due.items()]
+                heapq.heapify(self._heap)
+            self._cond.notify_all()
+
+    def _drop_stale(self):
+        while self._heap:
+            ts, app, item_id = self._heap[0]
+            if self._due.get((app, item_id)) == ts:
+                return
+            heapq.heappop(self._heap)
+
+    def next_due(self):
+        """Return the earliest pending transition time, or None if nothing is scheduled."""
+        with self._cond:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now_ts):
+        """Remove and return {app: set(item_ids)} for every transition at or before `now_ts`."""
+        due = {}
+        with self._cond:
+            while True:
+                self._drop_stale()
+                if not self._heap or self._heap[0][0] > now_ts:
+                    break
+                ts, app, item_id = heapq.heappop(self._heap)
+                del self._due[(app, item_id)]
+                due.setdefault(app, set()).add(item_id)
+        return due
+
+    def wait(self, timeout):
+        """Sleep up to `timeout` seconds, waking early when transitions are updated."""
+        with self._cond:
+            self._cond.wait(timeout)
+
+    def __len__(self):
+        with self._cond:
+            return len(self._due)
+
+# Shared schedule fed by the apps and consumed by the event scheduler
+transition_schedule = TransitionSchedule()
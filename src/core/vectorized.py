@@ -0,0 +1,40 @@
+"""
+Helpers for the optional NumPy decision engine (DECISION_ENGINE=numpy).
+
+Timestamps are int64 microseconds since the epoch, as pre-parsed into the
+records of core.records, so threshold and window comparisons are exact and
+agree with the integer arithmetic of the default engine. NumPy is not a hard
+dependency: `np` is None when it isn't installed.
+"""
+from core.records import EPOCH, epoch_us, us  # noqa: F401 (used by the engines as vectorized.*)
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+NEVER = 2**63 - 1  # sentinel for "no boundary"
+
+def available():
+    return np is not None
+
+def to_seconds(value):
+    """int microseconds (or NEVER) -> epoch seconds as returned by datetime.timestamp(), or None."""
+    return None if value == NEVER else value / 1_000_000
+
+def epochs(values):
+    """Pre-parsed epoch microseconds (None = no date) -> (int64 array, valid mask)."""
+    n = len(values)
+    valid = np.fromiter((v is not None for v in values), bool, n)
+    return np.fromiter((v if v is not None else 0 for v in values), np.int64, n), valid
+
+def next_boundary(now_us, *instants):
+    """Vectorized core.state_store.next_boundary: earliest instant after now per element, NEVER if none.
+    Each instant is an int64 array or None (no such boundary)."""
+    result = None
+    for t in instants:
+        if t is None:
+            continue
+        t = np.where(t > now_us, t, NEVER)
+        result = t if result is None else np.minimum(result, t)
+    return result
@@ -1,23 +1,23 @@
-import logging, json, re
+import logging
 from datetime import datetime, timedelta, timezone
-import requests
-from requests.exceptions import ReadTimeout
+from requests.exceptions import RequestException
 import time
+from common.arr_client import chunked, get_client, get_tag_index, fetch_listing, send_writes, ensure_tag
+from common.retry import CircuitOpenError, RetryPolicy, run_with_item_retries
+from core import checkpoint, instances, metrics
+from core.profiling import phase
 from core.config import Config
+from core.records import Movie
+from core.state_store import NOOP, fingerprint, get_state_store, is_settled
+from core.transitions import transition_schedule
+from radarr.radarr_plan import RadarrLibrary, RadarrSettings, plan_radarr
 
-log = logging.getLogger("radarr")
+log = instances.InstanceLogger(logging.getLogger("radarr"))
 
-_DELAY_TAG_RE = re.compile(r"^delayby_(-?\d+)$", re.IGNORECASE)
-
-def _get_delay_override(tag_ids, id_to_label, title="unknown"):
+def _get_delay_override(tag_ids, tags, title="unknown"):
     """Return a timedelta override if a delayby_<N> tag is found, else None.
     If multiple matching tags are found, falls back to None and logs a warning."""
-    matches = []
-    for tid in tag_ids:
-        label = id_to_label.get(int(tid), "")
-        m = _DELAY_TAG_RE.match(label)
-        if m:
-            matches.append(int(m.group(1)))
+    matches = [tags.delays[tid] for tid in tag_ids if tid in tags.delays]
     if len(matches) > 1:
         log.info("Multiple delayby_ tags found for %s, falling back to default delay", title)
         return None
@@ -26,158 +26,185 @@ def _get_delay_override(tag_ids, id_to_label, title="unknown"):
         return timedelta(minutes=matches[0])
     return None
 
-def _api(path: str) -> str:
-    return f"{Config.RADARR_URL}{path}"
+def _instance():
+    """The Radarr instance the current job runs for (RADARR_URL unless it is a named instance's job)."""
+    return instances.current("radarr") or instances.default("radarr", Config)
 
 def _req(method: str, path: str, **kw):
-    s = requests.Session()
-    s.headers.update({"X-Api-Key": Config.RADARR_API_KEY})
-    url = _api(path)
-    if method.upper() in ("POST","PUT","PATCH","DELETE") and Config.DRY_RUN:
-        payload = kw.get("json") or kw.get("data")
-        log.info("[DRY] %s %s -> %s", method.upper(), path, json.dumps(payload) if payload else "(no body)")
-        class Dummy:
-            ok=True
-            status_code=200
-            def json(self): return {}
-            text=""
-        return Dummy()
-    return s.request(method.upper(), url, timeout=30, **kw)
-
-def _parse_iso(s):
-    if not s: return None
-    s = s.strip()
-    if s.endswith("Z"): s = s[:-1] + "+00:00"
-    try:
-        dt = datetime.fromisoformat(s)
-        if dt.tzinfo is None: dt = dt.replace(tzinfo=timezone.utc)
-        return dt.astimezone(timezone.utc)
-    except Exception:
-        return None
+    inst = _instance()
+    return get_client(inst.url, inst.api_key, log, name=inst.key, limits=inst.limits()).request(method, path, **kw)
 
-def _pick_release(movie):
-    digital  = _parse_iso(movie.get("digitalRelease"))
-    physical = _parse_iso(movie.get("physicalRelease"))
-    cinemas  = _parse_iso(movie.get("inCinemas"))
-
-    if Config.PREFERRED_RELEASE == "digital":
-        return digital or physical or (None if Config.IGNORE_INCINEMAS else cinemas)
-    if Config.PREFERRED_RELEASE == "physical":
-        return physical or digital or (None if Config.IGNORE_INCINEMAS else cinemas)
-    # either
-    candidates = [d for d in (digital, physical) if d]
-    if candidates: return min(candidates)
-    return None if Config.IGNORE_INCINEMAS else cinemas
-
-def _has_file(movie):
-    if "hasFile" in movie: return bool(movie["hasFile"])
-    return bool(movie.get("movieFile"))
-
-def _tags_map():
-    r = _req("GET","/api/v3/tag")
-    items = r.json() if hasattr(r, "json") else []
-    return { int(t["id"]): t["label"] for t in items }, { t["label"].lower(): int(t["id"]) for t in items }
-
-def _ensure_tag(label, label_to_id):
-    if label.lower() in label_to_id:
-        return label_to_id[label.lower()]
-    if Config.DRY_RUN:
-        log.info("[DRY] POST /api/v3/tag -> {\"label\": \"%s\"}", label)
-        return 999999
-    r = _req("POST","/api/v3/tag", json={"label": label})
-    if r.ok:
-        # refresh
-        _, rev = _tags_map()
-        return rev.get(label.lower())
-    raise RuntimeError("Failed to ensure tag")
-
-def _apply_tags(movie_id, tag_id, mode):
-    payload = {"movieIds":[movie_id], "tags":[tag_id], "applyTags": mode}
-    _req("PUT","/api/v3/movie/editor", json=payload)
-
-def _set_monitored(movie_id, monitored):
-    _req("PUT","/api/v3/movie/editor", json={"movieIds":[movie_id], "monitored": monitored})
-
-def _run_once():
-    if not (Config.ENABLE_RADARR and Config.RADARR_URL and Config.RADARR_API_KEY):
-        return
+def _tag_index(refresh=False):
+    return get_tag_index(_req, _instance().url, Config.TAG_CACHE_SECONDS, refresh)
+
+def _ensure_tag(label, tags):
+    return ensure_tag(_req, label, tags.label_to_id, log, cache_key=_instance().url)
+
+def _retry_policy():
+    return RetryPolicy(Config.HTTP_RETRIES, Config.HTTP_RETRY_BACKOFF_SECONDS)
+
+def _movie_fingerprint(m, tags, settings):
+    labels = tags.labels(m.tags)
+    return fingerprint(settings, labels, m.monitored, m.has_file, m.digital, m.physical, m.cinemas)
+
+def _fetch_library():
+    """Stream the full movie list, keeping only the decision fields of each movie."""
+    return fetch_listing(_req, "/api/v3/movie", Movie.from_api, _retry_policy(), log, "Movie listing")
+
+def _fetch_movies(movie_ids, failed):
+    """Fetch individual movies for a scoped run, skipping any that no longer exist.
+    Movies that fail to fetch are added to `failed`."""
+    movies = []
+    for mid in movie_ids:
+        try:
+            r = _req("GET", f"/api/v3/movie/{mid}")
+            if r.status_code == 404:
+                log.info("Movie id:%s no longer exists, skipping", mid)
+                continue
+            r.raise_for_status()
+            movies.append(Movie.from_api(r.json()))
+        except CircuitOpenError:
+            raise
+        except RequestException as e:
+            log.warning("Fetching movie id:%s failed: %s", mid, e)
+            failed.add(mid)
+    return movies
+
+def _plan_requests(plan, auto_tag_id):
+    """Yield the (method, path, payload) writes that apply `plan`: one movie editor call per
+    (monitored, auto-tag add/remove) group, chunked to EDITOR_BATCH_SIZE movies."""
+    for monitored, apply_tags in ((False, "add"), (True, "remove")):
+        movie_ids = [t.movie_id for t in plan.transitions if t.monitored == monitored]
+        for chunk in chunked(movie_ids, Config.EDITOR_BATCH_SIZE):
+            yield "PUT", "/api/v3/movie/editor", {"movieIds": chunk, "monitored": monitored,
+                                                  "tags": [auto_tag_id], "applyTags": apply_tags}
+
+def _send_writes(writes, cp=None):
+    return send_writes(_req, writes, log, Config.DRY_RUN, cp)
+
+def _apply(plan, auto_tag_id, cp=None, batch=()):
+    """Log the plan's decisions and send its writes. In DRY_RUN the writes are only logged.
+    With a sweep checkpoint `cp`, the writes are saved as the pending batch of the movies in
+    `batch` first. Returns the IDs of the movies in a write that failed."""
+    prefix = "[DRY] " if Config.DRY_RUN else ""
+    for message in plan.messages:
+        log.info("%s%s", prefix, message)
+    writes = list(_plan_requests(plan, auto_tag_id))
+    if cp:
+        cp.begin(batch, writes, plan.due)
+    failed = set()
+    for payload in _send_writes(writes, cp):
+        failed.update(payload["movieIds"])
+    return failed
+
+def _run_once(movie_ids=None):
+    """Run one sweep (or a run scoped to `movie_ids`). Returns the IDs of the movies that failed."""
+    inst = _instance()
+    if not (Config.ENABLE_RADARR and inst.url and inst.api_key):
+        return set()
 
     log.info("Radarr app starting…")
+    failed = set()
 
-    id_to_label, label_to_id = _tags_map()
-    auto_tag_id = _ensure_tag(Config.AUTO_TAG_NAME, label_to_id)
-    default_delay = timedelta(minutes=Config.DELAY_MINUTES)
-    remonitor_window = timedelta(days=Config.RADARR_REMONITOR_WINDOW_DAYS) if Config.RADARR_REMONITOR_WINDOW_DAYS > 0 else None
+    with phase("tag fetch"):
+        tags = _tag_index()
+        auto_tag_id = _ensure_tag(Config.AUTO_TAG_NAME, tags)
     now = datetime.now(timezone.utc)
 
-    movies = _req("GET","/api/v3/movie").json()
-    assessed = managed = unmonitored = remonitored = 0
+    with phase("movie fetch"):
+        if movie_ids is None:
+            movies = _fetch_library()
+        else:
+            movies = _fetch_movies(movie_ids, failed)
+    if not tags.covers({tid for m in movies for tid in m.tags}):
+        # A tag was created since the cached tag list was fetched
+        with phase("tag fetch"):
+            tags = _tag_index(refresh=True)
+
+    # Incremental sync: skip movies whose decision inputs are unchanged since they were last
+    # evaluated, unless their release/threshold/window boundary has been crossed since
+    store = get_state_store()
+    movie_state = store.load(inst.state_kind("movie")) if store else {}
+    store_settings = (Config.DELAY_MINUTES, Config.RADARR_REMONITOR_WINDOW_DAYS, Config.PREFERRED_RELEASE,
+                      Config.IGNORE_INCINEMAS, Config.SKIP_IF_FILE, Config.IGNORE_TAG_NAME, auto_tag_id)
+    now_ts = now.timestamp()
+
+    # Full sweeps can be checkpointed: writes left pending by an interrupted sweep are sent first,
+    # and the movies it had processed are skipped like settled ones. The movie editor already
+    # batches a sweep's writes, so the library is planned as a single batch.
+    cp = None
+    if movie_ids is None:
+        cp = checkpoint.start(inst.key, fingerprint(store_settings, Config.DRY_RUN), now_ts)
+    if cp:
+        with phase("writes"):
+            cp.send_pending(_send_writes)
+    processed = cp.processed if cp else {}
+    evaluated = []  # (movie_id, fingerprint) of movies evaluated this run
+    settled = set()
+    delays = {}
     for m in movies:
-        title = m.get("title", f"id:{m.get('id')}")
-        if Config.IGNORE_TAG_NAME and any(id_to_label.get(tid,"").lower()==Config.IGNORE_TAG_NAME.lower() for tid in m.get("tags",[])):
-            continue
-        if Config.SKIP_IF_FILE and _has_file(m):
-            continue
-
-        delay = _get_delay_override(m.get("tags", []), id_to_label, title) or default_delay
-        release = _pick_release(m)
-        monitored = bool(m.get("monitored", False))
-        has_auto  = auto_tag_id in set(m.get("tags", []))
-
-        assessed += 1
-
-        # Handle items without release dates
-        if not release:
-            if monitored:
-                log.info("%sUNMONITOR (no release date): %s", "[DRY] " if Config.DRY_RUN else "", title)
-                _set_monitored(int(m["id"]), False)
-                _apply_tags(int(m["id"]), auto_tag_id, "add")
-                managed += 1
-                unmonitored += 1
+        if m.id in processed:
             continue
-
-        threshold = release + delay
-
-        if monitored and now < threshold:
-            log.info("%sUNMONITOR: %s until %s", "[DRY] " if Config.DRY_RUN else "", title, threshold.isoformat())
-            _set_monitored(int(m["id"]), False)
-            _apply_tags(int(m["id"]), auto_tag_id, "add")
-            managed += 1
-            unmonitored += 1
-        elif (not monitored) and has_auto and now >= threshold:
-            # Check if within re-monitoring window (if enabled)
-            within_window = True
-            if remonitor_window is not None:
-                within_window = (now - release) <= remonitor_window
-
-            if within_window:
-                log.info("%sMONITOR: %s (past %s)", "[DRY] " if Config.DRY_RUN else "", title, threshold.isoformat())
-                _set_monitored(int(m["id"]), True)
-                _apply_tags(int(m["id"]), auto_tag_id, "remove")
-                managed += 1
-                remonitored += 1
-    log.info("SUMMARY: Assessed %d, Managed %d, Unmonitored %d, Monitored %d", assessed, managed, unmonitored, remonitored)
-
-def run_once():
-    if not (Config.ENABLE_RADARR and Config.RADARR_URL and Config.RADARR_API_KEY):
+        if store:
+            fp = _movie_fingerprint(m, tags, store_settings)
+            if is_settled(movie_state.get(m.id), fp, now_ts):
+                settled.add(m.id)
+                continue
+            evaluated.append((m.id, fp))
+        delay = _get_delay_override(m.tags, tags, m.title)
+        if delay:
+            delays[m.id] = delay
+
+    library = RadarrLibrary(movies, auto_tag_id, tags.ids(Config.IGNORE_TAG_NAME), delays,
+                            frozenset(settled.union(processed)))
+    with phase("decision"):
+        plan = plan_radarr(library, RadarrSettings.from_config(Config), now)
+    batch = [m.id for m in movies if m.id not in settled and m.id not in processed]
+    with phase("writes"):
+        failed |= _apply(plan, auto_tag_id, cp, batch)
+
+    if Config.SCHEDULER_MODE == "event":
+        # Settled movies keep the transition stored when they were last evaluated, those processed
+        # before a checkpointed sweep was interrupted the one saved then
+        transitions = {mid: movie_state[mid][3] for mid in settled}
+        transitions.update((mid, ts) for mid, ts in processed.items() if ts is not None)
+        transitions.update(plan.due)
+        transition_schedule.update(inst.key, transitions, [m.id for m in movies])
+    if store:
+        decided = {t.movie_id: "monitor" if t.monitored else "unmonitor" for t in plan.transitions}
+        # Movies whose write failed aren't recorded: they are re-evaluated by the retry or the next run
+        store.record(inst.state_kind("movie"), [(mid, fp, decided.get(mid, NOOP), plan.next_checks.get(mid),
+                                                 plan.due.get(mid))
+                                                for mid, fp in evaluated if mid not in failed], now_ts)
+        log.info("Incremental sync: %d of %d movies unchanged, skipped", len(settled), len(movies))
+    if cp:
+        cp.done(batch, plan.due, failed)
+        cp.finish()
+    log.info("SUMMARY: Assessed %d, Managed %d, Unmonitored %d, Monitored %d",
+             plan.assessed, len(plan.transitions), plan.unmonitored, plan.monitored)
+    metrics.record_run(inst.key, plan.assessed, plan.monitored, plan.unmonitored)
+    return failed
+
+def run_once(movie_ids=None):
+    inst = _instance()
+    if not (Config.ENABLE_RADARR and inst.url and inst.api_key):
         return
 
-    max_retries = 3
-    for attempt in range(1, max_retries + 1):
-        try:
-            _run_once()
-            break
-        except ReadTimeout as e:
-            if attempt < max_retries:
-                log.warning("Retrying after timeout… (attempt %d)", attempt)
-                time.sleep(5)
-            else:
-                log.error("Failed after 3 attempts: %s", e)
-
-
-def run_job():
-    log.info("Radarr job triggered via job queue")
-    run_once()
+    started = time.time()
+    try:
+        # Movies that fail are retried on their own, not by repeating the whole run
+        failed = run_with_item_retries(_run_once, movie_ids, _retry_policy(), Config.ITEM_RETRIES, log, "movies")
+        # A full sweep is successful once none of its movies is still failing after the retries
+        if movie_ids is None and not failed:
+            metrics.record_sweep(inst.key, started)
+    except CircuitOpenError as e:
+        log.error("Run stopped: %s", e)
+
+def run_job(item_ids=None, instance=None):
+    """Run a Radarr job for the default instance, or for the named `instance`."""
+    with instances.running(instance):
+        log.info("Radarr job triggered via job queue")
+        run_once(item_ids)
 
 # Export for external import
 run_radarr = run_job
@@ -0,0 +1,187 @@
+"""
+Pure Radarr planning stage.
+
+plan_radarr() takes a snapshot of the library plus `now` and returns a
+RadarrPlan of the movies to (un)monitor. It makes no HTTP calls and does no
+logging; radarr_app fetches the snapshot and applies the plan.
+
+Movies are core.records.Movie, with release dates pre-parsed into epoch
+microseconds. With DECISION_ENGINE=numpy every movie is decided in one batch
+over epoch arrays (see core.vectorized); both engines produce the same plan.
+"""
+from datetime import timedelta
+from typing import NamedTuple, Optional
+from core import vectorized
+from core.records import epoch_us, seconds, to_datetime, us
+from core.state_store import next_boundary
+
+class RadarrSettings(NamedTuple):
+    default_delay: timedelta
+    remonitor_window: Optional[timedelta]  # None = unlimited
+    skip_if_file: bool
+    preferred_release: str  # digital | physical | either
+    ignore_incinemas: bool
+    engine: str = "python"  # python | numpy
+
+    @classmethod
+    def from_config(cls, config):
+        window = timedelta(days=config.RADARR_REMONITOR_WINDOW_DAYS) if config.RADARR_REMONITOR_WINDOW_DAYS > 0 else None
+        engine = "numpy" if config.DECISION_ENGINE == "numpy" else "python"
+        return cls(timedelta(minutes=config.DELAY_MINUTES), window, bool(config.SKIP_IF_FILE),
+                   config.PREFERRED_RELEASE, bool(config.IGNORE_INCINEMAS), engine)
+
+class RadarrLibrary(NamedTuple):
+    """Snapshot of the Radarr library a plan is computed from."""
+    movies: list                      # core.records.Movie
+    auto_tag_id: int
+    ignore_tag_ids: frozenset         # tag ids labelled IGNORE_TAG_NAME
+    delays: dict                      # movie_id -> delay override from a delayby_<N> tag
+    settled: frozenset = frozenset()  # movie ids skipped by incremental sync
+
+class MovieTransition(NamedTuple):
+    movie_id: int
+    monitored: bool  # target state; the auto-tag is added on unmonitor and removed on monitor
+
+class RadarrPlan:
+    """Transitions decided by plan_radarr()."""
+    __slots__ = ("transitions", "messages", "assessed", "next_checks", "due")
+
+    def __init__(self):
+        self.transitions = []  # MovieTransition, in decision order
+        self.messages = []     # decision log lines, in decision order
+        self.assessed = 0
+        self.next_checks = {}  # movie_id -> next release/threshold/window boundary
+        self.due = {}          # movie_id -> next threshold/window transition (managed movies)
+
+    @property
+    def monitored(self):
+        return sum(1 for t in self.transitions if t.monitored)
+
+    @property
+    def unmonitored(self):
+        return sum(1 for t in self.transitions if not t.monitored)
+
+def pick_release(movie, settings):
+    """The release date a movie's decision is based on, as epoch microseconds, or None."""
+    digital, physical, cinemas = movie.digital, movie.physical, movie.cinemas
+    if settings.preferred_release == "digital":
+        return _first(digital, physical, None if settings.ignore_incinemas else cinemas)
+    if settings.preferred_release == "physical":
+        return _first(physical, digital, None if settings.ignore_incinemas else cinemas)
+    # either
+    candidates = [d for d in (digital, physical) if d is not None]
+    if candidates: return min(candidates)
+    return None if settings.ignore_incinemas else cinemas
+
+def _first(*dates):
+    return next((d for d in dates if d is not None), None)
+
+def plan_radarr(library, settings, now):
+    """Decide every movie transition for `library` at `now`."""
+    if settings.engine == "numpy" and vectorized.available():
+        return _plan_radarr_numpy(library, settings, now)
+    plan = RadarrPlan()
+    now_ts = now.timestamp()
+    now_us = epoch_us(now)
+    window = us(settings.remonitor_window) if settings.remonitor_window is not None else None
+
+    for m in library.movies:
+        if m.id in library.settled:
+            continue
+        if library.ignore_tag_ids.intersection(m.tags):
+            continue
+        if settings.skip_if_file and m.has_file:
+            continue
+
+        release = pick_release(m, settings)
+        plan.assessed += 1
+
+        # Handle items without release dates
+        if release is None:
+            if m.monitored:
+                plan.messages.append(f"UNMONITOR (no release date): {m.title}")
+                plan.transitions.append(MovieTransition(int(m.id), False))
+            continue
+
+        threshold = release + us(library.delays.get(m.id, settings.default_delay))
+        window_end = release + window if window is not None else None
+        has_auto = library.auto_tag_id in m.tags
+        plan.next_checks[m.id] = next_boundary(now_ts, seconds(release), seconds(threshold), seconds(window_end))
+        if has_auto or (m.monitored and now_us < threshold):
+            plan.due[m.id] = next_boundary(now_ts, seconds(threshold), seconds(window_end))
+
+        if m.monitored and now_us < threshold:
+            plan.messages.append(f"UNMONITOR: {m.title} until {to_datetime(threshold).isoformat()}")
+            plan.transitions.append(MovieTransition(int(m.id), False))
+        elif (not m.monitored) and has_auto and now_us >= threshold:
+            # Check if within re-monitoring window (if enabled)
+            if window is None or now_us - release <= window:
+                plan.messages.append(f"MONITOR: {m.title} (past {to_datetime(threshold).isoformat()})")
+                plan.transitions.append(MovieTransition(int(m.id), True))
+    return plan
+
+def _pick_release_numpy(movies, settings):
+    """pick_release() over every movie: (release epoch microseconds, has-release mask)."""
+    np = vectorized.np
+    digital, has_digital = vectorized.epochs([m.digital for m in movies])
+    physical, has_physical = vectorized.epochs([m.physical for m in movies])
+    cinemas, has_cinemas = vectorized.epochs([m.cinemas for m in movies])
+    if settings.ignore_incinemas:
+        has_cinemas = np.zeros(len(movies), dtype=bool)
+
+    if settings.preferred_release in ("digital", "physical"):
+        first, has_first, second, has_second = (digital, has_digital, physical, has_physical) \
+            if settings.preferred_release == "digital" else (physical, has_physical, digital, has_digital)
+        release = np.where(has_first, first, np.where(has_second, second, cinemas))
+    else:
+        # either: the earliest of digital/physical
+        both = np.minimum(np.where(has_digital, digital, vectorized.NEVER), np.where(has_physical, physical, vectorized.NEVER))
+        release = np.where(has_digital | has_physical, both, cinemas)
+    return release, has_digital | has_physical | has_cinemas
+
+def _plan_radarr_numpy(library, settings, now):
+    """plan_radarr() with every movie decided in one batch over epoch arrays."""
+    np = vectorized.np
+    plan = RadarrPlan()
+    now_us = vectorized.epoch_us(now)
+    movies = library.movies
+    n = len(movies)
+
+    active = np.fromiter((m.id not in library.settled
+                          and not library.ignore_tag_ids.intersection(m.tags)
+                          and not (settings.skip_if_file and m.has_file) for m in movies), bool, n)
+    monitored = np.fromiter((m.monitored for m in movies), bool, n)
+    auto = np.fromiter((library.auto_tag_id in m.tags for m in movies), bool, n)
+    delay = np.fromiter((vectorized.us(library.delays.get(m.id, settings.default_delay)) for m in movies), np.int64, n)
+    release, has_release = _pick_release_numpy(movies, settings)
+
+    threshold = release + delay
+    window_end = release + vectorized.us(settings.remonitor_window) if settings.remonitor_window is not None else None
+    within = now_us <= window_end if window_end is not None else np.ones(n, dtype=bool)
+    past = now_us >= threshold
+
+    dated = active & has_release
+    no_release_unmonitor = active & ~has_release & monitored
+    to_unmonitor = (dated & monitored & ~past) | no_release_unmonitor
+    to_monitor = dated & ~monitored & auto & past & within
+    plan.assessed = int(active.sum())
+
+    for i in np.flatnonzero(to_monitor | to_unmonitor):
+        m = movies[i]
+        if no_release_unmonitor[i]:
+            plan.messages.append(f"UNMONITOR (no release date): {m.title}")
+        else:
+            at = to_datetime(int(threshold[i])).isoformat()
+            plan.messages.append(f"MONITOR: {m.title} (past {at})" if to_monitor[i] else f"UNMONITOR: {m.title} until {at}")
+        plan.transitions.append(MovieTransition(int(m.id), bool(to_monitor[i])))
+
+    # Boundaries for incremental sync and the event scheduler
+    next_check = vectorized.next_boundary(now_us, release, threshold, window_end)
+    due = vectorized.next_boundary(now_us, threshold, window_end)
+    managed = dated & (auto | (monitored & ~past))
+    for i in np.flatnonzero(dated):
+        mid = movies[i].id
+        plan.next_checks[mid] = vectorized.to_seconds(next_check[i])
+        if managed[i]:
+            plan.due[mid] = vectorized.to_seconds(due[i])
+    return plan
@@ -1,12 +1,16 @@
 import time
 import threading
 from common.logger import get_logger
-from core.job_queue import enqueue_job
+from core.job_queue import enqueue_job, add_job
 from core.job_handler import get_enabled_apps
+from core.transitions import transition_schedule
 from core.config import Config
 
 logger = get_logger("scheduler")
 
+# Transitions whose job the full queue rejected are due again after this long
+QUEUE_FULL_RETRY_SECONDS = 30
+
 def scheduler_loop():
     logger.info(f"Scheduler started (every {Config.SLEEP_MINUTES} minutes)")
     while True:
@@ -16,9 +20,45 @@ def scheduler_loop():
         logger.debug(f"Scheduler sleeping for {Config.SLEEP_MINUTES} minutes...")
         time.sleep(Config.SLEEP_MINUTES * 60)
 
+def event_scheduler_loop():
+    """
+    Sleep until the next item transition (threshold or re-monitor window expiry)
+    published by the apps and queue a job scoped to the items due at that instant.
+    A full sweep still runs every FULL_SWEEP_MINUTES as a safety net. If the job
+    queue is full, the due items are rescheduled QUEUE_FULL_RETRY_SECONDS later.
+    """
+    logger.info(f"Event scheduler started (full sweep every {Config.FULL_SWEEP_MINUTES} minutes)")
+    full_sweep_interval = Config.FULL_SWEEP_MINUTES * 60
+    next_full_sweep = time.time()
+    while True:
+        now = time.time()
+        enabled_apps = get_enabled_apps()
+        if now >= next_full_sweep:
+            for app in enabled_apps:
+                enqueue_job(app, payload={"triggered_by": "scheduler"})
+            next_full_sweep = now + full_sweep_interval
+
+        for app, item_ids in transition_schedule.pop_due(now).items():
+            if app in enabled_apps:
+                logger.info(f"{len(item_ids)} {app} item(s) reached a transition")
+                if add_job(app, triggered_by="threshold", item_ids=sorted(item_ids)) is None:
+                    retry_at = now + QUEUE_FULL_RETRY_SECONDS
+                    logger.warning(f"Job queue is full, retrying {len(item_ids)} {app} transition(s) "
+                                   f"in {QUEUE_FULL_RETRY_SECONDS}s")
+                    transition_schedule.update(app, dict.fromkeys(item_ids, retry_at), item_ids)
+
+        wake_at = next_full_sweep
+        next_due = transition_schedule.next_due()
+        if next_due is not None and next_due < wake_at:
+            wake_at = next_due
+        delay = max(0.0, wake_at - time.time())
+        logger.debug(f"Scheduler sleeping for {delay:.0f} seconds...")
+        transition_schedule.wait(delay)
+
 def start_scheduler():
     """Start the scheduler in a background thread"""
-    scheduler_thread = threading.Thread(target=scheduler_loop, daemon=True, name="scheduler")
+    target = event_scheduler_loop if Config.SCHEDULER_MODE == "event" else scheduler_loop
+    scheduler_thread = threading.Thread(target=target, daemon=True, name="scheduler")
     scheduler_thread.start()
     logger.info("Scheduler thread started")
-    return scheduler_thread
\ No newline at end of file
+    return scheduler_thread
@@ -1,25 +1,173 @@
+import threading
 from common.logger import get_logger
-from flask import Flask, request, jsonify
-from core.job_queue import add_job
+from flask import Flask, Response, request, jsonify
+from common.arr_client import limiter_stats, update_limiter_metrics
+from core import instances, metrics, profiling
+from core.config import Config
+from core.job_queue import add_job, job_history, job_queue
 
 app = Flask(__name__)
 log = get_logger("webhook_service")
 
+# Upper bound on ?wait= for GET /jobs/<id>. A waiting request holds one of the WEBHOOK_THREADS, so at
+# most a quarter of them wait at once; further requests get the current status straight away, and
+# webhooks always find a free thread.
+MAX_WAIT_SECONDS = 60
+_waiters = threading.BoundedSemaphore(max(1, Config.WEBHOOK_THREADS // 4))
+
+def _parse_webhook(item_key):
+    """
+    Return (eventType, item id) from a Sonarr/Radarr webhook body, where the item
+    is the payload's `item_key` object ('series' or 'movie'). Either may be None.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return None, None
+    item = payload.get(item_key)
+    item_id = item.get("id") if isinstance(item, dict) else None
+    if isinstance(item_id, bool) or not isinstance(item_id, int):
+        item_id = None
+    return payload.get("eventType"), item_id
+
+def _queued(job_type, job, id_field=None, item_id=None):
+    """202 response for a queued job. Built from a format string: this is the hot path of a webhook storm."""
+    scope = f',"{id_field}":{item_id}' if item_id is not None else ""
+    return Response(f'{{"status":"queued","job":"{job_type}","id":"{job.id}"{scope}}}\n', 202,
+                    mimetype="application/json")
+
+def _queue_full(job_type):
+    """429 response telling Sonarr/Radarr (or a script) to retry once the job queue has drained."""
+    response = jsonify({"status": "error", "job": job_type, "message": "Job queue is full, retry later"})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(Config.WEBHOOK_RETRY_AFTER_SECONDS)
+    return response
+
+def _trigger(app_name, job_type, item_key, id_field):
+    """Queue a job of `job_type` for a Sonarr/Radarr webhook, scoped to its series/movie if it names one.
+    Answers 429 with Retry-After if the job queue is full."""
+    label = f"{app_name} ({job_type})" if "-" in job_type else app_name
+    event_type, item_id = _parse_webhook(item_key)
+    if event_type == "Test":
+        # Connection tests carry placeholder item data; nothing to process
+        log.info("%s test webhook received.", label)
+        return jsonify({"status": "ok", "job": job_type, "event": "Test"}), 200
+    if item_id is None:
+        log.info("%s trigger received via webhook.", label)
+        job = add_job(job_type, triggered_by="webhook")
+        if job is None:
+            return _queue_full(job_type)
+        return _queued(job_type, job)
+    log.info("%s %s webhook received for %s id:%s.", label, event_type or "trigger", item_key, item_id)
+    job = add_job(job_type, triggered_by="webhook", item_ids=[item_id])
+    if job is None:
+        return _queue_full(job_type)
+    return _queued(job_type, job, id_field, item_id)
+
+def _instance_job_type(app_name, name):
+    """Job type of the named instance `name` of `app_name`, or None if it isn't configured."""
+    inst = instances.find(f"{app_name}-{name.lower()}")
+    return inst.key if inst else None
+
 @app.route("/trigger/sonarr", methods=["POST"])
 def trigger_sonarr():
-    log.info("Sonarr trigger received via webhook.")
-    add_job("sonarr", triggered_by="webhook")
-    return jsonify({"status": "queued", "job": "sonarr"}), 202
+    return _trigger("Sonarr", "sonarr", "series", "seriesId")
 
 @app.route("/trigger/radarr", methods=["POST"])
 def trigger_radarr():
-    log.info("Radarr trigger received via webhook.")
-    add_job("radarr", triggered_by="webhook")
-    return jsonify({"status": "queued", "job": "radarr"}), 202
+    return _trigger("Radarr", "radarr", "movie", "movieId")
+
+@app.route("/trigger/sonarr/<name>", methods=["POST"])
+def trigger_sonarr_instance(name):
+    job_type = _instance_job_type("sonarr", name)
+    if job_type is None:
+        return jsonify({"status": "error", "message": f"Unknown Sonarr instance: {name}"}), 404
+    return _trigger("Sonarr", job_type, "series", "seriesId")
+
+@app.route("/trigger/radarr/<name>", methods=["POST"])
+def trigger_radarr_instance(name):
+    job_type = _instance_job_type("radarr", name)
+    if job_type is None:
+        return jsonify({"status": "error", "message": f"Unknown Radarr instance: {name}"}), 404
+    return _trigger("Radarr", job_type, "movie", "movieId")
+
+@app.route("/queue", methods=["GET"])
+def queue_stats():
+    return jsonify(job_queue.stats()), 200
+
+@app.route("/jobs", methods=["GET"])
+def jobs():
+    """Recent jobs, newest first; ?job= filters by job type, ?limit= caps the count."""
+    try:
+        limit = int(request.args.get("limit", 50))
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit must be an integer"}), 400
+    recent = job_history.recent(request.args.get("job"), max(limit, 0))
+    return jsonify({"jobs": [job.to_dict() for job in recent]}), 200
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Status of one job. With ?wait=N, waits up to N seconds (at most MAX_WAIT_SECONDS) for it to
+    finish, unless too many requests are waiting already: then the current status is returned."""
+    try:
+        wait = min(float(request.args.get("wait", 0)), MAX_WAIT_SECONDS)
+    except ValueError:
+        return jsonify({"status": "error", "message": "wait must be a number of seconds"}), 400
+    if wait > 0 and _waiters.acquire(blocking=False):
+        try:
+            job = job_history.wait(job_id, wait)
+        finally:
+            _waiters.release()
+    else:
+        job = job_history.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": f"Unknown job: {job_id}"}), 404
+    return jsonify(job.to_dict(item_ids=True)), 200
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    metrics.QUEUE_DEPTH.set(len(job_queue))
+    update_limiter_metrics()
+    return Response(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route("/limits", methods=["GET"])
+def limits():
+    """Rate/concurrency limits and effective request rate towards each Sonarr/Radarr instance."""
+    return jsonify(limiter_stats()), 200
+
+@app.route("/admin/profile", methods=["GET", "POST"])
+def admin_profile():
+    """POST arms profiling of the next `jobs` jobs (default 1, 0 disarms); GET shows status and reports."""
+    if request.method == "POST":
+        payload = request.get_json(silent=True) or {}
+        try:
+            jobs = int(request.args.get("jobs", payload.get("jobs", 1)))
+        except (TypeError, ValueError):
+            return jsonify({"status": "error", "message": "jobs must be an integer"}), 400
+        profiling.arm(jobs)
+    return jsonify({"remaining": profiling.remaining(), "directory": profiling.profile_dir(),
+                    "reports": profiling.reports()}), 200
 
 @app.route("/health", methods=["GET"])
 def health_check():
     return jsonify({"status": "healthy", "service": "unmonitarr"}), 200
 
 def start_webhook_server():
-    app.run(host="0.0.0.0", port=5099)
\ No newline at end of file
+    """
+    Serve the webhook app on port 5099 (blocking) with waitress, a production WSGI
+    server: WEBHOOK_THREADS requests are handled at once, and connections beyond
+    that wait in its backlog instead of stalling the ones being answered. Falls
+    back to Flask's development server if waitress isn't installed.
+    """
+    try:
+        server = create_server("0.0.0.0", 5099)
+    except ImportError:
+        log.warning("waitress is not installed, using Flask's development server")
+        app.run(host="0.0.0.0", port=5099, threaded=True)
+        return
+    server.run()
+
+def create_server(host, port):
+    """The waitress server for the webhook app (port 0 = any free port); raises ImportError without waitress."""
+    from waitress import create_server as create_waitress_server
+    return create_waitress_server(app, host=host, port=port, threads=Config.WEBHOOK_THREADS,
+                                  channel_timeout=30, ident="unmonitarr")
@@ -1,25 +1,24 @@
 import logging
-import json as json_module
-import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-import requests
-from core.config import Config
+from requests.exceptions import RequestException
 import time
+from common.arr_client import chunked, get_client, get_tag_index, fetch_listing, send_writes, ensure_tag
+from common.retry import CircuitOpenError, RetryPolicy, run_with_item_retries
+from core import checkpoint, instances, metrics
+from core.profiling import phase
+from core.config import Config
+from core.records import Episode, Series
+from core.state_store import NOOP, fingerprint, get_state_store, is_settled
+from core.transitions import transition_schedule
+from sonarr.sonarr_plan import SonarrLibrary, SonarrSettings, plan_sonarr
 
-log = logging.getLogger("sonarr")
-AIR_FMT = "%Y-%m-%dT%H:%M:%SZ"
-
-_DELAY_TAG_RE = re.compile(r"^delayby_(-?\d+)$", re.IGNORECASE)
+log = instances.InstanceLogger(logging.getLogger("sonarr"))
 
-def _get_delay_override(tag_ids, id_to_label, title="unknown"):
+def _get_delay_override(tag_ids, tags, title="unknown"):
     """Return a timedelta override if a delayby_<N> tag is found, else None.
     If multiple matching tags are found, falls back to None and logs a warning."""
-    matches = []
-    for tid in tag_ids:
-        label = id_to_label.get(int(tid), "")
-        m = _DELAY_TAG_RE.match(label)
-        if m:
-            matches.append(int(m.group(1)))
+    matches = [tags.delays[tid] for tid in tag_ids if tid in tags.delays]
     if len(matches) > 1:
         log.info("Multiple delayby_ tags found for %s, falling back to default delay", title)
         return None
@@ -28,346 +27,345 @@ def _get_delay_override(tag_ids, id_to_label, title="unknown"):
         return timedelta(minutes=matches[0])
     return None
 
-def _api(path:str)->str:
-    return f"{Config.SONARR_URL}{path}"
+def _instance():
+    """The Sonarr instance the current job runs for (SONARR_URL unless it is a named instance's job)."""
+    return instances.current("sonarr") or instances.default("sonarr", Config)
 
 def _req(method:str, path:str, **kw):
-    s = requests.Session()
-    s.headers.update({"X-Api-Key": Config.SONARR_API_KEY})
-    url = _api(path)
-    if method.upper() in ("POST","PUT","PATCH","DELETE") and Config.DRY_RUN:
-        payload = kw.get("json") or kw.get("data")
-        log.info("[DRY] %s %s -> %s", method.upper(), path, json_module.dumps(payload) if payload else "(no body)")
-        class Dummy: ok=True; status_code=200; 
-        def json(self): return {}; text=""
-        return Dummy()
-    return s.request(method.upper(), url, timeout=30, **kw)
-
-def _tags_map():
-    r = _req("GET","/api/v3/tag")
-    items = r.json() if hasattr(r,"json") else []
-    return { int(t["id"]): t["label"] for t in items }, { t["label"].lower(): int(t["id"]) for t in items }
-
-def _ensure_tag(label, label_to_id):
-    if label.lower() in label_to_id: return label_to_id[label.lower()]
-    if Config.DRY_RUN:
-        log.info("[DRY] POST /api/v3/tag -> {\"label\": \"%s\"}", label)
-        return 999999
-    r = _req("POST","/api/v3/tag", json={"label": label})
-    if r.ok:
-        _, rev = _tags_map()
-        return rev.get(label.lower())
-    raise RuntimeError("Failed to ensure tag")
-
-def _run_once_inner():
-    id_to_label, label_to_id = _tags_map()
-    auto_tag_id = _ensure_tag(Config.AUTO_TAG_NAME, label_to_id)
-
-    # Get season pack mode tag ID if feature is enabled
-    season_pack_tag_id = None
-    if Config.SEASON_PACK_MODE:
-        season_pack_tag_id = _ensure_tag(Config.SEASON_PACK_MODE_TAG, label_to_id)
-
-    # Set up re-monitoring window (0 = disabled/unlimited)
-    remonitor_window = timedelta(days=Config.SONARR_REMONITOR_WINDOW_DAYS) if Config.SONARR_REMONITOR_WINDOW_DAYS > 0 else None
+    inst = _instance()
+    return get_client(inst.url, inst.api_key, log, name=inst.key, limits=inst.limits()).request(method, path, **kw)
+
+def _tag_index(refresh=False):
+    return get_tag_index(_req, _instance().url, Config.TAG_CACHE_SECONDS, refresh)
+
+def _ensure_tag(label, tags):
+    return ensure_tag(_req, label, tags.label_to_id, log, cache_key=_instance().url)
+
+def _retry_policy():
+    return RetryPolicy(Config.HTTP_RETRIES, Config.HTTP_RETRY_BACKOFF_SECONDS)
+
+def _episodes_by_season(sid):
+    """Fetch every episode of a series in one request and group them by season number."""
+    by_season = {}
+    r = _req("GET","/api/v3/episode", params={"seriesId": sid})
+    r.raise_for_status()
+    for e in r.json():
+        e = Episode.from_api(e)
+        by_season.setdefault(e.season, []).append(e)
+    return by_season
+
+def _try_episodes_by_season(sid):
+    """_episodes_by_season, or None if the fetch failed (an open circuit breaker still ends the run)."""
+    try:
+        return _episodes_by_season(sid)
+    except CircuitOpenError:
+        raise
+    except RequestException as e:
+        log.warning("Fetching episodes of series id:%s failed: %s", sid, e)
+        return None
 
-    # Track all monitored series (latest season monitored), excluding IGNORE_TAG_NAME
-    series = _req("GET","/api/v3/series").json()
-    series_map = {s["id"]: s["title"] for s in series}
+def _fetch_episodes(series_ids):
+    """Return the episodes by season of each series in `series_ids` (None where the fetch failed),
+    in order. Up to EPISODE_FETCH_CONCURRENCY series are fetched at once, so a sweep waits on
+    Sonarr's latency once per batch rather than once per series."""
+    workers = min(Config.EPISODE_FETCH_CONCURRENCY, len(series_ids))
+    if workers <= 1:
+        return map(_try_episodes_by_season, series_ids)
+
+    instance = instances.current("sonarr")
+
+    def fetch(sid):
+        with instances.running(instance):
+            return _try_episodes_by_season(sid)
+
+    pool = ThreadPoolExecutor(workers, thread_name_prefix="sonarr-episodes")
+    try:
+        return list(pool.map(fetch, series_ids))
+    finally:
+        # On a failed fetch, drop the series not started yet instead of waiting for them
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _iter_tracked_seasons(tracked, failed):
+    """Yield (seriesId, seasonNumber, episodes) for every monitored season in `tracked`.
+    Episodes are fetched once per series; unmonitored seasons are dropped after the fetch.
+    Series whose episodes couldn't be fetched are added to `failed` and left out."""
+    for (sid, seasons), by_season in zip(tracked, _fetch_episodes([sid for sid, _ in tracked])):
+        if by_season is None:
+            failed.add(sid)
+            continue
+        for season in seasons:
+            yield sid, season, by_season.get(season, [])
+
+def _series_context_fingerprint(s, tags, settings, delay, season_pack):
+    """Fingerprint of the series-level inputs that every episode decision depends on."""
+    labels = tags.labels(s.tags)
+    return fingerprint(settings, labels, delay.total_seconds(), season_pack)
+
+def _series_fingerprint(s, context_fp):
+    """Fingerprint of a series as listed by /api/v3/series, including per-season statistics,
+    which change whenever episodes are added, (un)monitored or get files."""
+    seasons = [(x.number, x.monitored, x.statistics) for x in s.seasons]
+    return fingerprint(context_fp, s.monitored, seasons)
+
+def _episode_fingerprint(e, context_fp):
+    return fingerprint(context_fp, e.season, e.air, e.has_air, e.monitored, e.has_file)
+
+def _fetch_library():
+    """Stream the full series list, keeping only the decision fields of each series."""
+    return fetch_listing(_req, "/api/v3/series", Series.from_api, _retry_policy(), log, "Series listing")
+
+def _fetch_series(series_ids, failed):
+    """Fetch individual series for a scoped run, skipping any that no longer exist.
+    Series that fail to fetch are added to `failed`."""
+    series = []
+    for sid in series_ids:
+        try:
+            r = _req("GET", f"/api/v3/series/{sid}")
+            if r.status_code == 404:
+                log.info("Series id:%s no longer exists, skipping", sid)
+                continue
+            r.raise_for_status()
+            series.append(Series.from_api(r.json()))
+        except CircuitOpenError:
+            raise
+        except RequestException as e:
+            log.warning("Fetching series id:%s failed: %s", sid, e)
+            failed.add(sid)
+    return series
+
+def _plan_requests(plan, auto_tag_id):
+    """Yield the (method, path, payload) writes that apply `plan`, batched into as few calls as
+    possible (chunked to EDITOR_BATCH_SIZE ids)."""
+    size = Config.EDITOR_BATCH_SIZE
+    for episode_ids, monitored in ((plan.unmonitor, False), (plan.monitor, True)):
+        for chunk in chunked(episode_ids, size):
+            yield "PUT", "/api/v3/episode/monitor", {"episodeIds": chunk, "monitored": monitored}
+    for series_ids, mode in ((plan.tag_add, "add"), (plan.tag_remove, "remove")):
+        for chunk in chunked(sorted(series_ids), size):
+            yield "PUT", "/api/v3/series/editor", {"seriesIds": chunk, "tags": [auto_tag_id], "applyTags": mode}
+
+def _send_writes(writes, cp=None):
+    return send_writes(_req, writes, log, Config.DRY_RUN, cp)
+
+def _apply(plan, auto_tag_id, seasons, cp=None, batch=()):
+    """Log the plan's decisions and send its writes. In DRY_RUN the writes are only logged.
+    With a sweep checkpoint `cp`, the writes are saved as the pending batch of the series in
+    `batch` first. Returns the IDs of the series with a write that failed."""
+    for message in plan.messages:
+        log.info(message)
+    writes = list(_plan_requests(plan, auto_tag_id))
+    if cp:
+        cp.begin(batch, writes, plan.due)
+    failed = set()
+    for payload in _send_writes(writes, cp):
+        if "seriesIds" in payload:
+            failed.update(payload["seriesIds"])
+        else:
+            episode_ids = set(payload["episodeIds"])
+            failed.update(sid for sid, _, eps in seasons for e in eps if e.id in episode_ids)
+    return failed
+
+def _run_once_inner(series_ids=None):
+    """Run one sweep (or a run scoped to `series_ids`). Returns the IDs of the series that failed."""
+    inst = _instance()
+    failed = set()
+    with phase("tag fetch"):
+        tags = _tag_index()
+        auto_tag_id = _ensure_tag(Config.AUTO_TAG_NAME, tags)
+
+        # Get season pack mode tag ID if feature is enabled
+        season_pack_tag_id = None
+        if Config.SEASON_PACK_MODE:
+            season_pack_tag_id = _ensure_tag(Config.SEASON_PACK_MODE_TAG, tags)
 
-    # Track which series have the auto-unmonitored tag
+    # Track all monitored series (latest season monitored), excluding IGNORE_TAG_NAME
+    with phase("series fetch"):
+        if series_ids is None:
+            series = _fetch_library()
+        else:
+            series = _fetch_series(series_ids, failed)
+    if not tags.covers({tid for s in series for tid in s.tags}):
+        # A tag was created since the cached tag list was fetched
+        with phase("tag fetch"):
+            tags = _tag_index(refresh=True)
+    series_map = {s.id: s.title for s in series}
+
+    # Track which series have the auto-unmonitored tag. The series list is the in-run cache of
+    # series tags: no per-series GETs are issued, tag changes are batched at the end of the run.
     series_with_auto_tag = set()
     for s in series:
-        if auto_tag_id in s.get("tags", []):
-            series_with_auto_tag.add(s["id"])
+        if auto_tag_id in s.tags:
+            series_with_auto_tag.add(s.id)
 
     # Track which series have season pack mode enabled
     season_pack_series = set()
     if Config.SEASON_PACK_MODE and season_pack_tag_id:
         for s in series:
-            if season_pack_tag_id in s.get("tags", []):
-                season_pack_series.add(s["id"])
+            if season_pack_tag_id in s.tags:
+                season_pack_series.add(s.id)
 
     # Build per-series delay overrides from delayby_<N> tags
     series_delay_override = {}
     for s in series:
-        override = _get_delay_override(s.get("tags", []), id_to_label, s.get("title", f"id:{s['id']}"))
+        override = _get_delay_override(s.tags, tags, s.title)
         if override is not None:
-            series_delay_override[s["id"]] = override
+            series_delay_override[s.id] = override
 
+    ignore_tag_ids = tags.ids(Config.IGNORE_TAG_NAME)
     tracked = []
     for s in series:
-        if not s.get("monitored"): continue
-        if Config.IGNORE_TAG_NAME and any(id_to_label.get(tid,"").lower()==Config.IGNORE_TAG_NAME.lower() for tid in s.get("tags",[])):
+        if not s.monitored: continue
+        if not ignore_tag_ids.isdisjoint(s.tags):
             continue
-        seasons = s.get("seasons",[]) or []
-        if not seasons: continue
+        if not s.seasons: continue
         # Process all monitored seasons, not just the latest
-        for season in seasons:
-            if season.get("monitored"):
-                tracked.append((s["id"], season["seasonNumber"]))
-    assessed = 0
+        monitored_seasons = [season.number for season in s.seasons if season.monitored]
+        if monitored_seasons:
+            tracked.append((s.id, monitored_seasons))
 
-    default_delay = timedelta(minutes=Config.DELAY_MINUTES)
+    settings = SonarrSettings.from_config(Config)
     now = datetime.now(timezone.utc)
-
-    eps_to_monitor = []
-    eps_to_unmonitor = []
-    series_to_remove_tag = set()  # Track series that should have auto-tag removed
-    series_episodes_to_check = {}  # Track all episodes per series for tag removal logic
-
-    for sid, season in tracked:
-        eps = _req("GET","/api/v3/episode", params={"seriesId": sid, "seasonNumber": season}).json()
-
-        # Store episodes for this series for later tag removal check
-        if sid not in series_episodes_to_check:
-            series_episodes_to_check[sid] = []
-        series_episodes_to_check[sid].extend(eps)
-
-        # Resolve effective delay for this series (per-series override or global default)
-        effective_delay = series_delay_override.get(sid, default_delay)
-
-        # Check if this series has season pack mode enabled
-        use_season_pack_mode = sid in season_pack_series
-
-        if use_season_pack_mode:
-            # Season pack mode: Find trigger episode and potentially monitor entire season
-            trigger_episode = None
-
-            # Find Episode 1 or first episode with air date
-            for e in sorted(eps, key=lambda x: x.get("episodeNumber", 999)):
-                if e.get("airDateUtc"):
-                    trigger_episode = e
-                    break
-
-            if trigger_episode:
-                air = trigger_episode.get("airDateUtc")
-                try:
-                    air_dt = datetime.strptime(air, AIR_FMT).replace(tzinfo=timezone.utc)
-                    threshold = air_dt + effective_delay
-
-                    # Check if trigger episode threshold has been met
-                    if now >= threshold:
-                        # Check auto-tag and time window for season pack mode
-                        has_auto_tag = sid in series_with_auto_tag
-                        within_window = True
-                        if remonitor_window is not None:
-                            within_window = (now - air_dt) <= remonitor_window
-
-                        if has_auto_tag and within_window:
-                            # Re-monitor all episodes in this season (excluding those with files or no air dates)
-                            season_episodes_added = 0
-                            for e in eps:
-                                assessed += 1
-                                # Skip episodes without air dates
-                                if not e.get("airDateUtc"):
-                                    continue
-                                if Config.SKIP_IF_FILE and e.get("hasFile"):
-                                    continue
-                                if not e.get("monitored", False):
-                                    series_title = series_map.get(sid, "Unknown Series")
-                                    episode_number = e.get("episodeNumber", "?")
-                                    episode_title = e.get("title", "Unknown Title")
-                                    formatted = f"{series_title} – S{season:02}E{episode_number:02} – {episode_title}"
-                                    log.info("MONITOR (season pack): %s", formatted)
-                                    eps_to_monitor.append(e["id"])
-                                    season_episodes_added += 1
-
-                            if season_episodes_added > 0:
-                                series_title = series_map.get(sid, "Unknown Series")
-                                log.info("SEASON PACK MODE: Re-monitored %d episodes for %s S%02d",
-                                       season_episodes_added, series_title, season)
-                                series_to_remove_tag.add(sid)
-                    else:
-                        # Still before trigger - unmonitor any monitored future episodes
-                        for e in eps:
-                            air = e.get("airDateUtc")
-                            assessed += 1
-
-                            # Handle episodes without air dates
-                            if not air:
-                                if e.get("monitored", False):
-                                    series_title = series_map.get(sid, "Unknown Series")
-                                    episode_number = e.get("episodeNumber", "?")
-                                    episode_title = e.get("title", "Unknown Title")
-                                    formatted = f"{series_title} – S{season:02}E{episode_number:02} – {episode_title}"
-                                    log.info("UNMONITOR (no air date): %s", formatted)
-                                    eps_to_unmonitor.append(e["id"])
-                                    # Ensure the auto-unmonitored tag is applied to the parent series
-                                    if not Config.DRY_RUN:
-                                        s = _req("GET", f"/api/v3/series/{sid}").json()
-                                        if auto_tag_id not in s.get("tags", []):
-                                            s["tags"] = s.get("tags", []) + [auto_tag_id]
-                                            _req("PUT", f"/api/v3/series/{sid}", json=s)
-                                continue
-                            try:
-                                air_dt = datetime.strptime(air, AIR_FMT).replace(tzinfo=timezone.utc)
-                            except Exception:
-                                continue
-                            if now < threshold and e.get("monitored", False):
-                                series_title = series_map.get(sid, "Unknown Series")
-                                episode_number = e.get("episodeNumber", "?")
-                                episode_title = e.get("title", "Unknown Title")
-                                formatted = f"{series_title} – S{season:02}E{episode_number:02} – {episode_title} (airDate: {air})"
-                                log.info("UNMONITOR: %s", formatted)
-                                eps_to_unmonitor.append(e["id"])
-                                # Ensure the auto-unmonitored tag is applied to the parent series
-                                if not Config.DRY_RUN:
-                                    s = _req("GET", f"/api/v3/series/{sid}").json()
-                                    if auto_tag_id not in s.get("tags", []):
-                                        s["tags"] = s.get("tags", []) + [auto_tag_id]
-                                        _req("PUT", f"/api/v3/series/{sid}", json=s)
-                except Exception:
-                    continue
-        else:
-            # Standard mode: Process each episode individually
-            for e in eps:
-                air = e.get("airDateUtc")
-                assessed += 1
-
-                # Handle episodes without air dates
-                if not air:
-                    if e.get("monitored", False):
-                        series_title = series_map.get(sid, "Unknown Series")
-                        episode_number = e.get("episodeNumber", "?")
-                        episode_title = e.get("title", "Unknown Title")
-                        formatted = f"{series_title} – S{season:02}E{episode_number:02} – {episode_title}"
-                        log.info("UNMONITOR (no air date): %s", formatted)
-                        eps_to_unmonitor.append(e["id"])
-                        # Ensure the auto-unmonitored tag is applied to the parent series
-                        if not Config.DRY_RUN:
-                            s = _req("GET", f"/api/v3/series/{sid}").json()
-                            if auto_tag_id not in s.get("tags", []):
-                                s["tags"] = s.get("tags", []) + [auto_tag_id]
-                                _req("PUT", f"/api/v3/series/{sid}", json=s)
-                    continue
-                try:
-                    air_dt = datetime.strptime(air, AIR_FMT).replace(tzinfo=timezone.utc)
-                except Exception:
-                    continue
-                if Config.SKIP_IF_FILE and e.get("hasFile"):
-                    continue
-                threshold = air_dt + effective_delay
-                monitored = bool(e.get("monitored", False))
-                series_title = series_map.get(sid, "Unknown Series")
-                season_number = season
-                episode_number = e.get("episodeNumber", "?")
-                episode_title = e.get("title", "Unknown Title")
-                formatted = f"{series_title} – S{season_number:02}E{episode_number:02} – {episode_title} (airDate: {air})"
-
-                # Re-monitoring logic: Check auto-tag, threshold, and time window
-                if now >= threshold and not monitored:
-                    has_auto_tag = sid in series_with_auto_tag
-                    within_window = True
-                    if remonitor_window is not None:
-                        within_window = (now - air_dt) <= remonitor_window
-
-                    if has_auto_tag and within_window:
-                        log.info("MONITOR: %s", formatted)
-                        eps_to_monitor.append(e["id"])
-                        series_to_remove_tag.add(sid)
-                elif now < threshold and monitored:
-                    log.info("UNMONITOR: %s", formatted)
-                    eps_to_unmonitor.append(e["id"])
-                    # Ensure the auto-unmonitored tag is applied to the parent series
-                    if not Config.DRY_RUN:
-                        s = _req("GET", f"/api/v3/series/{sid}").json()
-                        if auto_tag_id not in s.get("tags", []):
-                            s["tags"] = s.get("tags", []) + [auto_tag_id]
-                            _req("PUT", f"/api/v3/series/{sid}", json=s)
-
-    if eps_to_unmonitor:
-        if Config.DRY_RUN:
-            log.info("[DRY] PUT /api/v3/episode/monitor -> %s", json_module.dumps({"episodeIds": eps_to_unmonitor, "monitored": False}))
-        else:
-            _req("PUT","/api/v3/episode/monitor", json={"episodeIds": eps_to_unmonitor, "monitored": False})
-    if eps_to_monitor:
-        if Config.DRY_RUN:
-            log.info("[DRY] PUT /api/v3/episode/monitor -> %s", json_module.dumps({"episodeIds": eps_to_monitor, "monitored": True}))
-        else:
-            _req("PUT","/api/v3/episode/monitor", json={"episodeIds": eps_to_monitor, "monitored": True})
-
-    # Remove auto-tag from series that had episodes re-monitored
-    # BUT only if there are no remaining episodes that still need re-monitoring
-    for sid in series_to_remove_tag:
-        # Check if any episodes in this series still need re-monitoring
-        should_keep_tag = False
-
-        if sid in series_episodes_to_check:
-            for e in series_episodes_to_check[sid]:
-                # Skip if episode is monitored (already handled)
-                if e.get("monitored", False):
-                    continue
-
-                # Skip if episode has a file (won't re-monitor anyway due to SKIP_IF_FILE)
-                if Config.SKIP_IF_FILE and e.get("hasFile"):
-                    continue
-
-                # Skip if no air date (won't re-monitor)
-                air = e.get("airDateUtc")
-                if not air:
+    now_ts = now.timestamp()
+
+    # Incremental sync: skip series whose listing and decision inputs are unchanged since they
+    # were last evaluated, unless one of their threshold/window boundaries has been crossed since.
+    # Series carrying the auto-tag are never skipped at the series level: their season statistics
+    # only count monitored episodes, so they don't change when an episode unmonitarr unmonitored
+    # gets (or moves) its air date. Their episodes are fetched and compared one by one instead.
+    store = get_state_store()
+    series_state = episode_state = {}
+    context_fps = {}
+    series_fps = {}
+    if store:
+        store_settings = (Config.SONARR_REMONITOR_WINDOW_DAYS, Config.SKIP_IF_FILE, Config.IGNORE_TAG_NAME, auto_tag_id)
+        series_state = store.load(inst.state_kind("series"))
+        episode_state = store.load(inst.state_kind("episode"))
+        series_by_id = {s.id: s for s in series}
+        for sid, _ in tracked:
+            s = series_by_id[sid]
+            context_fps[sid] = _series_context_fingerprint(
+                s, tags, store_settings, series_delay_override.get(sid, settings.default_delay), sid in season_pack_series)
+            series_fps[sid] = _series_fingerprint(s, context_fps[sid])
+        pending = [t for t in tracked if t[0] in series_with_auto_tag
+                   or not is_settled(series_state.get(t[0]), series_fps[t[0]], now_ts)]
+        log.info("Incremental sync: %d of %d series unchanged, skipped", len(tracked) - len(pending), len(tracked))
+        settled_series = [t[0] for t in tracked if t not in pending]
+        tracked = pending
+    else:
+        settled_series = []
+
+    # Full sweeps can be checkpointed: the tracked series are then processed in batches and a
+    # sweep interrupted by a restart resumes after the last completed batch
+    cp = None
+    if series_ids is None:
+        cp = checkpoint.start(inst.key, fingerprint(settings, Config.IGNORE_TAG_NAME, Config.SEASON_PACK_MODE,
+                                                    auto_tag_id, Config.DRY_RUN), now_ts)
+    if cp:
+        with phase("writes"):
+            cp.send_pending(_send_writes)
+        tracked = [t for t in tracked if t[0] not in cp.processed]
+        batches = chunked(tracked, Config.CHECKPOINT_BATCH_SIZE)
+    else:
+        batches = [tracked]
+
+    def sweep(batch):
+        """Fetch, plan, apply and record the series in `batch`. Returns the plan."""
+        # Snapshot the episodes of every tracked season, then plan against it without further I/O
+        with phase("episode fan-out"):
+            seasons = list(_iter_tracked_seasons(batch, failed))
+        skipped_episodes = set()
+        if store:
+            for sid, _, eps in seasons:
+                if sid in season_pack_series:
                     continue
-
-                # Check if episode could be re-monitored in the future
-                try:
-                    air_dt = datetime.strptime(air, AIR_FMT).replace(tzinfo=timezone.utc)
-                    threshold = air_dt + series_delay_override.get(sid, default_delay)
-
-                    # Keep tag if episode hasn't aired yet (will need re-monitoring later)
-                    if air_dt > now:
-                        should_keep_tag = True
-                        break
-
-                    # Keep tag if episode has aired but threshold not met yet
-                    if now < threshold:
-                        should_keep_tag = True
-                        break
-
-                    # Episode has aired and threshold met - check if within window
-                    within_window = True
-                    if remonitor_window is not None:
-                        within_window = (now - air_dt) <= remonitor_window
-
-                    # Keep tag if episode is within window (could still be re-monitored)
-                    if within_window:
-                        should_keep_tag = True
-                        break
-                except Exception:
+                for e in eps:
+                    if is_settled(episode_state.get(e.id), _episode_fingerprint(e, context_fps[sid]), now_ts):
+                        skipped_episodes.add(e.id)
+
+        library = SonarrLibrary(seasons, series_map, series_with_auto_tag, season_pack_series,
+                                series_delay_override, frozenset(skipped_episodes))
+        with phase("decision"):
+            plan = plan_sonarr(library, settings, now)
+        batch_ids = [sid for sid, _ in batch]
+        with phase("writes"):
+            failed.update(_apply(plan, auto_tag_id, seasons, cp, batch_ids))
+
+        if store:
+            # Record what was evaluated this run; skipped episodes keep their previous row
+            decided = {eid: "monitor" for eid in plan.monitor}
+            decided.update({eid: "unmonitor" for eid in plan.unmonitor})
+            episode_rows = []
+            series_rows = []
+            series_episodes = {}
+            for sid, _, eps in seasons:
+                series_episodes.setdefault(sid, []).extend(eps)
+            for sid, eps in series_episodes.items():
+                if sid in failed:
+                    # Not applied: re-evaluated by the retry or the next run
                     continue
-
-        if should_keep_tag:
-            log.info("Keeping auto-tag on series (episodes still need re-monitoring): %s", series_map.get(sid, f"id:{sid}"))
-        else:
-            if Config.DRY_RUN:
-                log.info("[DRY] Removing auto-tag from series: %s", series_map.get(sid, f"id:{sid}"))
-            else:
-                s = _req("GET", f"/api/v3/series/{sid}").json()
-                if auto_tag_id in s.get("tags", []):
-                    s["tags"] = [t for t in s.get("tags", []) if t != auto_tag_id]
-                    _req("PUT", f"/api/v3/series/{sid}", json=s)
-
-    if eps_to_monitor or eps_to_unmonitor:
-        log.info("SUMMARY: Assessed %d, Managed %d, Unmonitored %d, Monitored %d", assessed, len(eps_to_monitor) + len(eps_to_unmonitor), len(eps_to_unmonitor), len(eps_to_monitor))
-    else:
-        log.info("SUMMARY: Assessed %d, Managed 0, Unmonitored 0, Monitored 0", assessed)
-
-def run_once():
+                series_decision = "tagged" if sid in plan.tagged_series else NOOP
+                series_next = None
+                for e in eps:
+                    if e.id in skipped_episodes:
+                        next_check = episode_state[e.id][2]
+                    else:
+                        next_check = plan.next_checks[e.id]
+                        decision = decided.get(e.id, NOOP)
+                        episode_rows.append((e.id, _episode_fingerprint(e, context_fps[sid]), decision, next_check, None))
+                        if decision != NOOP:
+                            series_decision = decision
+                    if next_check is not None and (series_next is None or next_check < series_next):
+                        series_next = next_check
+                series_rows.append((sid, series_fps[sid], series_decision, series_next, plan.due.get(sid)))
+            store.record(inst.state_kind("episode"), episode_rows, now_ts)
+            store.record(inst.state_kind("series"), series_rows, now_ts)
+        if cp:
+            cp.done(batch_ids, plan.due, failed)
+        return plan
+
+    assessed = managed = unmonitored = monitored = 0
+    due = {}
+    for batch in batches:
+        plan = sweep(batch)
+        assessed += plan.assessed
+        managed += plan.managed
+        unmonitored += len(plan.unmonitor)
+        monitored += len(plan.monitor)
+        due.update(plan.due)
+    if cp:
+        cp.finish()
+
+    if Config.SCHEDULER_MODE == "event":
+        # Publish each series' next threshold/window transition for the event scheduler. Only
+        # series managed by unmonitarr can be re-monitored; settled series keep their stored
+        # transition, and those processed before a checkpointed sweep was interrupted the one saved then.
+        transitions = {sid: series_state[sid][3] for sid in settled_series}
+        if cp:
+            transitions.update((sid, ts) for sid, ts in cp.processed.items() if ts is not None and sid in series_map)
+        transitions.update(due)
+        transition_schedule.update(inst.key, transitions, [s.id for s in series])
+
+    log.info("SUMMARY: Assessed %d, Managed %d, Unmonitored %d, Monitored %d", assessed, managed, unmonitored, monitored)
+    metrics.record_run(inst.key, assessed, monitored, unmonitored)
+    return failed
+
+def run_once(series_ids=None):
     log.info("Sonarr app starting…")
-    if not (Config.ENABLE_SONARR and Config.SONARR_URL and Config.SONARR_API_KEY):
+    inst = _instance()
+    if not (Config.ENABLE_SONARR and inst.url and inst.api_key):
         return
 
-    last_err = None
-    for attempt in range(1, 4):
-        try:
-            _run_once_inner()
-            return
-        except Exception as e:
-            last_err = e
-            if attempt < 3:
-                log.warning("Attempt %d/3 failed: %s", attempt, str(e))
-                time.sleep(5)
-            else:
-                log.error("Failed after 3 attempts: %s", str(e))
-
-def run_job():
-    run_once()
+    started = time.time()
+    try:
+        # Series that fail are retried on their own, not by repeating the whole run
+        failed = run_with_item_retries(_run_once_inner, series_ids, _retry_policy(), Config.ITEM_RETRIES, log, "series")
+        # A full sweep is successful once none of its series is still failing after the retries
+        if series_ids is None and not failed:
+            metrics.record_sweep(inst.key, started)
+    except CircuitOpenError as e:
+        log.error("Run stopped: %s", e)
+
+def run_job(item_ids=None, instance=None):
+    """Run a Sonarr job for the default instance, or for the named `instance`."""
+    with instances.running(instance):
+        run_once(item_ids)
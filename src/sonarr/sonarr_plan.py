@@ -0,0 +1,336 @@
+"""
+Pure Sonarr planning stage.
+
+plan_sonarr() takes a snapshot of the library plus `now` and returns a
+SonarrPlan of the episodes to (un)monitor and series tags to change. It makes
+no HTTP calls and does no logging, so it can be run, profiled and benchmarked
+on its own; sonarr_app fetches the snapshot and applies the plan.
+
+Episodes are core.records.Episode, with air dates pre-parsed into epoch
+microseconds. With DECISION_ENGINE=numpy, standard-mode decisions, the
+auto-tag check and the boundaries are computed in batch over epoch arrays (see
+core.vectorized); both engines produce the same plan.
+"""
+from datetime import timedelta
+from typing import NamedTuple, Optional
+from core import vectorized
+from core.records import epoch_us, format_air, seconds, us
+from core.state_store import next_boundary
+
+class SonarrSettings(NamedTuple):
+    default_delay: timedelta
+    remonitor_window: Optional[timedelta]  # None = unlimited
+    skip_if_file: bool
+    engine: str = "python"  # python | numpy
+
+    @classmethod
+    def from_config(cls, config):
+        window = timedelta(days=config.SONARR_REMONITOR_WINDOW_DAYS) if config.SONARR_REMONITOR_WINDOW_DAYS > 0 else None
+        engine = "numpy" if config.DECISION_ENGINE == "numpy" else "python"
+        return cls(timedelta(minutes=config.DELAY_MINUTES), window, bool(config.SKIP_IF_FILE), engine)
+
+class SonarrLibrary(NamedTuple):
+    """Snapshot of the Sonarr library a plan is computed from."""
+    seasons: list        # (series_id, season_number, [core.records.Episode]) per monitored season, in sweep order
+    titles: dict         # series_id -> title
+    auto_tagged: set     # series currently carrying AUTO_TAG_NAME
+    season_pack: set     # series using season pack mode
+    delays: dict         # series_id -> delay override from a delayby_<N> tag
+    settled: frozenset = frozenset()  # episode ids skipped by incremental sync (standard mode only)
+
+class SonarrPlan:
+    """Transitions decided by plan_sonarr()."""
+    __slots__ = ("monitor", "unmonitor", "tag_add", "tag_remove", "tagged_series",
+                 "messages", "assessed", "next_checks", "due")
+
+    def __init__(self):
+        self.monitor = []            # episode ids to monitor, in decision order
+        self.unmonitor = []          # episode ids to unmonitor, in decision order
+        self.tag_add = set()         # series ids that need the auto-tag added
+        self.tag_remove = set()      # series ids that need the auto-tag removed
+        self.tagged_series = set()   # series whose auto-tag was considered for a change
+        self.messages = []           # decision log lines, in decision order
+        self.assessed = 0
+        self.next_checks = {}        # episode id -> next air/threshold/window boundary (evaluated episodes)
+        self.due = {}                # series id -> next threshold/window transition (managed series)
+
+    @property
+    def managed(self):
+        return len(self.monitor) + len(self.unmonitor)
+
+def _label(title, season, e, with_air=False):
+    episode_number = e.number if e.number is not None else "?"
+    formatted = f"{title} – S{season:02}E{episode_number:02} – {e.title}"
+    return f"{formatted} (airDate: {format_air(e.air)})" if with_air else formatted
+
+def _window(settings):
+    """The re-monitor window in microseconds, None = unlimited."""
+    return us(settings.remonitor_window) if settings.remonitor_window is not None else None
+
+def _within_window(now, air, window):
+    return window is None or now - air <= window
+
+def _plan_season_pack(plan, sid, season, eps, title, delay, has_auto_tag, settings, now):
+    """Season pack mode: the first aired episode's threshold decides for the whole season.
+    Returns (tag_add, tag_remove) for the series. Times are epoch microseconds."""
+    tag_add = tag_remove = False
+
+    # Find Episode 1 or first episode with air date
+    trigger_episode = None
+    for e in sorted(eps, key=lambda x: x.number if x.number is not None else 999):
+        if e.has_air:
+            trigger_episode = e
+            break
+    if not trigger_episode or trigger_episode.air is None:
+        return tag_add, tag_remove
+
+    try:
+        air = trigger_episode.air
+        if now >= air + delay:
+            if has_auto_tag and _within_window(now, air, _window(settings)):
+                # Re-monitor all episodes in this season (excluding those with files or no air dates)
+                season_episodes_added = 0
+                for e in eps:
+                    plan.assessed += 1
+                    if not e.has_air:
+                        continue
+                    if settings.skip_if_file and e.has_file:
+                        continue
+                    if not e.monitored:
+                        plan.messages.append(f"MONITOR (season pack): {_label(title, season, e)}")
+                        plan.monitor.append(e.id)
+                        season_episodes_added += 1
+                if season_episodes_added > 0:
+                    plan.messages.append(f"SEASON PACK MODE: Re-monitored {season_episodes_added} episodes for {title} S{season:02d}")
+                    tag_remove = True
+        else:
+            # Still before trigger - unmonitor any monitored future episodes
+            for e in eps:
+                plan.assessed += 1
+                if not e.has_air:
+                    if e.monitored:
+                        plan.messages.append(f"UNMONITOR (no air date): {_label(title, season, e)}")
+                        plan.unmonitor.append(e.id)
+                        tag_add = True
+                    continue
+                if e.air is None:
+                    continue
+                if e.monitored:
+                    plan.messages.append(f"UNMONITOR: {_label(title, season, e, True)}")
+                    plan.unmonitor.append(e.id)
+                    tag_add = True
+    except Exception:
+        pass
+    return tag_add, tag_remove
+
+def _plan_standard(plan, sid, season, eps, title, delay, has_auto_tag, settings, now, settled):
+    """Standard mode: each episode is decided on its own threshold. Returns (tag_add, tag_remove)."""
+    tag_add = tag_remove = False
+    window = _window(settings)
+    for e in eps:
+        if e.id in settled:
+            continue
+        plan.assessed += 1
+
+        # Handle episodes without air dates
+        if not e.has_air:
+            if e.monitored:
+                plan.messages.append(f"UNMONITOR (no air date): {_label(title, season, e)}")
+                plan.unmonitor.append(e.id)
+                tag_add = True
+            continue
+        if e.air is None:
+            continue
+        if settings.skip_if_file and e.has_file:
+            continue
+        threshold = e.air + delay
+
+        # Re-monitoring logic: Check auto-tag, threshold, and time window
+        if now >= threshold and not e.monitored:
+            if has_auto_tag and _within_window(now, e.air, window):
+                plan.messages.append(f"MONITOR: {_label(title, season, e, True)}")
+                plan.monitor.append(e.id)
+                tag_remove = True
+        elif now < threshold and e.monitored:
+            plan.messages.append(f"UNMONITOR: {_label(title, season, e, True)}")
+            plan.unmonitor.append(e.id)
+            tag_add = True
+    return tag_add, tag_remove
+
+def _should_keep_tag(eps, delay, settings, now):
+    """True if any unmonitored episode of a series could still be re-monitored later."""
+    window = _window(settings)
+    for e in eps:
+        # Skip if episode is monitored (already handled), has a file (won't re-monitor
+        # anyway due to SKIP_IF_FILE) or has no usable air date
+        if e.monitored or (settings.skip_if_file and e.has_file) or e.air is None:
+            continue
+        # Not aired yet, threshold not met yet, or still within the window
+        if e.air > now or now < e.air + delay:
+            return True
+        if _within_window(now, e.air, window):
+            return True
+    return False
+
+def _finish_tags(plan, library, series_to_add_tag, series_to_remove_tag, keep_tag):
+    """Resolve the net series tag changes. keep_tag(sid) tells whether a series still needs its auto-tag."""
+    # Remove auto-tag from series that had episodes re-monitored,
+    # BUT only if there are no remaining episodes that still need re-monitoring
+    tag_removals = set()
+    for sid in series_to_remove_tag:
+        title = library.titles.get(sid, f"id:{sid}")
+        if keep_tag(sid):
+            plan.messages.append(f"Keeping auto-tag on series (episodes still need re-monitoring): {title}")
+        else:
+            plan.messages.append(f"Removing auto-tag from series: {title}")
+            tag_removals.add(sid)
+
+    # Only real changes are sent: a series tagged and untagged in the same run needs no write at all
+    plan.tag_add = {sid for sid in series_to_add_tag if sid not in library.auto_tagged} - tag_removals
+    plan.tag_remove = tag_removals & library.auto_tagged
+    plan.tagged_series = series_to_add_tag | series_to_remove_tag
+
+def plan_sonarr(library, settings, now):
+    """Decide every episode transition and series tag change for `library` at `now`."""
+    if settings.engine == "numpy" and vectorized.available():
+        return _plan_sonarr_numpy(library, settings, now)
+    plan = SonarrPlan()
+    now_ts = now.timestamp()
+    now_us = epoch_us(now)
+    # Delays as microseconds, like the pre-parsed air dates
+    delays = {sid: us(d) for sid, d in library.delays.items()}
+    default_delay = us(settings.default_delay)
+    series_to_add_tag = set()
+    series_to_remove_tag = set()
+    series_episodes = {}  # all episodes per series, for the tag removal check
+
+    for sid, season, eps in library.seasons:
+        series_episodes.setdefault(sid, []).extend(eps)
+        title = library.titles.get(sid, "Unknown Series")
+        delay = delays.get(sid, default_delay)
+        has_auto_tag = sid in library.auto_tagged
+        if sid in library.season_pack:
+            tag_add, tag_remove = _plan_season_pack(plan, sid, season, eps, title, delay, has_auto_tag, settings, now_us)
+        else:
+            tag_add, tag_remove = _plan_standard(plan, sid, season, eps, title, delay, has_auto_tag, settings, now_us,
+                                                 library.settled)
+        if tag_add:
+            series_to_add_tag.add(sid)
+        if tag_remove:
+            series_to_remove_tag.add(sid)
+
+    _finish_tags(plan, library, series_to_add_tag, series_to_remove_tag, lambda sid: _should_keep_tag(
+        series_episodes.get(sid, []), delays.get(sid, default_delay), settings, now_us))
+
+    # Boundaries for incremental sync and the event scheduler
+    window = _window(settings)
+    for sid, eps in series_episodes.items():
+        delay = delays.get(sid, default_delay)
+        managed = sid in library.auto_tagged or sid in series_to_add_tag
+        for e in eps:
+            if e.air is None:
+                if e.id not in library.settled:
+                    plan.next_checks[e.id] = None
+                continue
+            threshold = seconds(e.air + delay)
+            window_end = seconds(e.air + window) if window is not None else None
+            if e.id not in library.settled:
+                plan.next_checks[e.id] = next_boundary(now_ts, seconds(e.air), threshold, window_end)
+            if not managed or (settings.skip_if_file and e.has_file):
+                continue
+            due = next_boundary(now_ts, threshold, window_end)
+            if due is not None and (plan.due.get(sid) is None or due < plan.due[sid]):
+                plan.due[sid] = due
+    return plan
+
+def _plan_sonarr_numpy(library, settings, now):
+    """plan_sonarr() with air dates parsed once into epoch arrays and every standard-mode
+    episode decided in one batch. Season pack seasons are few and go through the loop."""
+    np = vectorized.np
+    plan = SonarrPlan()
+    now_us = vectorized.epoch_us(now)
+
+    # Flatten the snapshot: spans[k] = (series_id, season, lo, hi) into `episodes`
+    episodes = []
+    spans = []
+    for sid, season, eps in library.seasons:
+        spans.append((sid, season, len(episodes), len(episodes) + len(eps)))
+        episodes.extend(eps)
+    n = len(episodes)
+
+    air, valid = vectorized.epochs([e.air for e in episodes])
+    has_air = np.fromiter((e.has_air for e in episodes), bool, n)
+    monitored = np.fromiter((e.monitored for e in episodes), bool, n)
+    file_skip = (np.fromiter((e.has_file for e in episodes), bool, n)
+                 if settings.skip_if_file else np.zeros(n, dtype=bool))
+    settled = np.fromiter((e.id in library.settled for e in episodes), bool, n)
+    delay = np.empty(n, dtype=np.int64)
+    auto = np.empty(n, dtype=bool)
+    standard = np.empty(n, dtype=bool)
+    for sid, _, lo, hi in spans:
+        delay[lo:hi] = vectorized.us(library.delays.get(sid, settings.default_delay))
+        auto[lo:hi] = sid in library.auto_tagged
+        standard[lo:hi] = sid not in library.season_pack
+
+    threshold = air + delay
+    window_end = air + vectorized.us(settings.remonitor_window) if settings.remonitor_window is not None else None
+    within = now_us <= window_end if window_end is not None else np.ones(n, dtype=bool)
+    past = now_us >= threshold
+
+    # Standard mode, in the order of the checks in _plan_standard()
+    active = standard & ~settled
+    no_air_unmonitor = active & ~has_air & monitored
+    decidable = active & valid & ~file_skip
+    to_monitor = decidable & past & ~monitored & auto & within
+    to_unmonitor = (decidable & ~past & monitored) | no_air_unmonitor
+    changed = np.flatnonzero(to_monitor | to_unmonitor)
+    plan.assessed = int(active.sum())
+
+    series_to_add_tag = set()
+    series_to_remove_tag = set()
+    series_spans = {}
+    for sid, season, lo, hi in spans:
+        series_spans.setdefault(sid, []).append((lo, hi))
+        title = library.titles.get(sid, "Unknown Series")
+        if sid in library.season_pack:
+            tag_add, tag_remove = _plan_season_pack(plan, sid, season, episodes[lo:hi], title,
+                                                    vectorized.us(library.delays.get(sid, settings.default_delay)),
+                                                    sid in library.auto_tagged, settings, now_us)
+        else:
+            tag_add = tag_remove = False
+            for i in changed[np.searchsorted(changed, lo):np.searchsorted(changed, hi)]:
+                e = episodes[i]
+                if to_monitor[i]:
+                    plan.messages.append(f"MONITOR: {_label(title, season, e, True)}")
+                    plan.monitor.append(e.id)
+                    tag_remove = True
+                elif no_air_unmonitor[i]:
+                    plan.messages.append(f"UNMONITOR (no air date): {_label(title, season, e)}")
+                    plan.unmonitor.append(e.id)
+                    tag_add = True
+                else:
+                    plan.messages.append(f"UNMONITOR: {_label(title, season, e, True)}")
+                    plan.unmonitor.append(e.id)
+                    tag_add = True
+        if tag_add:
+            series_to_add_tag.add(sid)
+        if tag_remove:
+            series_to_remove_tag.add(sid)
+
+    # Episodes that could still be re-monitored later keep their series' auto-tag (_should_keep_tag)
+    keep = ~monitored & ~file_skip & valid & ((air > now_us) | ~past | within)
+    _finish_tags(plan, library, series_to_add_tag, series_to_remove_tag,
+                 lambda sid: any(keep[lo:hi].any() for lo, hi in series_spans[sid]))
+
+    # Boundaries for incremental sync and the event scheduler
+    next_check = vectorized.next_boundary(now_us, air, threshold, window_end)
+    for i in np.flatnonzero(~settled):
+        plan.next_checks[episodes[i].id] = vectorized.to_seconds(next_check[i]) if valid[i] else None
+    due = np.where(valid & ~file_skip, vectorized.next_boundary(now_us, threshold, window_end), vectorized.NEVER)
+    for sid, ranges in series_spans.items():
+        if sid not in library.auto_tagged and sid not in series_to_add_tag:
+            continue
+        first = min((int(due[lo:hi].min()) for lo, hi in ranges if hi > lo), default=vectorized.NEVER)
+        if first != vectorized.NEVER:
+            plan.due[sid] = vectorized.to_seconds(first)
+    return plan
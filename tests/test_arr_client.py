@@ -0,0 +1,232 @@
+import json
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from common.arr_client import (ArrClient, DryRunResponse, TagIndex, ensure_tag, fetch_listing, get_client,
+                               get_tag_index, iter_json_array, stream_items)
+
+
+class TestArrClient(unittest.TestCase):
+    def test_get_client_reuses_instance_per_url_and_key(self):
+        a = get_client("http://sonarr:8989/", "key")
+        b = get_client("http://sonarr:8989", "key")
+        c = get_client("http://sonarr:8989", "other")
+        self.assertIs(a, b)
+        self.assertIsNot(a, c)
+
+    @patch("common.arr_client.Config")
+    def test_requests_share_one_session(self, mock_config):
+        mock_config.DRY_RUN = False
+        client = ArrClient("http://radarr", "key", timeout=12, pool_size=4)
+        self.assertEqual(client.session.headers["X-Api-Key"], "key")
+
+        with patch.object(client.session, "request") as mock_request:
+            client.request("get", "/api/v3/movie")
+            client.request("GET", "/api/v3/tag", timeout=3)
+
+        mock_request.assert_any_call("GET", "http://radarr/api/v3/movie", timeout=12)
+        mock_request.assert_any_call("GET", "http://radarr/api/v3/tag", timeout=3)
+        self.assertEqual(client.session.get_adapter("http://radarr")._pool_maxsize, 4)
+
+    @patch("common.arr_client.Config")
+    def test_requests_are_counted_per_endpoint_and_status(self, mock_config):
+        from core import metrics
+        mock_config.DRY_RUN = False
+        client = ArrClient("http://sonarr", "key", timeout=5, pool_size=1, name="sonarr-test")
+
+        with patch.object(client.session, "request", return_value=MagicMock(status_code=404)):
+            client.request("GET", "/api/v3/series/12")
+            client.request("GET", "/api/v3/series/13")
+
+        labels = {"app": "sonarr-test", "method": "GET", "endpoint": "/api/v3/series/{id}", "status": 404}
+        self.assertEqual(metrics.UPSTREAM_REQUESTS.get(**labels), 2)
+        self.assertEqual(metrics.UPSTREAM_LATENCY.get(**labels)[0][-1], 2)
+
+    @patch("common.arr_client.Config")
+    def test_server_errors_back_off_the_limiter(self, mock_config):
+        from common.rate_limit import AdaptiveLimiter
+        mock_config.DRY_RUN = False
+        client = ArrClient("http://sonarr", "key", timeout=5, pool_size=1, name="sonarr-limited",
+                           limiter=AdaptiveLimiter(max_concurrency=4))
+
+        with patch.object(client.session, "request", return_value=MagicMock(status_code=503)):
+            with self.assertLogs("arr_client", level="INFO") as cm:
+                client.request("GET", "/api/v3/series")
+        self.assertEqual(client.limiter.stats()["concurrency_limit"], 2)
+        self.assertEqual(client.limiter.in_flight, 0)
+        self.assertIn("limiting to 2 concurrent request(s)", cm.output[0])
+
+    @patch("common.arr_client.time.sleep")
+    @patch("common.arr_client.Config")
+    def test_idempotent_requests_are_retried(self, mock_config, mock_sleep):
+        import requests
+        from common.retry import RetryPolicy
+        mock_config.DRY_RUN = False
+        client = ArrClient("http://sonarr", "key", timeout=5, pool_size=1, name="sonarr-retry",
+                           retry=RetryPolicy(retries=2, backoff=0.5))
+
+        responses = [requests.exceptions.ConnectionError("reset"), MagicMock(status_code=503), MagicMock(status_code=200)]
+        with patch.object(client.session, "request", side_effect=responses) as mock_request:
+            r = client.request("GET", "/api/v3/series")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(mock_request.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+        with patch.object(client.session, "request", return_value=MagicMock(status_code=503)) as mock_request:
+            self.assertEqual(client.request("POST", "/api/v3/tag", json={"label": "x"}).status_code, 503)
+        mock_request.assert_called_once()
+
+    @patch("common.arr_client.time.sleep")
+    @patch("common.arr_client.Config")
+    def test_open_circuit_fails_fast(self, mock_config, mock_sleep):
+        import requests
+        from common.retry import CircuitBreaker, CircuitOpenError, RetryPolicy
+        mock_config.DRY_RUN = False
+        client = ArrClient("http://radarr", "key", timeout=5, pool_size=1, name="radarr-down",
+                           retry=RetryPolicy(retries=5, backoff=0), breaker=CircuitBreaker(3, 60, "radarr-down"))
+
+        with patch.object(client.session, "request", side_effect=requests.exceptions.ConnectTimeout("down")) as mock_request:
+            with self.assertRaises(CircuitOpenError):
+                client.request("GET", "/api/v3/movie")
+            self.assertEqual(mock_request.call_count, 3)
+            with self.assertRaises(CircuitOpenError):
+                client.request("GET", "/api/v3/tag")
+            self.assertEqual(mock_request.call_count, 3)
+
+    @patch("common.arr_client.Config")
+    def test_failed_half_open_trial_doesnt_wedge_the_circuit(self, mock_config):
+        import requests
+        from common.retry import CircuitBreaker, CircuitOpenError, RetryPolicy
+        mock_config.DRY_RUN = False
+        breaker = CircuitBreaker(1, 0.05, "radarr-flaky")
+        client = ArrClient("http://radarr", "key", timeout=5, pool_size=1, name="radarr-flaky",
+                           retry=RetryPolicy(retries=0, backoff=0), breaker=breaker)
+        responses = [requests.exceptions.ConnectTimeout("down"),
+                     requests.exceptions.ChunkedEncodingError("reset mid-trial"), MagicMock(status_code=200)]
+
+        with patch.object(client.session, "request", side_effect=responses):
+            with self.assertRaises(requests.exceptions.ConnectTimeout):
+                client.request("GET", "/api/v3/movie")
+            with self.assertRaises(CircuitOpenError):
+                client.request("GET", "/api/v3/movie")
+            time.sleep(0.06)
+            with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+                client.request("GET", "/api/v3/movie")
+            self.assertEqual(breaker.state, "open")
+            time.sleep(0.06)
+            self.assertEqual(client.request("GET", "/api/v3/movie").status_code, 200)
+            self.assertEqual(breaker.state, "closed")
+
+    @patch("common.arr_client.Config")
+    def test_dry_run_short_circuits_writes(self, mock_config):
+        mock_config.DRY_RUN = True
+        client = ArrClient("http://radarr", "key", timeout=5, pool_size=1)
+
+        with patch.object(client.session, "request") as mock_request:
+            r = client.request("PUT", "/api/v3/movie/editor", json={"movieIds": [1]})
+
+        mock_request.assert_not_called()
+        self.assertIsInstance(r, DryRunResponse)
+        self.assertTrue(r.ok)
+
+    @patch("common.arr_client.Config")
+    def test_ensure_tag_creates_missing_tag(self, mock_config):
+        mock_config.DRY_RUN = False
+        req = MagicMock()
+        req.return_value.ok = True
+        req.return_value.json.return_value = [{"id": 4, "label": "Auto-Unmonitored"}]
+
+        self.assertEqual(ensure_tag(req, "auto-unmonitored", {}), 4)
+        req.assert_any_call("POST", "/api/v3/tag", json={"label": "auto-unmonitored"})
+        self.assertEqual(ensure_tag(req, "ignore", {"ignore": 2}), 2)
+
+    @patch("common.arr_client.Config")
+    def test_ensure_tag_uses_the_created_tag_and_invalidates_the_index(self, mock_config):
+        mock_config.DRY_RUN = False
+        tags = [{"id": 1, "label": "ignore"}]
+        req = MagicMock(return_value=MagicMock(ok=True, json=lambda: tags))
+        get_tag_index(req, "http://created", ttl=300)
+        req.reset_mock()
+        req.return_value = MagicMock(ok=True, json=lambda: {"id": 5, "label": "auto-unmonitored"})
+
+        self.assertEqual(ensure_tag(req, "auto-unmonitored", {}, cache_key="http://created"), 5)
+        req.assert_called_once_with("POST", "/api/v3/tag", json={"label": "auto-unmonitored"})
+        req.return_value = MagicMock(json=lambda: tags)
+        get_tag_index(req, "http://created", ttl=300)
+        req.assert_called_with("GET", "/api/v3/tag")
+
+
+class TestTagIndex(unittest.TestCase):
+    def test_lookups(self):
+        tags = TagIndex({1: "Ignore", 2: "ignore", 3: "delayby_-30", 4: "DELAYBY_90", 5: "delayby_x"})
+        self.assertEqual(tags.ids("IGNORE"), {1, 2})
+        self.assertEqual(tags.ids(""), frozenset())
+        self.assertEqual(tags.delays, {3: -30, 4: 90})
+        self.assertEqual(tags.labels([4, 9, 1]), ["", "DELAYBY_90", "Ignore"])
+        self.assertTrue(tags.covers([1, 5]))
+        self.assertFalse(tags.covers([1, 6]))
+
+    def test_index_is_cached_per_instance_for_ttl(self):
+        req = MagicMock(return_value=MagicMock(json=lambda: [{"id": 1, "label": "ignore"}]))
+        first = get_tag_index(req, "http://ttl", ttl=300)
+        self.assertIs(get_tag_index(req, "http://ttl", ttl=300), first)
+        self.assertEqual(req.call_count, 1)
+        self.assertIsNot(get_tag_index(req, "http://ttl", ttl=300, refresh=True), first)
+        get_tag_index(req, "http://ttl", ttl=0)
+        self.assertEqual(req.call_count, 3)
+
+
+class TestStreamingParser(unittest.TestCase):
+    ITEMS = [{"id": 1, "title": "Caf\u00e9 \"quoted\" [1], {x}", "tags": [1, 2], "images": [{"url": "/a.jpg"}]},
+             {"id": 2, "title": "\u6771\u4eac", "rating": 7.25, "hasFile": None}, 12345, "plain", []]
+
+    def _chunks(self, body, size):
+        return [body[i:i + size] for i in range(0, len(body), size)]
+
+    def test_items_survive_any_chunk_boundary(self):
+        body = json.dumps(self.ITEMS, ensure_ascii=False, indent=1).encode()
+        for size in (1, 2, 3, 7, 64, len(body)):
+            self.assertEqual(list(iter_json_array(self._chunks(body, size))), self.ITEMS, size)
+
+    def test_empty_array_and_whitespace(self):
+        self.assertEqual(list(iter_json_array([b"  [", b" ", b"] \n"])), [])
+
+    def test_malformed_or_truncated_bodies_raise(self):
+        for body in (b'{"message": "Unauthorized"}', b'[{"id": 1}', b'[{"id": 1} {"id": 2}]', b'[{"id": '):
+            with self.assertRaises(ValueError, msg=body):
+                list(iter_json_array(self._chunks(body, 4)))
+
+    def test_stream_items_projects_each_item_and_closes_the_response(self):
+        body = json.dumps(self.ITEMS[:2]).encode()
+        r = MagicMock(iter_content=lambda chunk_size: self._chunks(body, 5))
+
+        items = list(stream_items(r, lambda item: (item["id"], item.get("tags"))))
+
+        self.assertEqual(items, [(1, [1, 2]), (2, None)])
+        r.raise_for_status.assert_called_once()
+        r.close.assert_called_once()
+
+
+    @patch("common.retry.time.sleep")
+    def test_fetch_listing_resends_only_interrupted_bodies(self, mock_sleep):
+        import requests
+        from common.retry import RetryPolicy
+        body = json.dumps(self.ITEMS[:2]).encode()
+
+        def interrupted(chunk_size):
+            yield body[:5]
+            raise requests.exceptions.ChunkedEncodingError("connection reset")
+        responses = [MagicMock(iter_content=interrupted), MagicMock(iter_content=lambda chunk_size: self._chunks(body, 5))]
+        req = MagicMock(side_effect=responses)
+        items = fetch_listing(req, "/api/v3/movie", lambda item: item["id"], RetryPolicy(2, 0), MagicMock(), "Listing")
+        self.assertEqual((items, req.call_count), ([1, 2], 2))
+
+        # The client has already retried a request that failed: it is not sent again
+        req = MagicMock(side_effect=requests.exceptions.ConnectionError("refused"))
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            fetch_listing(req, "/api/v3/movie", None, RetryPolicy(2, 0), MagicMock(), "Listing")
+        self.assertEqual(req.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
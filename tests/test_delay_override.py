@@ -1,8 +1,15 @@
+import json
 import unittest
 from datetime import timedelta
 from unittest.mock import MagicMock, patch
 
 
+def _streamed(items):
+    """Response for a request made with stream=True, its JSON body served in small chunks."""
+    body = json.dumps(items).encode()
+    return MagicMock(iter_content=lambda chunk_size: (body[i:i + 64] for i in range(0, len(body), 64)))
+
+
 class TestGetDelayOverride(unittest.TestCase):
     """Tests for _get_delay_override in both radarr_app and sonarr_app."""
 
@@ -15,8 +22,9 @@ class TestGetDelayOverride(unittest.TestCase):
         return _get_delay_override
 
     def _make_id_to_label(self, labels):
-        """Build id_to_label dict from a list of label strings (ids are 1-indexed)."""
-        return {i + 1: label for i, label in enumerate(labels)}
+        """Build a TagIndex from a list of label strings (ids are 1-indexed)."""
+        from common.arr_client import TagIndex
+        return TagIndex({i + 1: label for i, label in enumerate(labels)})
 
     # --- radarr ---
 
@@ -40,7 +48,7 @@ class TestGetDelayOverride(unittest.TestCase):
 
     def test_radarr_empty_tags_returns_none(self):
         fn = self._get_radarr_fn()
-        result = fn([], {}, "Test Movie")
+        result = fn([], self._make_id_to_label([]), "Test Movie")
         self.assertIsNone(result)
 
     def test_radarr_multiple_matches_returns_none_and_logs(self):
@@ -116,6 +124,8 @@ class TestRadarrDelayOverrideIntegration(unittest.TestCase):
         mock_config.PREFERRED_RELEASE = "either"
         mock_config.IGNORE_INCINEMAS = False
         mock_config.DRY_RUN = True
+        mock_config.EDITOR_BATCH_SIZE = 500
+        mock_config.TAG_CACHE_SECONDS = 0
         mock_config.DELAY_MINUTES = 120  # global default: 2 hours
         mock_config.RADARR_REMONITOR_WINDOW_DAYS = 0
 
@@ -131,8 +141,7 @@ class TestRadarrDelayOverrideIntegration(unittest.TestCase):
         ]
 
         # Movie is unmonitored, has auto-tag and delayby_10 tag
-        movies_response = MagicMock()
-        movies_response.json.return_value = [{
+        movies_response = _streamed([{
             "id": 99,
             "title": "Test Movie",
             "monitored": False,
@@ -141,7 +150,7 @@ class TestRadarrDelayOverrideIntegration(unittest.TestCase):
             "digitalRelease": release_time,
             "physicalRelease": None,
             "inCinemas": None,
-        }]
+        }])
 
         ensure_tag_response = MagicMock()
         ensure_tag_response.ok = True
@@ -179,6 +188,9 @@ class TestSonarrDelayOverrideIntegration(unittest.TestCase):
         mock_config.SKIP_IF_FILE = False
         mock_config.AUTO_TAG_NAME = "auto-unmonitored"
         mock_config.DRY_RUN = True
+        mock_config.EDITOR_BATCH_SIZE = 500
+        mock_config.TAG_CACHE_SECONDS = 0
+        mock_config.EPISODE_FETCH_CONCURRENCY = 1
         mock_config.DELAY_MINUTES = 120  # global default
         mock_config.SONARR_REMONITOR_WINDOW_DAYS = 0
         mock_config.SEASON_PACK_MODE = False
@@ -196,19 +208,19 @@ class TestSonarrDelayOverrideIntegration(unittest.TestCase):
         ]
 
         # Series is monitored, has auto-tag and delayby_10 tag, one monitored season
-        series_response = MagicMock()
-        series_response.json.return_value = [{
+        series_response = _streamed([{
             "id": 10,
             "title": "Test Series",
             "monitored": True,
             "tags": [1, 2],  # has auto-tag and delayby_10
             "seasons": [{"seasonNumber": 1, "monitored": True}],
-        }]
+        }])
 
         # Episode is unmonitored, aired 30 min ago
         episodes_response = MagicMock()
         episodes_response.json.return_value = [{
             "id": 100,
+            "seasonNumber": 1,
             "episodeNumber": 1,
             "title": "Pilot",
             "airDateUtc": air_time,
@@ -0,0 +1,58 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+from fake_arr import API_KEY, FakeArrServer, FakeLibrary  # noqa: E402
+
+
+class TestSweepAgainstFakeArr(unittest.TestCase):
+    """Full sweeps through the real HTTP client against the fake Sonarr/Radarr server."""
+
+    def setUp(self):
+        self.library = FakeLibrary(series=20, episodes=12, movies=60)
+        self.server = FakeArrServer(self.library).start()
+        config = {"SONARR_URL": self.server.url, "SONARR_API_KEY": API_KEY, "ENABLE_SONARR": True,
+                  "RADARR_URL": self.server.url, "RADARR_API_KEY": API_KEY, "ENABLE_RADARR": True,
+                  "DRY_RUN": False, "INCREMENTAL_SYNC": False, "SCHEDULER_MODE": "interval"}
+        self.patches = [patch(f"core.config.Config.{k}", v) for k, v in config.items()]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_sonarr_sweep_is_idempotent(self):
+        from sonarr.sonarr_app import run_job
+        with self.assertLogs("sonarr", level="INFO"):
+            run_job()
+        first = dict(self.server.stats)
+        self.assertEqual(first["GET /api/v3/series"], 1)
+        self.assertIn("PUT /api/v3/episode/monitor", first)
+        self.assertTrue(self.library.episode_monitored)
+
+        self.server.stats.clear()
+        with self.assertLogs("sonarr", level="INFO") as cm:
+            run_job()
+        # Everything upcoming was unmonitored by the first sweep
+        self.assertFalse(any("UNMONITOR" in line for line in cm.output))
+
+    def test_radarr_sweep_applies_writes(self):
+        from radarr.radarr_app import run_radarr
+        with self.assertLogs("radarr", level="INFO"):
+            run_radarr()
+        self.assertIn("PUT /api/v3/movie/editor", self.server.stats)
+
+        self.server.stats.clear()
+        with self.assertLogs("radarr", level="INFO"):
+            run_radarr()
+        # Nothing left to change; the tag list cached by the first sweep is reused
+        self.assertEqual(set(self.server.stats), {"GET /api/v3/movie"})
+
+
+if __name__ == "__main__":
+    unittest.main()
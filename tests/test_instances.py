@@ -0,0 +1,66 @@
+import logging
+import unittest
+from unittest.mock import patch
+from core import instances
+from core.config import env_instances
+
+
+class TestInstances(unittest.TestCase):
+    def test_env_instances_reads_named_settings(self):
+        env = {"SONARR_INSTANCES": "4k, Anime,4k", "SONARR_4K_URL": "http://sonarr-4k/", "SONARR_4K_API_KEY": "k4",
+               "SONARR_ANIME_URL": "http://anime", "SONARR_URL": "http://sonarr"}
+        with patch.dict("os.environ", env, clear=True):
+            parsed = env_instances("SONARR")
+        self.assertEqual(list(parsed), ["4k", "anime"])
+        self.assertEqual(parsed["4k"], {"URL": "http://sonarr-4k", "API_KEY": "k4"})
+        self.assertEqual(parsed["anime"]["API_KEY"], "")
+
+    def test_instance_keys_and_state_kinds(self):
+        with patch.object(instances.Config, "SONARR_INSTANCES", {"4k": {"URL": "http://s4k", "API_KEY": "k"}}), \
+             patch.object(instances.Config, "RADARR_INSTANCES", {}):
+            keys = [inst.key for inst in instances.configured()]
+            found = instances.find("sonarr-4k")
+        self.assertEqual(keys, ["radarr", "sonarr", "sonarr-4k"])
+        self.assertEqual((found.url, found.state_kind("series")), ("http://s4k", "sonarr-4k:series"))
+        self.assertEqual(instances.default("sonarr").state_kind("series"), "series")
+
+    def test_instances_are_read_from_the_given_config(self):
+        class config:
+            SONARR_URL = "http://sonarr"
+            SONARR_API_KEY = "k"
+            SONARR_SETTINGS = {"RATE_LIMIT": "2"}
+            SONARR_INSTANCES = {"4k": {"URL": "http://s4k", "API_KEY": "k4"}}
+            RADARR_URL = "http://radarr"
+            RADARR_API_KEY = "k"
+            RADARR_SETTINGS = {}
+            RADARR_INSTANCES = {}
+            ENABLE_SONARR = True
+            ENABLE_RADARR = False
+
+        self.assertEqual(instances.default("sonarr", config).settings, {"RATE_LIMIT": "2"})
+        self.assertEqual([inst.key for inst in instances.named("sonarr", config)], ["sonarr-4k"])
+        self.assertEqual([inst.key for inst in instances.enabled(config)], ["sonarr", "sonarr-4k"])
+
+    def test_limits_fall_back_to_upstream_defaults(self):
+        with patch.object(instances.Config, "UPSTREAM_RATE_LIMIT", 0.0), \
+             patch.object(instances.Config, "UPSTREAM_BURST", 10), \
+             patch.object(instances.Config, "UPSTREAM_MAX_CONCURRENCY", 8):
+            nas = instances.Instance("sonarr", "nas", "http://nas", "k", {"RATE_LIMIT": "2.5", "MAX_CONCURRENCY": "x"})
+            self.assertEqual(nas.limits(), (2.5, 10, 8))
+            self.assertEqual(instances.Instance("radarr", "", "http://radarr", "k").limits(), (0.0, 10, 8))
+
+    def test_current_instance_and_log_prefix(self):
+        inst = instances.Instance("sonarr", "4k", "http://s4k", "k")
+        log = instances.InstanceLogger(logging.getLogger("sonarr"))
+        with self.assertLogs("sonarr", level="INFO") as cm:
+            log.info("outside")
+            with instances.running(inst):
+                self.assertIs(instances.current("sonarr"), inst)
+                self.assertIsNone(instances.current("radarr"))
+                log.info("inside")
+        self.assertIsNone(instances.current("sonarr"))
+        self.assertEqual(cm.output, ["INFO:sonarr:outside", "INFO:sonarr:[4k] inside"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+from core import metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_renders_cumulative_buckets(self):
+        h = metrics.Histogram("test_duration_seconds", "Test.", ("app",), buckets=(1, 10))
+        h.observe(0.5, app="sonarr")
+        h.observe(5, app="sonarr")
+        text = h.render()
+        self.assertIn('test_duration_seconds_bucket{app="sonarr",le="1"} 1', text)
+        self.assertIn('test_duration_seconds_bucket{app="sonarr",le="10"} 2', text)
+        self.assertIn('test_duration_seconds_bucket{app="sonarr",le="+Inf"} 2', text)
+        self.assertIn('test_duration_seconds_sum{app="sonarr"} 5.5', text)
+        self.assertIn('test_duration_seconds_count{app="sonarr"} 2', text)
+
+    def test_counter_and_label_escaping(self):
+        c = metrics.Counter("test_things_total", "Test.", ("name",))
+        c.inc(name='a"b')
+        c.inc(2, name='a"b')
+        self.assertIn('test_things_total{name="a\\"b"} 3', c.render())
+        self.assertIn("# TYPE test_things_total counter", c.render())
+
+    def test_endpoint_collapses_ids(self):
+        self.assertEqual(metrics.endpoint("/api/v3/series/42"), "/api/v3/series/{id}")
+        self.assertEqual(metrics.endpoint("/api/v3/episode/monitor"), "/api/v3/episode/monitor")
+
+    def test_record_run_sets_last_run_items(self):
+        metrics.LAST_SWEEP.clear()
+        metrics.record_run("radarr", 10, 1, 2)
+        self.assertEqual(metrics.LAST_RUN_ITEMS.get(app="radarr", result="unmonitored"), 2)
+        self.assertIsNone(metrics.LAST_SWEEP.get(app="radarr"))
+
+    def test_record_sweep_sets_last_sweep_and_duration(self):
+        metrics.record_sweep("sonarr", started=metrics.time.time() - 5)
+        self.assertIsNotNone(metrics.LAST_SWEEP.get(app="sonarr"))
+        self.assertGreaterEqual(metrics.LAST_SWEEP_DURATION.get(app="sonarr"), 5)
+
+if __name__ == "__main__":
+    unittest.main()
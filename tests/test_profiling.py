@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from core import profiling
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patch = patch("core.profiling.Config.DATA_DIR", self.tmp.name)
+        self.patch.start()
+
+    def tearDown(self):
+        profiling.arm(0)
+        self.patch.stop()
+        self.tmp.cleanup()
+
+    def _job(self):
+        with profiling.phase("series fetch"):
+            data = [list(range(100)) for _ in range(100)]
+        with profiling.phase("decision"):
+            sum(map(sum, data))
+
+    def test_armed_jobs_write_reports(self):
+        profiling.arm(1)
+        with profiling.profile_job("sonarr", "(triggered_by=test)"):
+            self._job()
+        with profiling.profile_job("sonarr"):
+            self._job()
+
+        self.assertEqual(profiling.remaining(), 0)
+        reports = profiling.reports()
+        self.assertEqual(len(reports), 1)
+        files = os.listdir(profiling.profile_dir())
+        self.assertIn(reports[0].replace(".txt", ".pstats"), files)
+        with open(os.path.join(profiling.profile_dir(), reports[0])) as f:
+            text = f.read()
+        for expected in ("Job: sonarr (triggered_by=test)", "series fetch", "decision",
+                         "Top functions by cumulative time", "Top allocations (in use after decision)"):
+            self.assertIn(expected, text)
+
+    def test_phase_is_noop_when_not_profiling(self):
+        self._job()
+        self.assertEqual(profiling.reports(), [])
+
+    def test_admin_endpoint_arms_profiling(self):
+        from services.webhook_service import app
+        with app.test_client() as client:
+            response = client.post("/admin/profile?jobs=3")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_json()["remaining"], 3)
+            self.assertEqual(client.post("/admin/profile", json={"jobs": "x"}).status_code, 400)
+            self.assertEqual(client.get("/admin/profile").get_json()["reports"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
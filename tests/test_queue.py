@@ -66,5 +66,78 @@ class TestJobQueue(unittest.TestCase):
         self.assertEqual(job3_type, "sonarr")
         self.assertEqual(job3_trigger, "scheduler")
 
+class TestJobCoalescing(unittest.TestCase):
+    def test_identical_pending_jobs_are_coalesced(self):
+        from core.job_queue import Job, JobQueueWrapper
+        queue = JobQueueWrapper()
+        first = queue.put(Job("sonarr", "webhook"))
+        for _ in range(99):
+            self.assertIs(queue.put(Job("sonarr", "webhook")), first)
+        queue.put(Job("radarr", "webhook"))
+
+        self.assertEqual(len(queue), 2)
+        self.assertEqual(queue.stats(), {"pending": 2, "size": 2, "max_size": 0,
+                                         "coalesced": {"sonarr": 99}, "rejected": {}})
+        self.assertEqual(tuple(queue.get()), ("sonarr", "webhook"))
+        self.assertEqual(tuple(queue.get()), ("radarr", "webhook"))
+
+    def test_targeted_jobs_merge_into_one_batch(self):
+        from core.job_queue import Job, JobQueueWrapper
+        queue = JobQueueWrapper()
+        queue.put(Job("sonarr", "webhook", item_ids=[1, 2]))
+        queue.put(Job("sonarr", "webhook", item_ids=[2, 3]))
+        self.assertEqual(queue.get().item_ids, [1, 2, 3])
+
+        # A full sweep absorbs any targeted job with the same key
+        queue.put(Job("radarr", "webhook", item_ids=[5]))
+        queue.put(Job("radarr", "webhook"))
+        self.assertIsNone(queue.get().item_ids)
+
+    def test_running_job_is_not_coalesced(self):
+        from core.job_queue import Job, JobQueueWrapper
+        queue = JobQueueWrapper()
+        queue.put(Job("sonarr", "webhook"))
+        queue.get()
+        queue.put(Job("sonarr", "webhook"))
+        self.assertEqual(len(queue), 1)
+
+    def test_debounce_delays_burst_until_quiet(self):
+        import time
+        from core.job_queue import Job, JobQueueWrapper
+        queue = JobQueueWrapper(debounce_seconds=0.2)
+        start = time.monotonic()
+        queue.put(Job("sonarr", "webhook", item_ids=[1]))
+        time.sleep(0.1)
+        queue.put(Job("sonarr", "webhook", item_ids=[2]))
+        # Legacy items are not debounced and are returned first
+        queue.put(("radarr", "scheduler"))
+        self.assertEqual(queue.get(), ("radarr", "scheduler"))
+
+        job = queue.get()
+        self.assertGreaterEqual(time.monotonic() - start, 0.29)
+        self.assertEqual(job.item_ids, [1, 2])
+
+    def test_bounded_queue_rejects_only_puts_that_grow_it(self):
+        import queue as stdlib_queue
+        from core.job_queue import Job, JobQueueWrapper
+        queue = JobQueueWrapper(max_size=3)
+        ids = [1, 2]
+        queue.put(Job("sonarr", "webhook", item_ids=ids))
+        queue.put(Job("sonarr", "webhook", item_ids=[2]))  # already pending: no growth
+        queue.put(Job("radarr", "webhook"))
+        with self.assertRaises(stdlib_queue.Full):
+            queue.put(Job("sonarr", "webhook", item_ids=[3]))
+        self.assertEqual(queue.stats()["rejected"], {"sonarr": 1})
+
+        # A full sweep replaces the scoped IDs, which frees room
+        queue.put(Job("sonarr", "webhook"))
+        queue.put(Job("sonarr", "threshold", item_ids=[4]))
+        self.assertEqual(queue.stats()["size"], 3)
+        self.assertEqual(ids, [1, 2])
+        while len(queue):
+            queue.get()
+        self.assertEqual(queue.stats()["size"], 0)
+
+
 if __name__ == "__main__":
     unittest.main()
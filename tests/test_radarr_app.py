@@ -0,0 +1,166 @@
+import json
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+
+def _streamed(items):
+    """Response for a request made with stream=True, its JSON body served in small chunks."""
+    body = json.dumps(items).encode()
+    return MagicMock(iter_content=lambda chunk_size: (body[i:i + 64] for i in range(0, len(body), 64)))
+
+
+def _configure(mock_config):
+    mock_config.ENABLE_RADARR = True
+    mock_config.RADARR_URL = "http://radarr"
+    mock_config.RADARR_API_KEY = "key"
+    mock_config.RADARR_SETTINGS = {}
+    mock_config.IGNORE_TAG_NAME = "ignore"
+    mock_config.SKIP_IF_FILE = True
+    mock_config.AUTO_TAG_NAME = "auto-unmonitored"
+    mock_config.PREFERRED_RELEASE = "either"
+    mock_config.IGNORE_INCINEMAS = False
+    mock_config.DRY_RUN = True
+    mock_config.EDITOR_BATCH_SIZE = 500
+    mock_config.TAG_CACHE_SECONDS = 0
+    mock_config.HTTP_RETRIES = 0
+    mock_config.ITEM_RETRIES = 1
+    mock_config.HTTP_RETRY_BACKOFF_SECONDS = 0
+    mock_config.DELAY_MINUTES = 120
+    mock_config.RADARR_REMONITOR_WINDOW_DAYS = 0
+    mock_config.SCHEDULER_MODE = "interval"
+
+
+def _fake_req(tags, movies):
+    by_id = {m["id"]: m for m in movies}
+
+    def req_side_effect(method, path, **kw):
+        if path == "/api/v3/tag":
+            return MagicMock(json=lambda: tags)
+        if path == "/api/v3/movie":
+            return _streamed(movies)
+        if method == "GET" and path.startswith("/api/v3/movie/"):
+            movie = by_id.get(int(path.rsplit("/", 1)[1]))
+            if movie is None:
+                return MagicMock(status_code=404)
+            return MagicMock(status_code=200, json=lambda: movie)
+        return MagicMock(ok=True, json=lambda: {})
+    return req_side_effect
+
+
+class TestRadarrScopedRun(unittest.TestCase):
+    @patch("radarr.radarr_app.Config")
+    @patch("radarr.radarr_app._req")
+    def test_scoped_run_fetches_only_requested_movies(self, mock_req, mock_config):
+        from core.transitions import TransitionSchedule
+        from radarr.radarr_app import _run_once
+        _configure(mock_config)
+        mock_config.SCHEDULER_MODE = "event"
+
+        release = datetime.now(timezone.utc) + timedelta(days=2)
+        movies = [
+            {"id": 5, "title": "Upcoming", "monitored": True, "tags": [], "hasFile": False,
+             "digitalRelease": release.isoformat()},
+            {"id": 6, "title": "Other", "monitored": True, "tags": [], "hasFile": False,
+             "digitalRelease": release.isoformat()},
+        ]
+        mock_req.side_effect = _fake_req([{"id": 1, "label": "auto-unmonitored"}], movies)
+        schedule = TransitionSchedule()
+
+        with patch("radarr.radarr_app.transition_schedule", schedule):
+            with self.assertLogs("radarr", level="INFO") as cm:
+                _run_once([5, 404])
+
+        paths = [c.args[1] for c in mock_req.call_args_list if c.args[0] == "GET"]
+        self.assertNotIn("/api/v3/movie", paths)
+        self.assertIn("/api/v3/movie/5", paths)
+        self.assertTrue(any("UNMONITOR: Upcoming" in line for line in cm.output))
+        self.assertFalse(any("Other" in line for line in cm.output))
+        # The threshold (release + 120 min) is published for the event scheduler
+        self.assertAlmostEqual(schedule.next_due(), (release + timedelta(minutes=120)).timestamp(), places=0)
+
+
+class TestRadarrTagIndex(unittest.TestCase):
+    @patch("radarr.radarr_app.Config")
+    @patch("radarr.radarr_app._req")
+    def test_unknown_tag_refreshes_cached_index(self, mock_req, mock_config):
+        from radarr.radarr_app import _run_once
+        _configure(mock_config)
+        mock_config.RADARR_URL = "http://radarr-tag-index"
+        mock_config.TAG_CACHE_SECONDS = 3600
+
+        upcoming = (datetime.now(timezone.utc) + timedelta(days=5)).isoformat()
+        movie = {"id": 1, "title": "Upcoming", "monitored": True, "tags": [], "hasFile": False,
+                 "digitalRelease": upcoming}
+        tags = [{"id": 1, "label": "auto-unmonitored"}]
+        mock_req.side_effect = _fake_req(tags, [movie])
+        with self.assertLogs("radarr", level="INFO") as cm:
+            _run_once()
+        self.assertTrue(any("UNMONITOR: Upcoming" in line for line in cm.output))
+
+        # The movie gets a freshly created ignore tag: the cached tag list doesn't know it yet
+        tags.append({"id": 2, "label": "ignore"})
+        movie["tags"] = [2]
+        mock_req.reset_mock()
+        with self.assertLogs("radarr", level="INFO") as cm:
+            _run_once()
+        self.assertEqual([c.args[1] for c in mock_req.call_args_list].count("/api/v3/tag"), 1)
+        self.assertFalse(any("UNMONITOR" in line for line in cm.output))
+
+
+class TestRadarrNamedInstance(unittest.TestCase):
+    @patch("radarr.radarr_app.Config")
+    @patch("radarr.radarr_app.get_client")
+    def test_named_instance_job_uses_its_own_url_and_keys(self, mock_get_client, mock_config):
+        from core.instances import Instance
+        from core.transitions import TransitionSchedule
+        from radarr.radarr_app import run_job
+        _configure(mock_config)
+        mock_config.SCHEDULER_MODE = "event"
+
+        release = datetime.now(timezone.utc) + timedelta(days=2)
+        movie = {"id": 5, "title": "Upcoming", "monitored": True, "tags": [], "hasFile": False,
+                 "digitalRelease": release.isoformat()}
+        mock_get_client.return_value.request.side_effect = _fake_req([{"id": 1, "label": "auto-unmonitored"}], [movie])
+        schedule = TransitionSchedule()
+
+        with patch("radarr.radarr_app.transition_schedule", schedule):
+            with self.assertLogs("radarr", level="INFO") as cm:
+                run_job(item_ids=[5], instance=Instance("radarr", "4k", "http://radarr-4k", "key-4k"))
+
+        self.assertEqual({c.args[:2] for c in mock_get_client.call_args_list}, {("http://radarr-4k", "key-4k")})
+        self.assertEqual(mock_get_client.call_args.kwargs["name"], "radarr-4k")
+        self.assertTrue(any("[4k] [DRY] UNMONITOR: Upcoming" in line for line in cm.output))
+        self.assertEqual(list(schedule.pop_due(schedule.next_due())), ["radarr-4k"])
+
+
+class TestRadarrEditorBatching(unittest.TestCase):
+    @patch("radarr.radarr_app.Config")
+    @patch("radarr.radarr_app._req")
+    def test_transitions_are_sent_as_grouped_editor_calls(self, mock_req, mock_config):
+        from radarr.radarr_app import _run_once
+        _configure(mock_config)
+        mock_config.DRY_RUN = False
+        mock_config.EDITOR_BATCH_SIZE = 2
+
+        future = (datetime.now(timezone.utc) + timedelta(days=5)).isoformat()
+        past = (datetime.now(timezone.utc) - timedelta(days=5)).isoformat()
+        movies = [{"id": i, "title": f"Upcoming {i}", "monitored": True, "tags": [], "hasFile": False,
+                   "digitalRelease": future} for i in (1, 2, 3)]
+        movies.append({"id": 4, "title": "Released", "monitored": False, "tags": [7], "hasFile": False,
+                       "digitalRelease": past})
+        mock_req.side_effect = _fake_req([{"id": 7, "label": "auto-unmonitored"}], movies)
+
+        _run_once()
+
+        writes = [c.kwargs["json"] for c in mock_req.call_args_list if c.args[0] == "PUT"]
+        self.assertTrue(all(c.args[1] == "/api/v3/movie/editor" for c in mock_req.call_args_list if c.args[0] == "PUT"))
+        self.assertEqual(writes, [
+            {"movieIds": [1, 2], "monitored": False, "tags": [7], "applyTags": "add"},
+            {"movieIds": [3], "monitored": False, "tags": [7], "applyTags": "add"},
+            {"movieIds": [4], "monitored": True, "tags": [7], "applyTags": "remove"},
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
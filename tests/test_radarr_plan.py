@@ -0,0 +1,83 @@
+import random
+import unittest
+from datetime import datetime, timedelta, timezone
+from core import vectorized
+from core.records import Movie, epoch_us
+from radarr.radarr_plan import MovieTransition, RadarrLibrary, RadarrPlan, RadarrSettings, pick_release, plan_radarr
+
+NOW = datetime(2025, 6, 1, 12, 0, tzinfo=timezone.utc)
+SETTINGS = RadarrSettings(timedelta(minutes=120), None, True, "either", False)
+
+
+def _movie(mid, offset, monitored, tags=(), has_file=False):
+    return Movie.from_api({"id": mid, "title": f"Movie {mid}", "monitored": monitored, "tags": list(tags),
+                           "hasFile": has_file, "digitalRelease": (NOW + offset).isoformat()})
+
+
+class TestPlanRadarr(unittest.TestCase):
+    def test_transitions(self):
+        movies = [
+            _movie(1, timedelta(days=2), True),                     # upcoming -> unmonitor
+            _movie(2, -timedelta(days=1), False, tags=[1]),         # past threshold, auto-tagged -> monitor
+            _movie(3, -timedelta(days=1), False),                   # not ours -> untouched
+            _movie(4, timedelta(days=2), True, tags=[9]),           # ignored
+            _movie(5, timedelta(days=2), True, has_file=True),      # has file
+        ]
+        library = RadarrLibrary(movies, 1, frozenset({9}), {})
+        plan = plan_radarr(library, SETTINGS, NOW)
+
+        self.assertEqual(plan.transitions, [MovieTransition(1, False), MovieTransition(2, True)])
+        self.assertEqual(plan.assessed, 3)
+        self.assertEqual((plan.unmonitored, plan.monitored), (1, 1))
+        self.assertTrue(plan.messages[0].startswith("UNMONITOR: Movie 1 until"))
+        self.assertEqual(plan.due[1], (NOW + timedelta(days=2, minutes=120)).timestamp())
+
+    def test_settled_movies_and_delay_override(self):
+        movies = [_movie(1, timedelta(days=2), True), _movie(2, -timedelta(minutes=30), False, tags=[1])]
+        library = RadarrLibrary(movies, 1, frozenset(), {2: timedelta(minutes=10)}, frozenset({1}))
+        plan = plan_radarr(library, SETTINGS, NOW)
+        self.assertEqual(plan.transitions, [MovieTransition(2, True)])
+
+    def test_pick_release_prefers_configured_type(self):
+        movie = Movie.from_api({"id": 1, "digitalRelease": "2025-06-10T00:00:00Z", "physicalRelease": "2025-06-05T00:00:00Z"})
+        self.assertEqual(pick_release(movie, SETTINGS), epoch_us(datetime(2025, 6, 5, tzinfo=timezone.utc)))
+        self.assertEqual(pick_release(movie, SETTINGS._replace(preferred_release="digital")),
+                         epoch_us(datetime(2025, 6, 10, tzinfo=timezone.utc)))
+
+
+@unittest.skipUnless(vectorized.available(), "NumPy not installed")
+class TestNumpyEngine(unittest.TestCase):
+    """The numpy engine must produce exactly the plan of the python engine."""
+
+    def _date(self, rng):
+        r = rng.random()
+        if r < 0.3:
+            return None
+        when = NOW + timedelta(minutes=rng.randint(-60 * 1440, 60 * 1440))
+        if r < 0.4:
+            return when.isoformat()  # offset format, parsed one by one
+        if r < 0.42:
+            return "garbage"
+        return when.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def test_engines_agree(self):
+        rng = random.Random(11)
+        for preferred in ("either", "digital", "physical"):
+            for ignore_incinemas in (False, True):
+                movies = [Movie.from_api({
+                    "id": i, "title": f"Movie {i}", "monitored": rng.random() < 0.5,
+                    "tags": [t for t in (1, 9) if rng.random() < 0.4], "hasFile": rng.random() < 0.2,
+                    "digitalRelease": self._date(rng), "physicalRelease": self._date(rng),
+                    "inCinemas": self._date(rng)}) for i in range(300)]
+                library = RadarrLibrary(movies, 1, frozenset({9}),
+                                        {i: timedelta(minutes=rng.randint(-60, 600)) for i in range(0, 300, 7)},
+                                        frozenset(range(0, 300, 13)))
+                settings = RadarrSettings(timedelta(minutes=120), timedelta(days=30), True, preferred, ignore_incinemas)
+                expected = plan_radarr(library, settings, NOW)
+                actual = plan_radarr(library, settings._replace(engine="numpy"), NOW)
+                for field in RadarrPlan.__slots__:
+                    self.assertEqual(getattr(actual, field), getattr(expected, field), field)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import threading
+import time
+import unittest
+from common.rate_limit import AdaptiveLimiter
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    def test_token_bucket_caps_request_rate(self):
+        limiter = AdaptiveLimiter(rate=50, burst=2)
+        start = time.monotonic()
+        for _ in range(7):
+            limiter.release(limiter.acquire(), 0.01)
+        # 2 requests from the burst, then 5 more at 50/s
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+        self.assertEqual(limiter.stats()["rate_limit"], 50)
+        self.assertGreater(limiter.effective_rate(), 0)
+
+    def test_completions_outside_the_rate_window_are_dropped_on_release(self):
+        limiter = AdaptiveLimiter()
+        limiter.RATE_WINDOW = 0.05
+        for _ in range(100):
+            limiter.release(limiter.acquire(), 0.01)
+        time.sleep(0.06)
+        limiter.release(limiter.acquire(), 0.01)
+        self.assertEqual(len(limiter._completed), 1)
+
+    def test_failures_halve_the_window_once_per_round(self):
+        limiter = AdaptiveLimiter(max_concurrency=8)
+        tickets = [limiter.acquire() for _ in range(3)]
+        self.assertTrue(limiter.release(tickets[0], 0.05, failed=True))
+        # Sent before the backoff: part of the same congestion event
+        self.assertFalse(limiter.release(tickets[1], 0.05, failed=True))
+        self.assertEqual(int(limiter.limit), 4)
+        limiter.release(tickets[2], 0.05)
+
+        self.assertTrue(limiter.release(limiter.acquire(), 0.05, failed=True))
+        self.assertEqual(int(limiter.limit), 2)
+        for _ in range(20):
+            limiter.release(limiter.acquire(), 0.05)
+        self.assertEqual(int(limiter.limit), 6)
+
+    def test_rising_latency_backs_off(self):
+        limiter = AdaptiveLimiter(max_concurrency=4)
+        for _ in range(5):
+            limiter.release(limiter.acquire(), 0.1)
+        self.assertFalse(limiter.release(limiter.acquire(), 0.2))
+        self.assertTrue(limiter.release(limiter.acquire(), 1.0))
+        self.assertEqual(limiter.stats()["concurrency_limit"], 2)
+
+    def test_window_blocks_requests_over_the_limit(self):
+        limiter = AdaptiveLimiter(max_concurrency=1)
+        ticket = limiter.acquire()
+        acquired = threading.Event()
+        threading.Thread(target=lambda: (limiter.acquire(), acquired.set()), daemon=True).start()
+        self.assertFalse(acquired.wait(0.2))
+        limiter.release(ticket, 0.01)
+        self.assertTrue(acquired.wait(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
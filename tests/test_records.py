@@ -0,0 +1,42 @@
+import unittest
+from datetime import datetime, timezone
+from core.records import Episode, Movie, Series, epoch_us, format_air, parse_air, parse_iso
+
+
+class TestRecords(unittest.TestCase):
+    def test_parse_air(self):
+        expected = epoch_us(datetime(2025, 6, 1, 12, 30, 5, tzinfo=timezone.utc))
+        self.assertEqual(parse_air("2025-06-01T12:30:05Z"), expected)
+        self.assertEqual(parse_air("2025-6-1T12:30:05Z"), expected)  # accepted by strptime, not the fast path
+        self.assertEqual(format_air(expected), "2025-06-01T12:30:05Z")
+        for value in (None, "", "2025-13-01T00:00:00Z", "2025-06-01T12:30:05+00:00", "garbage"):
+            self.assertIsNone(parse_air(value), value)
+
+    def test_parse_iso_accepts_offsets_and_naive_dates(self):
+        expected = epoch_us(datetime(2025, 6, 1, 10, 0, tzinfo=timezone.utc))
+        self.assertEqual(parse_iso("2025-06-01T10:00:00Z"), expected)
+        self.assertEqual(parse_iso("2025-06-01T12:00:00+02:00"), expected)
+        self.assertEqual(parse_iso("2025-06-01T10:00:00"), expected)
+        self.assertIsNone(parse_iso("soon"))
+
+    def test_episode_keeps_unparseable_air_date_apart_from_missing(self):
+        bad = Episode.from_api({"id": 1, "seasonNumber": 2, "airDateUtc": "garbage", "monitored": True})
+        missing = Episode.from_api({"id": 2, "seasonNumber": 2})
+        self.assertEqual((bad.air, bad.has_air, bad.monitored), (None, True, True))
+        self.assertEqual((missing.air, missing.has_air, missing.monitored), (None, False, False))
+        self.assertFalse(hasattr(bad, "__dict__"))
+
+    def test_series_and_movie_keep_only_decision_fields(self):
+        series = Series.from_api({"id": 3, "title": "Show", "monitored": True, "tags": [1], "images": [{}],
+                                  "seasons": [{"seasonNumber": 1, "monitored": False,
+                                               "statistics": {"episodeCount": 2, "sizeOnDisk": 10}}]})
+        self.assertEqual(series.tags, (1,))
+        self.assertEqual(series.seasons[0].statistics, (("episodeCount", 2), ("sizeOnDisk", 10)))
+
+        movie = Movie.from_api({"id": 7, "movieFile": {"id": 1}, "inCinemas": "2025-06-01T10:00:00Z"})
+        self.assertEqual((movie.title, movie.has_file, movie.digital), ("id:7", True, None))
+        self.assertEqual(movie.cinemas, parse_iso("2025-06-01T10:00:00Z"))
+
+
+if __name__ == "__main__":
+    unittest.main()
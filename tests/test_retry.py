@@ -0,0 +1,47 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from common.retry import CircuitBreaker, CircuitOpenError, RetryPolicy, run_with_item_retries
+
+
+class TestRetry(unittest.TestCase):
+    def test_backoff_grows_exponentially_with_jitter(self):
+        policy = RetryPolicy(retries=5, backoff=1.0, max_backoff=4.0)
+        for attempt, cap in ((1, 1.0), (2, 2.0), (3, 4.0), (5, 4.0)):
+            delays = [policy.delay(attempt) for _ in range(200)]
+            self.assertTrue(all(0 <= d <= cap for d in delays))
+            self.assertGreater(max(delays), cap / 2)
+
+    def test_circuit_breaker_opens_then_tries_one_request(self):
+        breaker = CircuitBreaker(threshold=3, cooldown=60, name="sonarr")
+        self.assertFalse(breaker.record(False))
+        breaker.record(True)  # a success resets the count
+        self.assertEqual([breaker.record(False) for _ in range(3)], [False, False, True])
+        self.assertEqual(breaker.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request()
+
+        with patch("common.retry.time.monotonic", return_value=breaker._opened_at + 61):
+            self.assertEqual(breaker.state, "half-open")
+            breaker.before_request()
+            with self.assertRaises(CircuitOpenError):
+                breaker.before_request()  # only one trial request at a time
+            breaker.record(True)
+        self.assertEqual(breaker.state, "closed")
+        breaker.before_request()
+
+    @patch("common.retry.time.sleep")
+    def test_failed_items_are_rerun_on_their_own(self, mock_sleep):
+        run = MagicMock(side_effect=[{3, 1}, {3}, set()])
+        failed = run_with_item_retries(run, None, RetryPolicy(backoff=0), 2, MagicMock(), "series")
+        self.assertEqual(failed, set())
+        self.assertEqual([c.args[0] for c in run.call_args_list], [None, [1, 3], [3]])
+
+        run = MagicMock(return_value={4})
+        logger = MagicMock()
+        self.assertEqual(run_with_item_retries(run, [4], RetryPolicy(backoff=0), 1, logger, "movies"), {4})
+        self.assertEqual(run.call_count, 2)
+        logger.error.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,417 @@
+import json
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+
+def _streamed(items):
+    """Response for a request made with stream=True, its JSON body served in small chunks."""
+    body = json.dumps(items).encode()
+    return MagicMock(iter_content=lambda chunk_size: (body[i:i + 64] for i in range(0, len(body), 64)))
+
+
+def _configure(mock_config):
+    mock_config.ENABLE_SONARR = True
+    mock_config.SONARR_URL = "http://sonarr"
+    mock_config.SONARR_API_KEY = "key"
+    mock_config.SONARR_SETTINGS = {}
+    mock_config.IGNORE_TAG_NAME = "ignore"
+    mock_config.SKIP_IF_FILE = True
+    mock_config.AUTO_TAG_NAME = "auto-unmonitored"
+    mock_config.DRY_RUN = True
+    mock_config.EDITOR_BATCH_SIZE = 500
+    mock_config.TAG_CACHE_SECONDS = 0
+    mock_config.HTTP_RETRIES = 0
+    mock_config.ITEM_RETRIES = 1
+    mock_config.HTTP_RETRY_BACKOFF_SECONDS = 0
+    mock_config.EPISODE_FETCH_CONCURRENCY = 4
+    mock_config.DELAY_MINUTES = 120
+    mock_config.SONARR_REMONITOR_WINDOW_DAYS = 0
+    mock_config.SEASON_PACK_MODE = False
+    mock_config.SEASON_PACK_MODE_TAG = "season-pack"
+    mock_config.SCHEDULER_MODE = "interval"
+
+
+def _air(delta):
+    return (datetime.now(timezone.utc) + delta).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _fake_req(tags, series, episodes_by_series):
+    def req_side_effect(method, path, **kw):
+        if path == "/api/v3/tag":
+            return MagicMock(json=lambda: tags)
+        if path == "/api/v3/series":
+            return _streamed(series)
+        if path == "/api/v3/episode":
+            eps = episodes_by_series.get(kw["params"]["seriesId"], [])
+            return MagicMock(json=lambda: eps)
+        if method == "GET" and path.startswith("/api/v3/series/"):
+            match = [s for s in series if s["id"] == int(path.rsplit("/", 1)[1])]
+            if not match:
+                return MagicMock(status_code=404)
+            return MagicMock(status_code=200, json=lambda: match[0])
+        return MagicMock(ok=True, json=lambda: {})
+    return req_side_effect
+
+
+class TestSonarrEpisodeFetch(unittest.TestCase):
+    """Episodes are fetched once per series and grouped by season locally."""
+
+    @patch("sonarr.sonarr_app.Config")
+    @patch("sonarr.sonarr_app._req")
+    def test_one_episode_request_per_series(self, mock_req, mock_config):
+        from sonarr.sonarr_app import _run_once_inner
+        _configure(mock_config)
+
+        series = [{
+            "id": 10,
+            "title": "Long Runner",
+            "monitored": True,
+            "tags": [1],
+            "seasons": [
+                {"seasonNumber": 1, "monitored": False},
+                {"seasonNumber": 2, "monitored": True},
+                {"seasonNumber": 3, "monitored": True},
+            ],
+        }]
+        episodes = [
+            # Season 1 is not monitored: must be ignored even though it is fetched
+            {"id": 101, "seasonNumber": 1, "episodeNumber": 1, "title": "Old",
+             "airDateUtc": _air(timedelta(days=5)), "monitored": True, "hasFile": False},
+            {"id": 201, "seasonNumber": 2, "episodeNumber": 1, "title": "Aired",
+             "airDateUtc": _air(-timedelta(days=1)), "monitored": False, "hasFile": False},
+            {"id": 301, "seasonNumber": 3, "episodeNumber": 1, "title": "Upcoming",
+             "airDateUtc": _air(timedelta(days=5)), "monitored": True, "hasFile": False},
+        ]
+
+        def req_side_effect(method, path, **kw):
+            if path == "/api/v3/tag":
+                return MagicMock(json=lambda: [{"id": 1, "label": "auto-unmonitored"}])
+            if path == "/api/v3/series":
+                return _streamed(series)
+            if path == "/api/v3/episode":
+                return MagicMock(json=lambda: episodes)
+            return MagicMock(ok=True, json=lambda: {})
+
+        mock_req.side_effect = req_side_effect
+
+        with self.assertLogs("sonarr", level="INFO") as cm:
+            _run_once_inner()
+
+        episode_calls = [c for c in mock_req.call_args_list if c.args[1] == "/api/v3/episode"]
+        self.assertEqual(len(episode_calls), 1)
+        self.assertEqual(episode_calls[0].kwargs["params"], {"seriesId": 10})
+
+        output = "\n".join(cm.output)
+        self.assertIn("MONITOR: Long Runner – S02E01 – Aired", output)
+        self.assertIn("UNMONITOR: Long Runner – S03E01 – Upcoming", output)
+        self.assertNotIn("S01E01", output)
+
+
+class TestSonarrSeriesTagBatching(unittest.TestCase):
+    """Series tag changes are collected during the run and sent as series editor calls."""
+
+    @patch("sonarr.sonarr_app.Config")
+    @patch("sonarr.sonarr_app._req")
+    def test_tag_changes_use_one_editor_call_per_mode(self, mock_req, mock_config):
+        from sonarr.sonarr_app import _run_once_inner
+        _configure(mock_config)
+        mock_config.DRY_RUN = False
+
+        def season(n):
+            return [{"seasonNumber": n, "monitored": True}]
+
+        series = [
+            {"id": 1, "title": "New A", "monitored": True, "tags": [], "seasons": season(1)},
+            {"id": 2, "title": "New B", "monitored": True, "tags": [], "seasons": season(1)},
+            {"id": 3, "title": "Tagged", "monitored": True, "tags": [7], "seasons": season(1)},
+        ]
+        upcoming = _air(timedelta(days=3))
+        episodes = {
+            1: [{"id": 10 + n, "seasonNumber": 1, "episodeNumber": n, "title": f"Ep{n}",
+                 "airDateUtc": upcoming, "monitored": True, "hasFile": False} for n in range(1, 25)],
+            2: [{"id": 50, "seasonNumber": 1, "episodeNumber": 1, "title": "Pilot",
+                 "airDateUtc": upcoming, "monitored": True, "hasFile": False}],
+            # Already tagged: unmonitoring must not re-send the tag
+            3: [{"id": 60, "seasonNumber": 1, "episodeNumber": 1, "title": "Later",
+                 "airDateUtc": upcoming, "monitored": True, "hasFile": False}],
+        }
+        mock_req.side_effect = _fake_req([{"id": 7, "label": "auto-unmonitored"}], series, episodes)
+
+        _run_once_inner()
+
+        paths = [c.args[1] for c in mock_req.call_args_list]
+        self.assertFalse(any(p.startswith("/api/v3/series/") and p != "/api/v3/series/editor" for p in paths))
+        editor_calls = [c.kwargs["json"] for c in mock_req.call_args_list if c.args[1] == "/api/v3/series/editor"]
+        self.assertEqual(editor_calls, [{"seriesIds": [1, 2], "tags": [7], "applyTags": "add"}])
+
+
+class TestSonarrScopedRun(unittest.TestCase):
+    """A series-scoped run fetches and evaluates only the requested series."""
+
+    @patch("sonarr.sonarr_app.Config")
+    @patch("sonarr.sonarr_app._req")
+    def test_scoped_run_skips_library_listing(self, mock_req, mock_config):
+        from sonarr.sonarr_app import _run_once_inner
+        _configure(mock_config)
+
+        season = [{"seasonNumber": 1, "monitored": True}]
+        series = [
+            {"id": 1, "title": "Added", "monitored": True, "tags": [], "seasons": season},
+            {"id": 2, "title": "Untouched", "monitored": True, "tags": [], "seasons": season},
+        ]
+        upcoming = _air(timedelta(days=3))
+        episodes = {sid: [{"id": sid * 10, "seasonNumber": 1, "episodeNumber": 1, "title": "Pilot",
+                           "airDateUtc": upcoming, "monitored": True, "hasFile": False}] for sid in (1, 2)}
+        mock_req.side_effect = _fake_req([{"id": 7, "label": "auto-unmonitored"}], series, episodes)
+
+        with self.assertLogs("sonarr", level="INFO") as cm:
+            _run_once_inner([1, 99])
+
+        paths = [c.args[1] for c in mock_req.call_args_list if c.args[0] == "GET"]
+        self.assertNotIn("/api/v3/series", paths)
+        self.assertEqual([c.kwargs["params"] for c in mock_req.call_args_list if c.args[1] == "/api/v3/episode"],
+                         [{"seriesId": 1}])
+        self.assertTrue(any("UNMONITOR: Added" in line for line in cm.output))
+        self.assertTrue(any("id:99 no longer exists" in line for line in cm.output))
+
+
+class TestSonarrConcurrentEpisodeFetch(unittest.TestCase):
+    """Episodes of several series are fetched at once, with the same decisions as a serial sweep."""
+
+    @patch("sonarr.sonarr_app.Config")
+    @patch("sonarr.sonarr_app.get_client")
+    def test_concurrent_fetch_matches_serial_decisions(self, mock_get_client, mock_config):
+        import threading
+        from core.instances import Instance
+        from sonarr.sonarr_app import run_job
+        _configure(mock_config)
+        mock_config.EPISODE_FETCH_CONCURRENCY = 3
+
+        season = [{"seasonNumber": 1, "monitored": True}]
+        series = [{"id": sid, "title": f"Show {sid}", "monitored": True, "tags": [], "seasons": season}
+                  for sid in (1, 2, 3)]
+        episodes = {sid: [{"id": sid * 10 + n, "seasonNumber": 1, "episodeNumber": n, "title": f"E{n}",
+                           "airDateUtc": _air(timedelta(days=n - 2)), "monitored": n != 1, "hasFile": False}
+                          for n in range(1, 4)] for sid in (1, 2, 3)}
+        fake = _fake_req([{"id": 7, "label": "auto-unmonitored"}], series, episodes)
+        # Every episode fetch waits for the other two: a serial fan-out would never get past the first
+        barrier = threading.Barrier(3, timeout=5)
+        threads = set()
+
+        def concurrent_req(method, path, **kw):
+            if path == "/api/v3/episode":
+                threads.add(threading.current_thread().name)
+                barrier.wait()
+            return fake(method, path, **kw)
+
+        def sweep():
+            with self.assertLogs("sonarr", level="INFO") as cm:
+                run_job(instance=Instance("sonarr", "4k", "http://sonarr-4k", "key"))
+            return [line for line in cm.output if "MONITOR" in line]
+
+        mock_get_client.return_value.request.side_effect = concurrent_req
+        concurrent = sweep()
+        self.assertEqual(len(threads), 3)
+        self.assertEqual({c.args[0] for c in mock_get_client.call_args_list}, {"http://sonarr-4k"})
+
+        mock_config.EPISODE_FETCH_CONCURRENCY = 1
+        mock_get_client.return_value.request.side_effect = fake
+        self.assertEqual(concurrent, sweep())
+        self.assertTrue(any("[4k] UNMONITOR: Show 3" in line for line in concurrent))
+
+
+class TestSonarrItemRetries(unittest.TestCase):
+    """Series that fail are retried in a scoped run of their own; an open circuit stops the run."""
+
+    @patch("common.retry.time.sleep")
+    @patch("sonarr.sonarr_app.Config")
+    @patch("sonarr.sonarr_app._req")
+    def test_failed_series_are_retried_alone(self, mock_req, mock_config, mock_sleep):
+        import requests
+        from core import metrics
+        from sonarr.sonarr_app import run_once
+        metrics.LAST_SWEEP.clear()
+        _configure(mock_config)
+
+        season = [{"seasonNumber": 1, "monitored": True}]
+        series = [{"id": sid, "title": f"Show {sid}", "monitored": True, "tags": [], "seasons": season}
+                  for sid in (1, 2, 3)]
+        episodes = {sid: [{"id": sid * 10, "seasonNumber": 1, "episodeNumber": 1, "title": "Pilot",
+                           "airDateUtc": _air(timedelta(days=3)), "monitored": True, "hasFile": False}]
+                    for sid in (1, 2, 3)}
+        fake = _fake_req([{"id": 7, "label": "auto-unmonitored"}], series, episodes)
+        flaky = {2}
+
+        def req(method, path, **kw):
+            if path == "/api/v3/episode" and kw["params"]["seriesId"] in flaky:
+                flaky.clear()
+                raise requests.exceptions.ReadTimeout("slow")
+            return fake(method, path, **kw)
+        mock_req.side_effect = req
+
+        with self.assertLogs("sonarr", level="INFO") as cm:
+            run_once()
+
+        gets = [c.args[1] for c in mock_req.call_args_list if c.args[0] == "GET"]
+        self.assertEqual(gets.count("/api/v3/series"), 1)
+        self.assertEqual(sorted(c.kwargs["params"]["seriesId"] for c in mock_req.call_args_list
+                                if c.args[1] == "/api/v3/episode"), [1, 2, 2, 3])
+        self.assertIn("/api/v3/series/2", gets)
+        self.assertEqual(sum("UNMONITOR: Show 2" in line for line in cm.output), 1)
+        # The retry succeeded: the sweep is recorded as successful
+        self.assertIsNotNone(metrics.LAST_SWEEP.get(app="sonarr"))
+
+    @patch("sonarr.sonarr_app.Config")
+    @patch("sonarr.sonarr_app._req")
+    def test_open_circuit_stops_the_run(self, mock_req, mock_config):
+        from common.retry import CircuitOpenError
+        from core import metrics
+        from sonarr.sonarr_app import run_once
+        _configure(mock_config)
+        metrics.LAST_SWEEP.clear()
+        mock_req.side_effect = CircuitOpenError("sonarr is unavailable")
+
+        with self.assertLogs("sonarr", level="ERROR") as cm:
+            run_once()
+        self.assertEqual(mock_req.call_count, 1)
+        self.assertIn("Run stopped: sonarr is unavailable", cm.output[0])
+        self.assertIsNone(metrics.LAST_SWEEP.get(app="sonarr"))
+
+
+class TestSonarrIncrementalSync(unittest.TestCase):
+    """Unchanged series are not re-fetched on the next sweep."""
+
+    def setUp(self):
+        import os
+        import tempfile
+        from core.state_store import StateStore
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = StateStore(os.path.join(self.tmp.name, "state.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    @patch("sonarr.sonarr_app.Config")
+    @patch("sonarr.sonarr_app._req")
+    def test_settled_series_skip_episode_fetch(self, mock_req, mock_config):
+        from sonarr.sonarr_app import _run_once_inner
+        _configure(mock_config)
+
+        stats = {"episodeCount": 0, "totalEpisodeCount": 1, "episodeFileCount": 0}
+        series = [
+            {"id": 1, "title": "Quiet", "monitored": True, "tags": [],
+             "seasons": [{"seasonNumber": 1, "monitored": True, "statistics": stats}]},
+            {"id": 2, "title": "Busy", "monitored": True, "tags": [],
+             "seasons": [{"seasonNumber": 1, "monitored": True, "statistics": dict(stats)}]},
+        ]
+        upcoming = _air(timedelta(days=3))
+        episodes = {
+            1: [{"id": 10, "seasonNumber": 1, "episodeNumber": 1, "title": "Later",
+                 "airDateUtc": upcoming, "monitored": False, "hasFile": False}],
+            2: [{"id": 20, "seasonNumber": 1, "episodeNumber": 1, "title": "Soon",
+                 "airDateUtc": upcoming, "monitored": True, "hasFile": False}],
+        }
+        mock_req.side_effect = _fake_req([{"id": 7, "label": "auto-unmonitored"}], series, episodes)
+
+        with patch("sonarr.sonarr_app.get_state_store", return_value=self.store):
+            _run_once_inner()
+            mock_req.reset_mock()
+            # A new episode shows up in series 1's season statistics
+            series[0]["seasons"][0]["statistics"] = dict(stats, totalEpisodeCount=2)
+            _run_once_inner()
+
+        fetched = [c.kwargs["params"]["seriesId"] for c in mock_req.call_args_list if c.args[1] == "/api/v3/episode"]
+        # Series 1 changed; series 2 was unmonitored in dry run, so its decision is still pending
+        self.assertEqual(sorted(fetched), [1, 2])
+
+        mock_req.reset_mock()
+        with patch("sonarr.sonarr_app.get_state_store", return_value=self.store):
+            _run_once_inner()
+        fetched = [c.kwargs["params"]["seriesId"] for c in mock_req.call_args_list if c.args[1] == "/api/v3/episode"]
+        self.assertEqual(fetched, [2])
+
+    @patch("sonarr.sonarr_app.Config")
+    @patch("sonarr.sonarr_app._req")
+    def test_unmonitored_tba_episode_getting_an_air_date_is_remonitored(self, mock_req, mock_config):
+        from sonarr.sonarr_app import _run_once_inner
+        _configure(mock_config)
+        mock_config.SONARR_REMONITOR_WINDOW_DAYS = 14
+
+        # Season statistics only count monitored episodes: they don't change when E02 gets its air date
+        stats = {"episodeCount": 1, "totalEpisodeCount": 2, "episodeFileCount": 1}
+        series = [{"id": 1, "title": "Show", "monitored": True, "tags": [7],
+                   "seasons": [{"seasonNumber": 1, "monitored": True, "statistics": stats}]}]
+        pilot = {"id": 10, "seasonNumber": 1, "episodeNumber": 1, "title": "Pilot",
+                 "airDateUtc": _air(timedelta(days=-7)), "monitored": True, "hasFile": True}
+        tba = {"id": 11, "seasonNumber": 1, "episodeNumber": 2, "title": "TBA", "monitored": False, "hasFile": False}
+        episodes = {1: [pilot, tba]}
+        mock_req.side_effect = _fake_req([{"id": 7, "label": "auto-unmonitored"}], series, episodes)
+
+        with patch("sonarr.sonarr_app.get_state_store", return_value=self.store):
+            _run_once_inner()
+            tba["airDateUtc"] = _air(timedelta(hours=-3))
+            with self.assertLogs("sonarr", level="INFO") as cm:
+                _run_once_inner()
+
+        self.assertIn("Incremental sync: 0 of 1 series unchanged, skipped", "\n".join(cm.output))
+        self.assertTrue(any("MONITOR: Show – S01E02" in line for line in cm.output), cm.output)
+
+
+
+class TestSonarrCheckpointedSweep(unittest.TestCase):
+    """A sweep interrupted mid-way resumes after its last completed batch without replaying writes."""
+
+    def setUp(self):
+        import os
+        import tempfile
+        from core.state_store import StateStore
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = StateStore(os.path.join(self.tmp.name, "state.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    @patch("sonarr.sonarr_app.Config")
+    @patch("sonarr.sonarr_app._req")
+    def test_resumed_sweep_sends_pending_writes_once(self, mock_req, mock_config):
+        from sonarr.sonarr_app import _run_once_inner
+        _configure(mock_config)
+        mock_config.DRY_RUN = False
+        mock_config.CHECKPOINT_BATCH_SIZE = 1
+
+        season = [{"seasonNumber": 1, "monitored": True}]
+        series = [{"id": sid, "title": f"Show {sid}", "monitored": True, "tags": [], "seasons": season}
+                  for sid in (1, 2, 3)]
+        episodes = {sid: [{"id": sid * 10, "seasonNumber": 1, "episodeNumber": 1, "title": "Pilot",
+                           "airDateUtc": _air(timedelta(days=3)), "monitored": True, "hasFile": False}]
+                    for sid in (1, 2, 3)}
+        fake = _fake_req([{"id": 7, "label": "auto-unmonitored"}], series, episodes)
+        crash = [True]
+
+        def req(method, path, **kw):
+            if path == "/api/v3/episode/monitor" and kw["json"]["episodeIds"] == [20] and crash:
+                crash.clear()
+                raise RuntimeError("killed")
+            return fake(method, path, **kw)
+        mock_req.side_effect = req
+
+        with patch("core.checkpoint.get_checkpoint_store", return_value=self.store):
+            with self.assertRaises(RuntimeError):
+                _run_once_inner()
+            mock_req.reset_mock()
+            _run_once_inner()
+
+        calls = mock_req.call_args_list
+        self.assertEqual([c.kwargs["params"]["seriesId"] for c in calls if c.args[1] == "/api/v3/episode"], [3])
+        self.assertEqual([c.kwargs["json"]["episodeIds"] for c in calls if c.args[1] == "/api/v3/episode/monitor"],
+                         [[20], [30]])
+        self.assertEqual([c.kwargs["json"]["seriesIds"] for c in calls if c.args[1] == "/api/v3/series/editor"],
+                         [[2], [3]])
+        self.assertIsNone(self.store.load_checkpoint("sonarr"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import random
+import unittest
+from datetime import datetime, timedelta, timezone
+from core import vectorized
+from core.records import Episode
+from sonarr.sonarr_plan import SonarrLibrary, SonarrPlan, SonarrSettings, plan_sonarr
+
+NOW = datetime(2025, 6, 1, 12, 0, tzinfo=timezone.utc)
+SETTINGS = SonarrSettings(timedelta(minutes=120), None, True)
+
+
+def _ep(eid, offset, monitored, number=1, has_file=False):
+    return Episode.from_api({"id": eid, "seasonNumber": 1, "episodeNumber": number, "title": f"Ep{eid}",
+                             "airDateUtc": (NOW + offset).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                             "monitored": monitored, "hasFile": has_file})
+
+
+class TestPlanSonarr(unittest.TestCase):
+    def test_standard_mode_transitions_and_tags(self):
+        eps = [
+            _ep(1, timedelta(days=2), True),                 # upcoming and monitored -> unmonitor
+            _ep(2, -timedelta(days=1), False, number=2),     # past threshold -> monitor (auto-tagged)
+            _ep(3, -timedelta(days=1), False, number=3, has_file=True),
+        ]
+        library = SonarrLibrary([(10, 1, eps)], {10: "Show"}, {10}, set(), {})
+        plan = plan_sonarr(library, SETTINGS, NOW)
+
+        self.assertEqual(plan.unmonitor, [1])
+        self.assertEqual(plan.monitor, [2])
+        self.assertEqual(plan.assessed, 3)
+        self.assertIn("UNMONITOR: Show – S01E01 – Ep1", plan.messages[0])
+        # Episode 1 is still ahead of its threshold, so the auto-tag stays
+        self.assertEqual(plan.tag_remove, set())
+        self.assertEqual(plan.tag_add, set())
+        self.assertEqual(plan.due[10], (NOW + timedelta(days=2, minutes=120)).timestamp())
+
+    def test_untagged_series_is_tagged_and_settled_episodes_skipped(self):
+        eps = [_ep(1, timedelta(days=2), True), _ep(2, timedelta(days=3), True, number=2)]
+        library = SonarrLibrary([(10, 1, eps)], {10: "Show"}, set(), set(), {}, frozenset({2}))
+        plan = plan_sonarr(library, SETTINGS, NOW)
+
+        self.assertEqual(plan.unmonitor, [1])
+        self.assertEqual(plan.tag_add, {10})
+        self.assertNotIn(2, plan.next_checks)
+
+    def test_season_pack_follows_first_episode(self):
+        eps = [_ep(1, -timedelta(days=1), False), _ep(2, timedelta(days=6), False, number=2)]
+        library = SonarrLibrary([(10, 1, eps)], {10: "Show"}, {10}, {10}, {})
+        plan = plan_sonarr(library, SETTINGS, NOW)
+
+        self.assertEqual(plan.monitor, [1, 2])
+        self.assertTrue(any("SEASON PACK MODE" in m for m in plan.messages))
+
+    def test_delay_override_is_used(self):
+        eps = [_ep(1, -timedelta(minutes=30), False)]
+        library = SonarrLibrary([(10, 1, eps)], {10: "Show"}, {10}, set(), {10: timedelta(minutes=10)})
+        self.assertEqual(plan_sonarr(library, SETTINGS, NOW).monitor, [1])
+
+
+@unittest.skipUnless(vectorized.available(), "NumPy not installed")
+class TestNumpyEngine(unittest.TestCase):
+    """The numpy engine must produce exactly the plan of the python engine."""
+
+    def _library(self, rng):
+        airs = [None, "", "not-a-date", "2025-13-01T00:00:00Z", "2025-6-1T12:00:00Z"]
+        seasons = []
+        eid = 0
+        for sid in range(40):
+            for season in range(1, rng.randint(1, 3) + 1):
+                eps = []
+                for number in range(1, rng.randint(0, 8) + 1):
+                    eid += 1
+                    offset = timedelta(minutes=rng.randint(-40 * 1440, 40 * 1440))
+                    air = rng.choice(airs) if rng.random() < 0.1 else (NOW + offset).strftime("%Y-%m-%dT%H:%M:%SZ")
+                    eps.append(Episode.from_api({
+                        "id": eid, "seasonNumber": season, "episodeNumber": number, "title": f"E{eid}",
+                        "airDateUtc": air, "monitored": rng.random() < 0.5, "hasFile": rng.random() < 0.2}))
+                seasons.append((sid, season, eps))
+        pick = lambda p: {sid for sid in range(40) if rng.random() < p}
+        settled = frozenset(e.id for _, _, eps in seasons for e in eps if rng.random() < 0.1)
+        return SonarrLibrary(seasons, {sid: f"Show {sid}" for sid in range(40)}, pick(0.6), pick(0.2),
+                             {sid: timedelta(minutes=rng.randint(-120, 600)) for sid in pick(0.3)}, settled)
+
+    def test_engines_agree(self):
+        rng = random.Random(7)
+        for window in (None, timedelta(days=14)):
+            for skip_if_file in (True, False):
+                library = self._library(rng)
+                settings = SonarrSettings(timedelta(minutes=120), window, skip_if_file)
+                expected = plan_sonarr(library, settings, NOW)
+                actual = plan_sonarr(library, settings._replace(engine="numpy"), NOW)
+                for field in SonarrPlan.__slots__:
+                    self.assertEqual(getattr(actual, field), getattr(expected, field), field)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,200 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+from core.state_store import NOOP, StateStore, fingerprint, is_settled, next_boundary
+
+
+def _streamed(items):
+    """Response for a request made with stream=True, its JSON body served in small chunks."""
+    body = json.dumps(items).encode()
+    return MagicMock(iter_content=lambda chunk_size: (body[i:i + 64] for i in range(0, len(body), 64)))
+
+
+class TestStateStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = StateStore(os.path.join(self.tmp.name, "state.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_record_and_load_roundtrip(self):
+        self.store.record("movie", [(1, "fp1", NOOP, None, None), (2, "fp2", "unmonitor", 500.0, 500.0)], 100.0)
+        self.store.record("movie", [(2, "fp2b", NOOP, 900.0, None)], 200.0)
+        state = self.store.load("movie")
+        self.assertEqual(state[1], ("fp1", NOOP, None, None, 100.0))
+        self.assertEqual(state[2], ("fp2b", NOOP, 900.0, None, 200.0))
+        self.assertEqual(self.store.load("episode"), {})
+
+    def test_rows_without_due_are_dropped_on_upgrade(self):
+        import sqlite3
+        path = os.path.join(self.tmp.name, "old.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE item_state (kind TEXT NOT NULL, item_id INTEGER NOT NULL,"
+                     " fingerprint TEXT NOT NULL, decision TEXT NOT NULL, next_check REAL,"
+                     " evaluated_at REAL NOT NULL, PRIMARY KEY (kind, item_id))")
+        conn.execute("INSERT INTO item_state VALUES ('movie', 1, 'fp1', 'none', 500.0, 100.0)")
+        conn.commit()
+        conn.close()
+
+        store = StateStore(path)
+        self.assertEqual(store.load("movie"), {})
+        store.record("movie", [(1, "fp1", NOOP, 500.0, None)], 200.0)
+        self.assertEqual(store.load("movie")[1], ("fp1", NOOP, 500.0, None, 200.0))
+        store.close()
+
+    def test_checkpoint_resumes_only_with_same_settings(self):
+        from core.checkpoint import SweepCheckpoint
+        cp = SweepCheckpoint(self.store, "sonarr", "fp", 100.0)
+        cp.begin([1, 2], [("PUT", "/api/v3/episode/monitor", {"episodeIds": [10, 20]})], {1: 500.0})
+        cp.done([1, 2], {1: 500.0}, failed={2})
+        cp.begin([3, 4], [("PUT", "/api/v3/episode/monitor", {"episodeIds": [30]}),
+                          ("PUT", "/api/v3/episode/monitor", {"episodeIds": [40]})], {})
+        cp.mark_sent()
+
+        resumed = SweepCheckpoint(self.store, "sonarr", "fp", 200.0)
+        self.assertTrue(resumed.resumed)
+        self.assertEqual(resumed.processed, {1: 500.0})
+        # Only the write not sent before the interruption is sent again
+        sent = []
+        resumed.send_pending(lambda writes: sent.extend(writes) or [])
+        self.assertEqual(sent, [["PUT", "/api/v3/episode/monitor", {"episodeIds": [40]}]])
+        self.assertEqual(resumed.processed, {1: 500.0, 3: None, 4: None})
+
+        restarted = SweepCheckpoint(self.store, "sonarr", "other-fp", 300.0)
+        self.assertFalse(restarted.resumed)
+        self.assertEqual(self.store.load_checkpoint("sonarr"), ("other-fp", 300.0, None, 0, {}))
+
+    def test_fingerprint_is_stable(self):
+        self.assertEqual(fingerprint(1, ["a"], None), fingerprint(1, ["a"], None))
+        self.assertNotEqual(fingerprint(1, ["a"], True), fingerprint(1, ["a"], False))
+
+    def test_next_boundary_picks_earliest_future_instant(self):
+        self.assertEqual(next_boundary(100, 50, 300, None, 200), 200)
+        self.assertIsNone(next_boundary(100, 50, None))
+
+    def test_is_settled(self):
+        self.assertFalse(is_settled(None, "fp", 100))
+        self.assertTrue(is_settled(("fp", NOOP, 200.0, None, 90.0), "fp", 100))
+        self.assertTrue(is_settled(("fp", NOOP, None, None, 90.0), "fp", 100))
+        # fingerprint changed, last decision was a change, or boundary crossed
+        self.assertFalse(is_settled(("old", NOOP, 200.0, None, 90.0), "fp", 100))
+        self.assertFalse(is_settled(("fp", "unmonitor", 200.0, None, 90.0), "fp", 100))
+        self.assertFalse(is_settled(("fp", NOOP, 100.0, None, 90.0), "fp", 100))
+        # full refresh horizon reached
+        self.assertFalse(is_settled(("fp", NOOP, None, None, 0.0), "fp", 48 * 3600))
+
+
+class TestRadarrIncrementalSync(unittest.TestCase):
+    """A second sweep over an unchanged library skips every settled movie."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = StateStore(os.path.join(self.tmp.name, "state.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    @patch("radarr.radarr_app.Config")
+    @patch("radarr.radarr_app._req")
+    def test_unchanged_movies_are_skipped(self, mock_req, mock_config):
+        from radarr.radarr_app import _run_once
+
+        mock_config.ENABLE_RADARR = True
+        mock_config.RADARR_URL = "http://radarr"
+        mock_config.RADARR_API_KEY = "key"
+        mock_config.IGNORE_TAG_NAME = "ignore"
+        mock_config.SKIP_IF_FILE = True
+        mock_config.AUTO_TAG_NAME = "auto-unmonitored"
+        mock_config.PREFERRED_RELEASE = "either"
+        mock_config.IGNORE_INCINEMAS = False
+        mock_config.DRY_RUN = True
+        mock_config.EDITOR_BATCH_SIZE = 500
+        mock_config.TAG_CACHE_SECONDS = 0
+        mock_config.DELAY_MINUTES = 120
+        mock_config.RADARR_REMONITOR_WINDOW_DAYS = 0
+
+        upcoming = (datetime.now(timezone.utc) + timedelta(days=30)).isoformat()
+        movies = [
+            # Already unmonitored ahead of release: nothing to do until the threshold
+            {"id": 1, "title": "Waiting", "monitored": False, "tags": [1], "hasFile": False,
+             "digitalRelease": upcoming},
+            # Monitored ahead of release: unmonitored (in dry run) on every sweep
+            {"id": 2, "title": "Fresh", "monitored": True, "tags": [], "hasFile": False,
+             "digitalRelease": upcoming},
+        ]
+
+        def req_side_effect(method, path, **kw):
+            if path == "/api/v3/tag":
+                return MagicMock(json=lambda: [{"id": 1, "label": "auto-unmonitored"}])
+            if path == "/api/v3/movie":
+                return _streamed(movies)
+            return MagicMock(ok=True, json=lambda: {})
+
+        mock_req.side_effect = req_side_effect
+
+        with patch("radarr.radarr_app.get_state_store", return_value=self.store):
+            with self.assertLogs("radarr", level="INFO") as first:
+                _run_once()
+            with self.assertLogs("radarr", level="INFO") as second:
+                _run_once()
+
+        self.assertTrue(any("Assessed 2" in line for line in first.output))
+        self.assertTrue(any("1 of 2 movies unchanged" in line for line in second.output))
+        self.assertTrue(any("UNMONITOR: Fresh" in line for line in second.output))
+        self.assertEqual(self.store.load("movie")[1][1], NOOP)
+
+    @patch("radarr.radarr_app.Config")
+    @patch("radarr.radarr_app._req")
+    def test_settled_unmanaged_movie_publishes_no_transition(self, mock_req, mock_config):
+        from core.transitions import TransitionSchedule
+        from radarr.radarr_app import _run_once
+
+        mock_config.ENABLE_RADARR = True
+        mock_config.RADARR_URL = "http://radarr"
+        mock_config.RADARR_API_KEY = "key"
+        mock_config.IGNORE_TAG_NAME = "ignore"
+        mock_config.SKIP_IF_FILE = True
+        mock_config.AUTO_TAG_NAME = "auto-unmonitored"
+        mock_config.PREFERRED_RELEASE = "either"
+        mock_config.IGNORE_INCINEMAS = False
+        mock_config.DRY_RUN = True
+        mock_config.EDITOR_BATCH_SIZE = 500
+        mock_config.TAG_CACHE_SECONDS = 0
+        mock_config.DELAY_MINUTES = 120
+        mock_config.RADARR_REMONITOR_WINDOW_DAYS = 0
+        mock_config.SCHEDULER_MODE = "event"
+
+        # Unmonitored by the user, not by unmonitarr: its release is a boundary for the
+        # incremental sync, but never a transition the event scheduler should act on
+        upcoming = (datetime.now(timezone.utc) + timedelta(days=30)).isoformat()
+        movies = [{"id": 1, "title": "Unmanaged", "monitored": False, "tags": [], "hasFile": False,
+                   "digitalRelease": upcoming}]
+
+        def req_side_effect(method, path, **kw):
+            if path == "/api/v3/tag":
+                return MagicMock(json=lambda: [{"id": 1, "label": "auto-unmonitored"}])
+            if path == "/api/v3/movie":
+                return _streamed(movies)
+            return MagicMock(ok=True, json=lambda: {})
+        mock_req.side_effect = req_side_effect
+        schedule = TransitionSchedule()
+
+        with patch("radarr.radarr_app.get_state_store", return_value=self.store), \
+                patch("radarr.radarr_app.transition_schedule", schedule):
+            _run_once()
+            self.assertIsNone(schedule.next_due())
+            with self.assertLogs("radarr", level="INFO") as second:
+                _run_once()
+
+        self.assertTrue(any("1 of 1 movies unchanged" in line for line in second.output))
+        self.assertIsNone(schedule.next_due())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from core.transitions import TransitionSchedule
+
+
+class TestTransitionSchedule(unittest.TestCase):
+    def test_pop_due_returns_items_in_time_order(self):
+        schedule = TransitionSchedule()
+        schedule.update("sonarr", {1: 100.0, 2: 300.0}, [1, 2])
+        schedule.update("radarr", {9: 200.0}, [9])
+
+        self.assertEqual(schedule.next_due(), 100.0)
+        self.assertEqual(schedule.pop_due(250.0), {"sonarr": {1}, "radarr": {9}})
+        self.assertEqual(schedule.next_due(), 300.0)
+        self.assertEqual(len(schedule), 1)
+
+    def test_update_replaces_and_removes_entries(self):
+        schedule = TransitionSchedule()
+        schedule.update("sonarr", {1: 100.0, 2: 150.0}, [1, 2])
+        # Item 1 moved later, item 2 no longer has a transition, item 3 untouched
+        schedule.update("sonarr", {1: 500.0}, [1, 2])
+
+        self.assertEqual(schedule.pop_due(400.0), {})
+        self.assertEqual(schedule.next_due(), 500.0)
+
+    def test_update_only_touches_evaluated_ids(self):
+        schedule = TransitionSchedule()
+        schedule.update("radarr", {1: 100.0, 2: 200.0}, [1, 2])
+        schedule.update("radarr", {}, [1])
+        self.assertEqual(schedule.pop_due(1000.0), {"radarr": {2}})
+
+    def test_wait_wakes_on_update(self):
+        schedule = TransitionSchedule()
+        threading.Timer(0.05, schedule.update, args=("sonarr", {1: 1.0}, [1])).start()
+        start = time.monotonic()
+        schedule.wait(5)
+        self.assertLess(time.monotonic() - start, 2)
+
+
+class TestEventScheduler(unittest.TestCase):
+    def test_due_items_are_queued_as_scoped_job(self):
+        from services import scheduler_service
+
+        schedule = TransitionSchedule()
+        schedule.update("radarr", {42: time.time() - 1}, [42])
+        calls = []
+
+        with patch.object(scheduler_service, "transition_schedule", schedule), \
+             patch.object(scheduler_service, "get_enabled_apps", return_value=["radarr"]), \
+             patch.object(scheduler_service, "enqueue_job", lambda app, payload=None: calls.append((app, None))), \
+             patch.object(scheduler_service, "add_job", lambda app, triggered_by, item_ids: calls.append((app, item_ids))):
+            thread = threading.Thread(target=scheduler_service.event_scheduler_loop, daemon=True)
+            thread.start()
+            time.sleep(0.2)
+
+        self.assertIn(("radarr", None), calls)
+        self.assertIn(("radarr", [42]), calls)
+
+
+    def test_due_items_rejected_by_a_full_queue_are_rescheduled(self):
+        from services import scheduler_service
+
+        schedule = TransitionSchedule()
+        schedule.update("radarr", {42: time.time() - 1}, [42])
+        calls = []
+
+        def add_job(app, triggered_by, item_ids):
+            calls.append(item_ids)
+            return None  # queue full
+
+        with patch.object(scheduler_service, "transition_schedule", schedule), \
+             patch.object(scheduler_service, "get_enabled_apps", return_value=["radarr"]), \
+             patch.object(scheduler_service, "enqueue_job", lambda app, payload=None: None), \
+             patch.object(scheduler_service, "add_job", add_job):
+            thread = threading.Thread(target=scheduler_service.event_scheduler_loop, daemon=True)
+            thread.start()
+            time.sleep(0.2)
+
+        self.assertEqual(calls, [[42]])
+        self.assertEqual(len(schedule), 1)
+        self.assertGreater(schedule.next_due(), time.time() + scheduler_service.QUEUE_FULL_RETRY_SECONDS - 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
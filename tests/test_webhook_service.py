@@ -1,3 +1,5 @@
+import threading
+import time
 import unittest
 from unittest.mock import patch, MagicMock
 from services.webhook_service import app
@@ -26,5 +28,147 @@ class TestWebhookService(unittest.TestCase):
             response = client.post('/trigger/invalidapp')
             self.assertEqual(response.status_code, 400)
 
+    @patch('services.webhook_service.add_job')
+    def test_sonarr_payload_queues_series_scoped_job(self, mock_add_job):
+        with app.test_client() as client:
+            response = client.post('/trigger/sonarr', json={"eventType": "SeriesAdd", "series": {"id": 42, "title": "Show"}})
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.get_json()["seriesId"], 42)
+            mock_add_job.assert_called_once_with('sonarr', triggered_by='webhook', item_ids=[42])
+
+    @patch('services.webhook_service.add_job')
+    def test_sonarr_payload_without_id_queues_full_sweep(self, mock_add_job):
+        with app.test_client() as client:
+            response = client.post('/trigger/sonarr', json={"eventType": "Health"})
+            self.assertEqual(response.status_code, 202)
+            mock_add_job.assert_called_once_with('sonarr', triggered_by='webhook')
+
+    @patch('services.webhook_service.add_job')
+    def test_sonarr_test_event_queues_nothing(self, mock_add_job):
+        with app.test_client() as client:
+            response = client.post('/trigger/sonarr', json={"eventType": "Test", "series": {"id": 1}})
+            self.assertEqual(response.status_code, 200)
+            mock_add_job.assert_not_called()
+
+    @patch('services.webhook_service.add_job')
+    def test_radarr_payload_queues_movie_scoped_job(self, mock_add_job):
+        with app.test_client() as client:
+            response = client.post('/trigger/radarr', json={"eventType": "MovieAdded", "movie": {"id": 7, "title": "Film"}})
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.get_json()["movieId"], 7)
+            mock_add_job.assert_called_once_with('radarr', triggered_by='webhook', item_ids=[7])
+
+    @patch('services.webhook_service.add_job')
+    def test_radarr_without_payload_queues_full_sweep(self, mock_add_job):
+        with app.test_client() as client:
+            response = client.post('/trigger/radarr')
+            self.assertEqual(response.status_code, 202)
+            mock_add_job.assert_called_once_with('radarr', triggered_by='webhook')
+
+    @patch('services.webhook_service.add_job')
+    def test_named_instance_route_queues_its_job_type(self, mock_add_job):
+        named = {"4k": {"URL": "http://sonarr-4k", "API_KEY": "k"}}
+        with patch('core.instances.Config.SONARR_INSTANCES', named), app.test_client() as client:
+            response = client.post('/trigger/sonarr/4K', json={"eventType": "Download", "series": {"id": 3}})
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.get_json()["job"], 'sonarr-4k')
+            mock_add_job.assert_called_once_with('sonarr-4k', triggered_by='webhook', item_ids=[3])
+
+            response = client.post('/trigger/sonarr/anime')
+            self.assertEqual(response.status_code, 404)
+
+    @patch('services.webhook_service.add_job', return_value=None)
+    def test_full_queue_answers_429_with_retry_after(self, mock_add_job):
+        with app.test_client() as client:
+            response = client.post('/trigger/sonarr', json={"eventType": "Download", "series": {"id": 3}})
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response.headers['Retry-After'], '30')
+
+    def test_job_status_long_poll(self):
+        from core.job_queue import Job, job_history
+        job = Job('sonarr', 'webhook', item_ids=[3])
+        job_history.add(job)
+        with app.test_client() as client:
+            response = client.get(f'/jobs/{job.id}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_json()['status'], 'queued')
+
+            job_history.started(job)
+            threading.Timer(0.1, job_history.finished, (job, 'success')).start()
+            body = client.get(f'/jobs/{job.id}?wait=5').get_json()
+            self.assertEqual((body['status'], body['item_ids']), ('success', [3]))
+            self.assertGreaterEqual(body['run_seconds'], 0.05)
+
+            listed = client.get('/jobs?job=sonarr').get_json()['jobs']
+            self.assertEqual(listed[0]['id'], job.id)
+            self.assertEqual(client.get('/jobs/nope?wait=0.1').status_code, 404)
+            self.assertEqual(client.get(f'/jobs/{job.id}?wait=soon').status_code, 400)
+
+    def test_queue_stats(self):
+        with app.test_client() as client:
+            response = client.get('/queue')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('coalesced', response.get_json())
+
+    def test_metrics(self):
+        with app.test_client() as client:
+            response = client.get('/metrics')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.content_type.startswith('text/plain'))
+            body = response.get_data(as_text=True)
+            self.assertIn('# TYPE unmonitarr_job_duration_seconds histogram', body)
+            self.assertIn('unmonitarr_queue_depth ', body)
+
+class TestWebhookServer(unittest.TestCase):
+    def setUp(self):
+        from services.webhook_service import create_server
+        self.server = create_server("127.0.0.1", 0)
+        self.url = f"http://127.0.0.1:{self.server.effective_port}"
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        # server.run() without end: stop between polls so the sockets aren't closed under select()
+        while not self.stopped.is_set():
+            self.server.asyncore.loop(timeout=0.05, map=self.server._map, count=1)
+
+    def tearDown(self):
+        self.stopped.set()
+        self.thread.join(5)
+        self.server.close()
+        self.server.task_dispatcher.shutdown()
+
+    @patch('services.webhook_service.add_job')
+    def test_long_polls_leave_threads_for_webhooks(self, mock_add_job):
+        import requests
+        from core.config import Config
+        from core.job_queue import Job, job_history
+        job = Job('sonarr', 'webhook')
+        job_history.add(job)
+        mock_add_job.return_value = job
+
+        polls = []
+        pollers = [threading.Thread(target=lambda: polls.append(
+            requests.get(f"{self.url}/jobs/{job.id}?wait=10", timeout=15).json()["status"]))
+            for _ in range(Config.WEBHOOK_THREADS)]
+        for poller in pollers:
+            poller.start()
+        time.sleep(0.5)  # every poller has reached the server
+        try:
+            response = requests.post(f"{self.url}/trigger/sonarr", json={"eventType": "Download"}, timeout=3)
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.json()["id"], job.id)
+            # Pollers beyond the waiter cap got the current status at once
+            deadline = time.monotonic() + 3
+            while len(polls) < Config.WEBHOOK_THREADS - Config.WEBHOOK_THREADS // 4 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(polls.count("queued"), Config.WEBHOOK_THREADS - Config.WEBHOOK_THREADS // 4)
+        finally:
+            job_history.finished(job, "success")
+            for poller in pollers:
+                poller.join(5)
+        self.assertEqual(polls.count("success"), Config.WEBHOOK_THREADS // 4)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
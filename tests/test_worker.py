@@ -113,5 +113,81 @@ class TestJobWorker(unittest.TestCase):
         self.assertEqual(mock_run_job.call_count, 2)
         self.assertEqual(mock_run_radarr.call_count, 1)
 
+    @patch('core.job_worker.run_job')
+    def test_worker_passes_item_ids_for_scoped_jobs(self, mock_run_job):
+        """Test that scoped jobs are run for their item IDs only"""
+        from core.job_queue import Job
+        self.real_queue.put(Job('sonarr', 'threshold', item_ids=[7, 9]))
+
+        worker = JobWorker(self.real_queue, self.job_locks, self.mock_logger)
+
+        worker_thread = threading.Thread(target=worker.run, daemon=True)
+        worker_thread.start()
+
+        time.sleep(0.5)
+
+        mock_run_job.assert_called_once_with(item_ids=[7, 9])
+        self.mock_logger.info.assert_any_call('Starting sonarr job for 2 item(s) (triggered_by=threshold)')
+
+    @patch('core.job_worker.run_radarr')
+    @patch('core.job_worker.run_job')
+    def test_per_type_workers_run_apps_concurrently(self, mock_run_job, mock_run_radarr):
+        """Test that a long sonarr job does not block radarr jobs queued behind it"""
+        from core.job_queue import Job, JobQueueWrapper
+        queue = JobQueueWrapper()
+        release = threading.Event()
+        mock_run_job.side_effect = lambda: release.wait(5)
+
+        queue.put(Job('sonarr', 'scheduler'))
+        queue.put(Job('radarr', 'scheduler'))
+
+        for job_type in ('sonarr', 'radarr'):
+            worker = JobWorker(queue, self.job_locks, self.mock_logger, job_types=(job_type,))
+            threading.Thread(target=worker.run, daemon=True).start()
+
+        time.sleep(0.5)
+        try:
+            mock_run_radarr.assert_called_once()
+            self.assertTrue(self.job_locks['sonarr'].locked())
+        finally:
+            release.set()
+
+    @patch('core.job_worker.run_job')
+    def test_named_instance_jobs_run_for_their_instance(self, mock_run_job):
+        """Test that a named instance's job type runs the app's job for that instance"""
+        from core.instances import Instance
+        named = {"4k": {"URL": "http://sonarr-4k", "API_KEY": "k"}}
+        self.job_locks['sonarr-4k'] = threading.Lock()
+        self.real_queue.put(('sonarr-4k', 'webhook'))
+
+        with patch('core.instances.Config.SONARR_INSTANCES', named):
+            worker = JobWorker(self.real_queue, self.job_locks, self.mock_logger)
+        threading.Thread(target=worker.run, daemon=True).start()
+        time.sleep(0.5)
+
+        mock_run_job.assert_called_once_with(instance=Instance("sonarr", "4k", "http://sonarr-4k", "k", named["4k"]))
+    @patch('core.job_worker.run_radarr')
+    def test_worker_records_job_status(self, mock_run_radarr):
+        """Test that the worker records when each job started and finished, and its outcome"""
+        from core.job_history import JobHistory
+        from core.job_queue import Job, JobQueueWrapper
+        queue = JobQueueWrapper()
+        history = JobHistory()
+        mock_run_radarr.side_effect = [None, RuntimeError("boom")]
+        ok, failed = Job('radarr', 'webhook'), Job('radarr', 'scheduler')
+        for job in (ok, failed):
+            history.add(job)
+            queue.put(job)
+
+        worker = JobWorker(queue, self.job_locks, self.mock_logger, history=history)
+        threading.Thread(target=worker.run, daemon=True).start()
+
+        self.assertEqual(history.wait(failed.id, 5).status, 'error')
+        self.assertEqual((ok.status, failed.error), ('success', 'boom'))
+        self.assertLessEqual(ok.queued, ok.started)
+        self.assertLessEqual(ok.started, ok.finished)
+        self.assertEqual([job.id for job in history.recent()], [failed.id, ok.id])
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file